@@ -0,0 +1,386 @@
+# Stand-in SolidFire JSON-RPC server for benchmarking the check scripts
+# Generates a synthetic cluster of the requested size and answers the API
+# methods the checks use, including JSON-RPC batch arrays. Every request is
+# logged with its receive and send time so the benchmark can split a run
+# into phases and count round trips.
+#
+# usage: python bench/mock_server.py --nodes 40 --volumes 20000 --sessions 20000 --port 8443
+import argparse
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    import socketserver
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    import SocketServer as socketserver
+
+API_VERSIONS = ["7.0", "8.0", "9.0", "10.0", "11.0", "12.0", "12.3"]
+DRIVES_PER_NODE = 10
+
+
+class SyntheticCluster(object):
+
+    def __init__(self, nodes=4, volumes=1000, sessions=1000, failed_drives=1, seed=1, pairs=(), paired_volumes=0):
+        rng = random.Random(seed)
+        self.name = "bench-" + str(nodes)
+        self.node_ids = list(range(1, nodes + 1))
+        self.samples = 0
+        # Every node's API is this server, MockServer sets the address once it is bound
+        self.node_address = "127.0.0.1"
+        self.lock = threading.Lock()
+
+        self.drives = []
+        failed = set(rng.sample(range(1, nodes * DRIVES_PER_NODE + 1), min(failed_drives, nodes * DRIVES_PER_NODE)))
+        drive_id = 1
+        for node_id in self.node_ids:
+            for slot in range(DRIVES_PER_NODE):
+                drive_type = "volume" if slot == 0 else "block"
+                status = "failed" if drive_id in failed else "active"
+                self.drives.append({"driveID": drive_id, "nodeID": node_id, "slot": slot,
+                                    "type": drive_type, "status": status, "capacity": 960197124096,
+                                    "serial": "bench" + str(drive_id)})
+                drive_id += 1
+
+        # One current fault per failed drive, as the cluster raises them
+        self.faults = []
+        for drive in self.drives:
+            if drive["status"] == "failed":
+                self.faults.append({"clusterFaultID": len(self.faults) + 1, "code": "driveFailed",
+                                    "severity": "warning", "type": "drive", "nodeID": drive["nodeID"],
+                                    "driveID": drive["driveID"], "resolved": False, "resolvedDate": "",
+                                    "date": "2018-08-14T00:00:00Z", "serviceID": 0, "nodeHardwareFaultID": 0,
+                                    "driveIDs": [drive["driveID"]], "networkInterface": "",
+                                    "details": "Drive " + str(drive["driveID"]) + " failed"})
+
+        # Months of event history, the log grows by a few events on every ListEvents
+        self.events = [self.make_event(event_id) for event_id in range(1, 5001)]
+
+        self.volumes = []
+        for volume_id in range(1, volumes + 1):
+            self.volumes.append({"volumeID": volume_id, "name": "vol" + str(volume_id),
+                                 "accountID": volume_id % 50 + 1, "status": "active",
+                                 "volumeAccessGroups": [volume_id % 20 + 1],
+                                 "totalSize": 1099511627776, "access": "readWrite",
+                                 "iqn": "iqn.2010-01.com.solidfire:bench." + str(volume_id)})
+
+        # Volumes 1..paired_volumes replicate round robin to the given clusters under the same volume ID.
+        # One pair in 50 is paused by hand, one in 97 has lost its remote, and lag climbs with the volume ID
+        self.cluster_pairs = [{"clusterPairID": pair_id, "clusterName": "pair" + str(pair_id), "mvip": address,
+                               "status": "Connected", "latency": 1, "version": "12.3.0.958",
+                               "clusterPairUUID": "bench-pair-" + str(pair_id), "clusterUUID": "bench" + str(pair_id)}
+                              for pair_id, address in enumerate(pairs, 1)]
+        self.paired_volumes = []
+        self.async_delays = {}
+        for volume in self.volumes[:paired_volumes if self.cluster_pairs else 0]:
+            volume_id = volume["volumeID"]
+            if volume_id % 97 == 0:
+                state = "PausedDisconnected"
+            elif volume_id % 50 == 0:
+                state = "PausedManual"
+            else:
+                state = "Active"
+            pair = self.cluster_pairs[(volume_id - 1) % len(self.cluster_pairs)]
+            self.paired_volumes.append(dict(volume, volumePairs=[{
+                "clusterPairID": pair["clusterPairID"], "remoteVolumeID": volume_id, "remoteSliceID": volume_id,
+                "remoteVolumeName": volume["name"], "volumePairUUID": "bench-volume-pair-" + str(volume_id),
+                "remoteReplication": {"mode": "Async", "pauseLimit": 3145728000, "remoteServiceID": 46,
+                                      "resumeDetails": "", "state": state, "stateDetails": "",
+                                      "snapshotReplication": {"state": "Idle", "stateDetails": ""}}}]))
+            self.async_delays[volume_id] = (volume_id * 7) % 720 + (900 if state != "Active" else 0)
+
+        # Hosts log in to a volume over two paths on different nodes, about one login in 25 has lost a path
+        self.sessions = []
+        for session_id in range(1, sessions + 1):
+            if session_id % 2 or session_id % 100 == 0:
+                host = rng.randint(1, max(1, sessions // 8))
+                volume_id = rng.randint(1, max(1, volumes))
+                node_id = rng.choice(self.node_ids)
+            else:
+                node_id = self.node_ids[(self.node_ids.index(node_id) + 1) % len(self.node_ids)]
+            self.sessions.append({"sessionID": session_id, "nodeID": node_id,
+                                  "accountID": session_id % 50 + 1,
+                                  "volumeID": volume_id,
+                                  "initiatorName": "iqn.1998-01.com.vmware:host" + str(host),
+                                  "initiatorIP": "10.10." + str(host // 250) + "." + str(host % 250) + ":51000",
+                                  "targetIP": "10.20.0." + str(session_id % 250) + ":3260"})
+
+        # Responses that never change are encoded once
+        self.static = {
+            "GetAPI": {"currentVersion": API_VERSIONS[-1], "supportedVersions": API_VERSIONS},
+            "GetClusterInfo": {"clusterInfo": {
+                "name": self.name, "mvip": "127.0.0.1", "mvipNodeID": 1, "mvipInterface": "Bond1G",
+                "svip": "10.20.0.1", "svipInterface": "Bond10G", "svipNodeID": 1,
+                "encryptionAtRestState": "disabled", "repCount": 2, "uniqueID": "bnch",
+                "ensemble": ["10.0.0." + str(node_id) for node_id in self.node_ids[:5]]}},
+            "GetClusterVersionInfo": {"clusterAPIVersion": API_VERSIONS[-1], "clusterVersion": "12.3.0.958"},
+            "ListDrives": {"drives": self.drives},
+            "ListClusterFaults": {"faults": self.faults},
+            "ListISCSISessions": {"sessions": self.sessions},
+            "ListClusterPairs": {"clusterPairs": self.cluster_pairs},
+            "ListActivePairedVolumes": {"volumes": self.paired_volumes},
+            "TestConnectMvip": {"details": {"mvip": "127.0.0.1", "connected": True}},
+        }
+
+    #Cumulative counters grow on every sample so rate checks have deltas to work with
+    def next_sample(self):
+        with self.lock:
+            self.samples += 1
+            return self.samples
+
+    def make_event(self, event_id):
+        return {"eventID": event_id, "eventInfo": {}, "eventType": "apiEvent", "message": "API event " + str(event_id),
+                "nodeID": self.node_ids[event_id % len(self.node_ids)], "serviceID": 0, "driveID": 0,
+                "severity": 0, "details": "", "timeOfReport": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "timeOfPublish": time.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+    #Newest first like the cluster, limited to the IDs asked for
+    def list_events(self, params):
+        with self.lock:
+            for _ in range(3):
+                self.events.append(self.make_event(len(self.events) + 1))
+            start = params.get("startEventID", 0)
+            end = params.get("endEventID", len(self.events))
+            limit = params.get("maxEvents", len(self.events))
+            selected = self.events[max(start - 1, 0):end]
+        return {"events": selected[::-1][:limit]}
+
+    def cluster_stats(self):
+        sample = self.next_sample()
+        return {"clusterStats": {
+            "readBytes": 10 ** 13 + sample * 4 * 10 ** 9, "writeBytes": 5 * 10 ** 12 + sample * 2 * 10 ** 9,
+            "readOps": 10 ** 9 + sample * 10 ** 6, "writeOps": 5 * 10 ** 8 + sample * 5 * 10 ** 5,
+            "readLatencyUSec": 350, "writeLatencyUSec": 600, "latencyUSec": 450,
+            "clusterUtilization": 35.0, "averageIOPSize": 8192, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")}}
+
+    #The last node runs hot so the node check has an outlier to find
+    def node_stats(self):
+        sample = self.next_sample()
+        stats = []
+        for node_id in self.node_ids:
+            hot = node_id == self.node_ids[-1]
+            ops = sample * (50000 if hot else 10000 + node_id * 100)
+            stats.append({"nodeID": node_id, "cpu": 90 if hot else 20 + node_id % 5, "cpuTotal": sample * 1000,
+                          "readOps": ops, "writeOps": ops // 2, "readLatencyUSecTotal": ops * 300,
+                          "writeLatencyUSecTotal": ops * 250, "sBytesIn": ops * 4096, "sBytesOut": ops * 2048,
+                          "cBytesIn": ops * 1024, "cBytesOut": ops * 1024, "mBytesIn": sample * 1000,
+                          "mBytesOut": sample * 1000, "usedMemory": 60 * 1024 ** 3, "count": sample,
+                          "networkUtilizationStorage": 40 if hot else 10, "networkUtilizationCluster": 5,
+                          "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")})
+        return {"nodeStats": {"nodes": stats}}
+
+    def cluster_capacity(self):
+        sample = self.next_sample()
+        max_used = len(self.node_ids) * 10 ** 13
+        return {"clusterCapacity": {
+            "usedSpace": max_used // 3 + sample * 10 ** 9, "maxUsedSpace": max_used,
+            "usedMetadataSpace": max_used // 200, "maxUsedMetadataSpace": max_used // 20,
+            "provisionedSpace": len(self.volumes) * 1099511627776, "maxProvisionedSpace": max_used * 5,
+            "nonZeroBlocks": 3 * 10 ** 9, "zeroBlocks": 10 ** 9, "uniqueBlocks": 10 ** 9,
+            "uniqueBlocksUsedSpace": 2 * 10 ** 12, "snapshotNonZeroBlocks": 0,
+            "activeBlockSpace": max_used // 3, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")}}
+
+    def cluster_state(self, params):
+        if params.get("force"):
+            return {"nodes": [{"nodeID": node_id, "result": {"state": "Active", "cluster": self.name}}
+                              for node_id in self.node_ids]}
+        return {"state": "Active", "cluster": self.name}
+
+    def list_volumes(self, params):
+        start = params.get("startVolumeID", 0)
+        limit = params.get("limit", len(self.volumes))
+        # Volume IDs are 1..n so the page start is an index
+        first = max(start - 1, 0)
+        return {"volumes": self.volumes[first:first + limit]}
+
+    #asyncDelay is HH:MM:SS.ffffff on a paired volume and null otherwise
+    def async_delay(self, volume_id):
+        delay = self.async_delays.get(volume_id)
+        if delay is None:
+            return None
+        return "%02d:%02d:%02d.000000" % (delay // 3600, delay // 60 % 60, delay % 60)
+
+    def volume_stats(self, volume_ids=None):
+        sample = self.next_sample()
+        volumes = self.volumes
+        if volume_ids is not None:
+            # Volume IDs are 1..n so an ID is an index
+            volumes = [self.volumes[volume_id - 1] for volume_id in volume_ids if 0 < volume_id <= len(self.volumes)]
+        return {"volumeStats": [{"volumeID": volume["volumeID"], "accountID": volume["accountID"],
+                                 "readOps": sample * volume["volumeID"], "writeOps": sample * 7,
+                                 "readBytes": sample * volume["volumeID"] * 4096, "writeBytes": sample * 28672,
+                                 "latencyUSec": (volume["volumeID"] * 37) % 9000,
+                                 "throttle": (volume["volumeID"] % 100) / 1000.0,
+                                 "asyncDelay": self.async_delay(volume["volumeID"])}
+                                for volume in volumes]}
+
+    def call(self, method, params):
+        if method in self.static:
+            return self.static[method]
+        if method == "GetClusterStats":
+            return self.cluster_stats()
+        if method == "GetClusterCapacity":
+            return self.cluster_capacity()
+        if method == "GetClusterState":
+            return self.cluster_state(params)
+        if method == "ListActiveNodes":
+            return {"nodes": [{"nodeID": node_id, "name": "node" + str(node_id), "mip": self.node_address}
+                              for node_id in self.node_ids]}
+        if method == "ListAllNodes":
+            return {"nodes": [{"nodeID": node_id, "name": "node" + str(node_id), "mip": self.node_address}
+                              for node_id in self.node_ids], "pendingNodes": [], "pendingActiveNodes": []}
+        if method == "ListNodeStats":
+            return self.node_stats()
+        if method == "ListEvents":
+            return self.list_events(params)
+        if method == "ListVolumes":
+            return self.list_volumes(params)
+        if method == "ListVolumeStatsByVolume":
+            return self.volume_stats()
+        if method == "ListVolumeStatsByVolumeID":
+            return self.volume_stats(params.get("volumeIDs", []))
+        return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def answer(self, request):
+        result = self.server.cluster.call(request.get("method"), request.get("params") or {})
+        if result is None:
+            return {"id": request.get("id"), "error": {"name": "xUnknownAPIMethod", "code": 500,
+                                                        "message": "Unknown method " + str(request.get("method"))}}
+        return {"id": request.get("id"), "result": result}
+
+    def do_POST(self):
+        received = time.time()
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if isinstance(body, list):
+            methods = [request.get("method") for request in body]
+            response = [self.answer(request) for request in body]
+        else:
+            methods = [body.get("method")]
+            response = self.answer(body)
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.log_request_times(methods, received, time.time(), len(data))
+
+    def do_GET(self):
+        if self.path != "/_bench/requests":
+            self.send_error(404)
+            return
+        data = json.dumps(self.server.take_requests()).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, cluster, latency=0.0, certfile=None, keyfile=None):
+        HTTPServer.__init__(self, address, MockHandler)
+        self.cluster = cluster
+        self.cluster.node_address = "127.0.0.1:" + str(self.server_address[1])
+        self.latency = latency
+        self.requests = []
+        self.requests_lock = threading.Lock()
+        self.tmpdir = None
+        if certfile is None:
+            self.tmpdir = tempfile.mkdtemp(prefix="sfbench-")
+            certfile, keyfile = make_certificate(self.tmpdir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    #One round trip: the methods it carried, when it arrived, when it was answered and its size
+    def log_request_times(self, methods, received, sent, size):
+        with self.requests_lock:
+            self.requests.append((methods, received, sent, size))
+
+    #Return and clear the request log
+    def take_requests(self):
+        with self.requests_lock:
+            requests, self.requests = self.requests, []
+        return sorted(requests, key=lambda request: request[1])
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        if self.tmpdir:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+#Self signed certificate for localhost made with the openssl command line tool
+def make_certificate(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    try:
+        subprocess.check_call(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                               "-keyout", keyfile, "-out", certfile, "-days", "1", "-subj", "/CN=localhost"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        sys.exit("Unable to create a certificate with openssl, pass --cert and --key")
+    return certfile, keyfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in SolidFire JSON-RPC server")
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--nodes', type=int, default=4)
+    parser.add_argument('--volumes', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--failed-drives', type=int, default=1)
+    parser.add_argument('--pair', action='append', default=[], metavar='HOST:PORT',
+                        help='paired cluster, repeat for each pair')
+    parser.add_argument('--paired-volumes', type=int, default=100,
+                        help='volumes replicated to the paired clusters')
+    parser.add_argument('--latency', type=float, default=0.0, metavar='ms',
+                        help='delay added to every request')
+    parser.add_argument('--cert', type=str, help='certificate file, a self signed one is made by default')
+    parser.add_argument('--key', type=str, help='private key for --cert')
+    args = parser.parse_args()
+    cluster = SyntheticCluster(args.nodes, args.volumes, args.sessions, args.failed_drives,
+                               pairs=args.pair, paired_volumes=args.paired_volumes)
+    server = MockServer(("127.0.0.1", args.port), cluster, args.latency / 1000.0, args.cert, args.key)
+    print("Serving " + cluster.name + " on https://127.0.0.1:" + str(args.port))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if server.tmpdir:
+            shutil.rmtree(server.tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
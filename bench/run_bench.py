@@ -0,0 +1,183 @@
+# Benchmark the check scripts against the stand-in JSON-RPC server
+# Each scenario runs a script as a subprocess against a synthetic cluster
+# and reports wall time, API round trips, peak RSS and a per phase split:
+# startup until the first request, then server and client time for every
+# round trip, where client time runs until the next request or process exit.
+# The server runs in its own process so its memory never shows up in the
+# scripts' peak RSS.
+#
+# usage: python bench/run_bench.py --sizes 4,40,100 --latency 2 --repeat 3 --json bench.json
+import argparse
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+MOCK_SERVER = os.path.join(BENCH_DIR, "mock_server.py")
+
+HTTP_SCRIPT = os.path.join(REPO_DIR, "checkSF_http_v1_6.py")
+ELEMENT_SCRIPT = os.path.join(REPO_DIR, "checkSF_element_v1_6.py")
+
+#Command line for each scenario given the server port and a scratch state directory
+SCENARIOS = {
+    'http-mvip': lambda port, state: [sys.executable, HTTP_SCRIPT, "127.0.0.1", str(port), "admin", "admin", "mvip"],
+    'http-node': lambda port, state: [sys.executable, HTTP_SCRIPT, "127.0.0.1", str(port), "admin", "admin", "node"],
+    'http-nodes': lambda port, state: [sys.executable, HTTP_SCRIPT, "127.0.0.1", str(port), "admin", "admin", "nodes"],
+    'element': lambda port, state: [sys.executable, ELEMENT_SCRIPT, "-sm", "127.0.0.1:" + str(port),
+                                    "-su", "admin", "-sp", "admin", "--state-dir", state],
+    'element-trend': lambda port, state: [sys.executable, ELEMENT_SCRIPT, "-sm", "127.0.0.1:" + str(port),
+                                          "-su", "admin", "-sp", "admin", "--state-dir", state, "--mode", "trend"],
+    'element-hotspot': lambda port, state: [sys.executable, ELEMENT_SCRIPT, "-sm", "127.0.0.1:" + str(port),
+                                            "-su", "admin", "-sp", "admin", "--state-dir", state, "--mode", "hotspot"],
+}
+DEFAULT_SCENARIOS = "http-mvip,http-node,element"
+
+class MockProcess(object):
+
+    def __init__(self, nodes, volumes, sessions, latency):
+        self.port = free_port()
+        self.process = subprocess.Popen([sys.executable, MOCK_SERVER, "--port", str(self.port),
+                                         "--nodes", str(nodes), "--volumes", str(volumes),
+                                         "--sessions", str(sessions), "--latency", str(latency)],
+                                        stdout=subprocess.PIPE)
+        # The server prints one line once it is listening
+        if not self.process.stdout.readline():
+            raise RuntimeError("mock server failed to start")
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.context.check_hostname = False
+        self.context.verify_mode = ssl.CERT_NONE
+
+    #Return and clear the server's request log
+    def take_requests(self):
+        response = urlopen("https://127.0.0.1:" + str(self.port) + "/_bench/requests", context=self.context)
+        return [tuple(request) for request in json.loads(response.read().decode('utf-8'))]
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+def free_port():
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+#Peak RSS in MiB from a rusage, ru_maxrss is KiB on Linux and bytes on macOS
+def peak_rss_mib(rusage):
+    if sys.platform == "darwin":
+        return rusage.ru_maxrss / 1024.0 / 1024.0
+    return rusage.ru_maxrss / 1024.0
+
+#Split one run into startup, then server and client time for each round trip
+def phases(start, end, requests):
+    if not requests:
+        return [{'phase': "total", 'server': 0.0, 'client': end - start, 'bytes': 0}]
+    rows = [{'phase': "startup", 'server': 0.0, 'client': requests[0][1] - start, 'bytes': 0}]
+    for i, (methods, received, sent, size) in enumerate(requests):
+        next_boundary = requests[i + 1][1] if i + 1 < len(requests) else end
+        rows.append({'phase': "+".join(methods), 'server': sent - received,
+                     'client': max(0.0, next_boundary - sent), 'bytes': size})
+    return rows
+
+#Run one command to completion and measure it
+def run_once(command, server, log_path):
+    server.take_requests()
+    with open(log_path, 'wb') as log:
+        start = time.time()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=REPO_DIR)
+        _, status, rusage = os.wait4(process.pid, 0)
+        end = time.time()
+    # wait4 already reaped the child, tell Popen so it doesn't try again
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    requests = server.take_requests()
+    return {
+        'wall': end - start,
+        'exit_code': process.returncode,
+        'round_trips': len(requests),
+        'api_calls': sum(len(request[0]) for request in requests),
+        'response_bytes': sum(request[3] for request in requests),
+        'peak_rss_mib': peak_rss_mib(rusage),
+        'phases': phases(start, end, requests),
+    }
+
+def median_run(runs):
+    return sorted(runs, key=lambda run: run['wall'])[len(runs) // 2]
+
+def print_result(size, scenario, runs, show_phases):
+    run = median_run(runs)
+    walls = sorted(r['wall'] for r in runs)
+    print("%-5s %-16s wall %7.3fs (min %.3fs) trips %3d calls %3d rss %7.1f MiB exit %d" % (
+        size, scenario, run['wall'], walls[0], run['round_trips'], run['api_calls'],
+        run['peak_rss_mib'], run['exit_code']))
+    if show_phases:
+        for phase in run['phases']:
+            print("      %-48s server %8.1fms client %8.1fms %10d bytes" % (
+                phase['phase'][:48], phase['server'] * 1000, phase['client'] * 1000, phase['bytes']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SolidFire check scripts against a mock cluster")
+    parser.add_argument('--sizes', type=str, default="4,40,100",
+                        help='comma separated node counts, default 4,40,100')
+    parser.add_argument('--volumes', type=int, default=None,
+                        help='volumes per cluster, default 1000 per node up to 100000')
+    parser.add_argument('--sessions', type=int, default=None,
+                        help='iSCSI sessions per cluster, default 1000 per node up to 100000')
+    parser.add_argument('--latency', type=float, default=0.0, metavar='ms',
+                        help='delay the server adds to every request')
+    parser.add_argument('--scenarios', type=str, default=DEFAULT_SCENARIOS,
+                        help='comma separated, any of ' + ", ".join(sorted(SCENARIOS)))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per scenario, the median is reported')
+    parser.add_argument('--phases', action='store_true', help='print the phase split of the median run')
+    parser.add_argument('--json', type=str, metavar='path', help='also write every run to this file')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            parser.error("unknown scenario " + scenario)
+
+    results = []
+    state_dir = tempfile.mkdtemp(prefix="sfbench-state-")
+    try:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            volumes = args.volumes if args.volumes is not None else min(100000, size * 1000)
+            sessions = args.sessions if args.sessions is not None else min(100000, size * 1000)
+            server = MockProcess(size, volumes, sessions, args.latency)
+            port = server.port
+            try:
+                for scenario in scenarios:
+                    runs = []
+                    for _ in range(args.repeat):
+                        runs.append(run_once(SCENARIOS[scenario](port, state_dir), server,
+                                             os.path.join(state_dir, scenario + ".log")))
+                    print_result(size, scenario, runs, args.phases)
+                    results.append({'nodes': size, 'volumes': volumes, 'sessions': sessions,
+                                    'latency_ms': args.latency, 'scenario': scenario, 'runs': runs})
+            finally:
+                server.close()
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
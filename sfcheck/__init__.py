@@ -0,0 +1 @@
+# Shared helpers for the SolidFire cluster check scripts
@@ -0,0 +1,121 @@
+# Persistent per cluster cache for slow moving collector results
+# Cluster info, version, drives and node state are kept on disk between runs,
+# each on its own TTL. A cheap fingerprint taken on every run, the set of
+# current cluster faults, drops the fault-sensitive entries as soon as it
+# changes, so a failed drive or node is seen on the next run, not after a TTL.
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from sfcheck.counting import raw_call
+from sfcheck.samples import safe_name
+
+# Seconds each collector's result is reused across runs. Stats are always fetched.
+PERSISTENT_TTLS = {
+    'info': 86400,
+    'version': 86400,
+    'drives': 3600,
+    'state': 3600,
+    'sessions': 900,
+    'breakdown': 900,
+    'stats': 0,
+    'volumes': 900,
+    'capacity': 900,
+}
+
+# Entries dropped whenever the fault fingerprint changes
+FINGERPRINTED = ('info', 'version', 'drives', 'state')
+
+#Fingerprint of the current cluster faults from one ListClusterFaults call
+def fault_fingerprint(sfe):
+    faults = raw_call(sfe, "ListClusterFaults", {"faultTypes": "current"})['faults']
+    ids = sorted(str(fault.get('clusterFaultID')) + ":" + str(fault.get('code')) for fault in faults)
+    return str(len(ids)) + "-" + hashlib.sha1(",".join(ids).encode('utf-8')).hexdigest()[:16]
+
+#JSON only has string keys, the drive index is keyed by node ID
+def encode(value):
+    if isinstance(value, dict):
+        if any(not isinstance(key, str) for key in value):
+            return {'__items__': [[key, encode(item)] for key, item in value.items()]}
+        return dict((key, encode(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    return value
+
+def decode(value):
+    if isinstance(value, dict):
+        if '__items__' in value:
+            return dict((key, decode(item)) for key, item in value['__items__'])
+        return dict((key, decode(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+class FingerprintCache(object):
+
+    def __init__(self, directory, key, ttls=None):
+        self.path = os.path.join(directory, "cluster-" + safe_name(key) + ".cache")
+        self.ttls = ttls or PERSISTENT_TTLS
+        self.fingerprint = None
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    #Read the cache file, a missing or unreadable file is an empty cache
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.fingerprint = data['fingerprint']
+            self.entries = dict((name, (entry[0], decode(entry[1])))
+                                for name, entry in data['entries'].items())
+        except (IOError, OSError, ValueError, KeyError, TypeError, IndexError):
+            self.fingerprint = None
+            self.entries = {}
+        return self
+
+    #Drop the fault-sensitive entries when the fingerprint differs from the stored one
+    def verify(self, fingerprint):
+        if fingerprint != self.fingerprint:
+            for name in FINGERPRINTED:
+                self.entries.pop(name, None)
+            self.fingerprint = fingerprint
+            self.dirty = True
+
+    #fetch hook for collect_cluster, serves fresh entries and refreshes the rest
+    #through fetch(name, collector), or collector(sfe) when no fetch is given
+    def fetcher(self, sfe, fetch=None):
+        def cached_fetch(name, collector):
+            now = time.time()
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] + self.ttls.get(name, 0) > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            value = fetch(name, collector) if fetch is not None else collector(sfe)
+            if self.ttls.get(name, 0) > 0:
+                self.entries[name] = (now, value)
+                self.dirty = True
+            return value
+        return cached_fetch
+
+    #Write the cache atomically so a concurrent run never reads half a file
+    def save(self):
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.path) or "."
+        handle, temp_path = tempfile.mkstemp(prefix=".cache-", dir=directory)
+        try:
+            with os.fdopen(handle, 'w') as f:
+                json.dump({'fingerprint': self.fingerprint,
+                           'entries': dict((name, [entry[0], encode(entry[1])])
+                                           for name, entry in self.entries.items())}, f)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+        self.dirty = False
@@ -0,0 +1,132 @@
+# Capacity check from GetClusterCapacity for one cluster or a whole fleet
+# The raw counters of every cluster are laid out as columns and each ratio is
+# computed over all clusters at once. NumPy is used when it is installed and
+# plain Python otherwise, so the fleet roll-up stays cheap for hundreds of
+# clusters without making NumPy a requirement of the plugin.
+import math
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from sfcheck.counting import raw_call
+from sfcheck.history import RingBuffer, history_path, fullness_growth, days_until
+from sfcheck.nagios import STATE_OK, STATE_CRITICAL, range_check
+
+COUNTERS = ('usedSpace', 'maxUsedSpace', 'usedMetadataSpace', 'maxUsedMetadataSpace', 'provisionedSpace',
+            'maxProvisionedSpace', 'nonZeroBlocks', 'zeroBlocks', 'uniqueBlocks', 'uniqueBlocksUsedSpace',
+            'snapshotNonZeroBlocks', 'activeNodes')
+BLOCK_SIZE = 4096
+# uniqueBlocksUsedSpace includes metadata overhead, the UI takes it out with this factor
+COMPRESSION_OVERHEAD = 0.93
+
+# Derived columns in evaluation order: name, input columns, formula over whole columns.
+# Block space is assumed spread evenly over the active nodes for the node loss headroom.
+FORMULAS = (
+    ('block_fullness', ('usedSpace', 'maxUsedSpace'),
+     lambda used, usable: used / usable * 100),
+    ('metadata_fullness', ('usedMetadataSpace', 'maxUsedMetadataSpace'),
+     lambda used, usable: used / usable * 100),
+    ('thin_provisioning', ('nonZeroBlocks', 'zeroBlocks'),
+     lambda non_zero, zero: (non_zero + zero) / non_zero),
+    ('deduplication', ('nonZeroBlocks', 'snapshotNonZeroBlocks', 'uniqueBlocks'),
+     lambda non_zero, snapshot, unique: (non_zero + snapshot) / unique),
+    ('compression', ('uniqueBlocks', 'uniqueBlocksUsedSpace'),
+     lambda unique, used: unique * BLOCK_SIZE / (used * COMPRESSION_OVERHEAD)),
+    ('efficiency', ('thin_provisioning', 'deduplication', 'compression'),
+     lambda thin, dedup, compression: thin * dedup * compression),
+    ('node_loss_free', ('usedSpace', 'maxUsedSpace', 'activeNodes'),
+     lambda used, usable, nodes: usable * (nodes - 1) / nodes - used),
+)
+
+#GetClusterCapacity counters plus the active node count, and the reported MVIP that keys the metric history
+def collect_capacity_counters(sfe):
+    capacity = raw_call(sfe, "GetClusterCapacity")['clusterCapacity']
+    counters = dict((name, float(capacity.get(name) or 0)) for name in COUNTERS)
+    counters['activeNodes'] = float(len(raw_call(sfe, "ListActiveNodes")['nodes']))
+    counters['sample_time'] = time.time()
+    counters['mvip'] = raw_call(sfe, "GetClusterInfo")['clusterInfo'].get('mvip')
+    return counters
+
+#Apply one formula to whole columns, undefined ratios become NaN
+def apply(formula, columns):
+    if numpy is not None:
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            values = numpy.asarray(formula(*columns), dtype=float)
+        values[~numpy.isfinite(values)] = numpy.nan
+        return values
+    values = []
+    for row in zip(*columns):
+        try:
+            values.append(float(formula(*row)))
+        except ZeroDivisionError:
+            values.append(float('nan'))
+    return values
+
+#Counter dicts of every cluster to named columns, derived columns included
+def capacity_columns(counters):
+    columns = {}
+    for name in COUNTERS:
+        column = [row[name] for row in counters]
+        columns[name] = numpy.array(column, dtype=float) if numpy is not None else column
+    for name, inputs, formula in FORMULAS:
+        columns[name] = apply(formula, [columns[field] for field in inputs])
+    return columns
+
+def finite(column):
+    if numpy is not None:
+        return column[numpy.isfinite(column)]
+    return [value for value in column if not math.isnan(value)]
+
+#Per cluster states: fullness against the limits, CRITICAL when a node loss can't be absorbed
+def capacity_states(columns, warn, crit):
+    states = []
+    for block, metadata, node_loss in zip(columns['block_fullness'], columns['metadata_fullness'],
+                                          columns['node_loss_free']):
+        exit_status = STATE_OK
+        for value in (block, metadata):
+            if not math.isnan(value):
+                exit_status = max(exit_status, range_check(crit, warn, value))
+        if not math.isnan(node_loss) and node_loss < 0:
+            exit_status = STATE_CRITICAL
+        states.append(exit_status)
+    return states
+
+#Fleet totals and extremes over the clusters that answered
+def capacity_rollup(columns, states, warn, crit):
+    if numpy is not None:
+        total, largest, smallest = numpy.sum, numpy.max, numpy.min
+        count_over = lambda column, limit: int(numpy.count_nonzero(column > limit))
+    else:
+        total, largest, smallest = sum, max, min
+        count_over = lambda column, limit: sum(1 for value in column if value > limit)
+    used = float(total(finite(columns['usedSpace'])))
+    usable = float(total(finite(columns['maxUsedSpace'])))
+    block = finite(columns['block_fullness'])
+    efficiency = finite(columns['efficiency'])
+    node_loss = finite(columns['node_loss_free'])
+    return {
+        'clusters': len(states),
+        'used_space': used,
+        'max_used_space': usable,
+        'fullness': used / usable * 100 if usable else float('nan'),
+        'worst_fullness': float(largest(block)) if len(block) else float('nan'),
+        'over_warn': count_over(block, warn),
+        'over_crit': count_over(block, crit),
+        'mean_efficiency': float(total(efficiency)) / len(efficiency) if len(efficiency) else float('nan'),
+        'min_node_loss_free': float(smallest(node_loss)) if len(node_loss) else float('nan'),
+        'not_ok': sum(1 for state in states if state != STATE_OK),
+    }
+
+#Record block fullness in the cluster's metric history and project the days until 90% full
+def days_to_full(directory, key, counters, n):
+    try:
+        with RingBuffer(history_path(directory, key)) as history:
+            history.append({'sample_time': counters['sample_time'], 'used_space': counters['usedSpace'],
+                            'max_used_space': counters['maxUsedSpace']})
+            latest, growth = fullness_growth(history, n)
+    except (IOError, OSError, ValueError):
+        return None
+    return days_until(90, latest, growth)
@@ -0,0 +1,180 @@
+# Pooled JSON-RPC client for the SolidFire Element API
+# One client holds a keep-alive session, so every call after the first reuses
+# the TLS connection instead of paying for a new handshake.
+import base64
+import json
+import time
+
+from sfcheck.fastjson import loads
+
+# requests is imported inside the client, so importing this module for
+# SFApiError alone does not pay for loading it
+
+# Statuses worth retrying, the MVIP returns these while it moves between nodes
+RETRY_STATUS = (500, 502, 503, 504)
+
+
+class SFApiError(Exception):
+    pass
+
+
+#The host could not be reached or did not answer in time
+class SFConnectionError(SFApiError):
+    pass
+
+
+#Build a urllib3 Retry that also retries POST, every method we send is a read
+def make_retry(retries, backoff):
+    from requests.packages.urllib3.util.retry import Retry
+    kwargs = dict(total=retries, connect=retries, read=retries,
+                  backoff_factor=backoff, status_forcelist=RETRY_STATUS,
+                  raise_on_status=False)
+    try:
+        return Retry(allowed_methods=frozenset(["POST"]), **kwargs)
+    except TypeError:
+        # urllib3 before 1.26 calls it method_whitelist
+        return Retry(method_whitelist=frozenset(["POST"]), **kwargs)
+
+
+class SFClient(object):
+
+    def __init__(self, host, port=443, username="", password="",
+                 murl="/json-rpc/9.0", connect_timeout=10, read_timeout=60,
+                 retries=3, backoff=0.5, pool_size=10, verify=False):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.host = host
+        self.url = "https://" + host + ":" + str(port) + murl
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+        self.next_id = 0
+        # A sfcheck.profiling.Profile that records every round trip, when set
+        self.profile = None
+        # A sfcheck.snapshot.Recorder that keeps every response, when set
+        self.recorder = None
+        auth = base64.b64encode((username + ":" + password).encode('utf-8'))
+        self.headers = {
+            'content-type': "application/json",
+            'authorization': "Basic " + bytes.decode(auth)
+        }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=make_retry(retries, backoff))
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    #POST one JSON-RPC payload and return the decoded body
+    def post(self, payload):
+        start = time.time()
+        body = self.send(payload)
+        if self.profile is not None:
+            if isinstance(payload, list):
+                method = "batch[" + str(len(payload)) + "]"
+            else:
+                method = payload.get("method", "")
+            self.profile.record_call(method, time.time() - start, len(body), body.count(b'{'))
+        if self.recorder is not None:
+            self.recorder.record(payload, body)
+        try:
+            return loads(body)
+        except ValueError as e:
+            raise SFApiError("Invalid response from host: " + self.host + " (" + str(e) + ")")
+
+    #Send the payload over the session and return the response body as bytes
+    def send(self, payload):
+        return self.send_data(json.dumps(payload)).content
+
+    #POST an encoded request and return the response
+    def send_data(self, data):
+        from requests import RequestException
+        try:
+            return self.session.post(self.url, data=data, timeout=self.timeout, verify=self.verify)
+        except RequestException as e:
+            raise SFConnectionError("Unable to connect to host: " + self.host + " (" + str(e) + ")")
+
+    def request(self, method, params=None):
+        self.next_id += 1
+        return {"method": method, "params": params or {}, "id": self.next_id}
+
+    #Call a single method and return its result
+    def call(self, method, params=None):
+        response = self.post(self.request(method, params))
+        return self.result(method, response)
+
+    #Send several methods as one JSON-RPC batch array and split the results back out by id.
+    #methods is a list of method names or (method, params) tuples, results come back in the same order
+    def batch(self, methods):
+        batch = []
+        for method in methods:
+            if isinstance(method, tuple):
+                batch.append(self.request(method[0], method[1]))
+            else:
+                batch.append(self.request(method))
+        response = self.post(batch)
+
+        #An endpoint that does not take batch arrays answers with a single error object.
+        #In that case send the calls concurrently, they still share the session's pooled connections
+        if not isinstance(response, list):
+            response = self.concurrent(batch)
+
+        by_id = {}
+        for entry in response:
+            if isinstance(entry, dict) and 'id' in entry:
+                by_id[entry['id']] = entry
+        return [self.result(request['method'], by_id.get(request['id'], {}))
+                for request in batch]
+
+    def concurrent(self, batch):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def post_one(request):
+            try:
+                return self.post(request)
+            except SFApiError:
+                return {"id": request["id"]}
+        with ThreadPoolExecutor(max_workers=len(batch)) as executor:
+            return list(executor.map(post_one, batch))
+
+    @staticmethod
+    def result(method, response):
+        if 'result' not in response:
+            if 'error' in response:
+                raise SFApiError(method + " failed: " + str(response['error'].get('message')))
+            raise SFApiError("Invalid response received for " + method)
+        return response['result']
+
+
+#Dispatcher for an ElementFactory connection that posts over an SFClient session.
+#SDK methods and raw calls share its keep-alive connection instead of opening one per call,
+#and a successful response is handed on as the undecoded bytes for raw_call to decode once
+class ElementDispatcher(object):
+
+    def __init__(self, client):
+        self.client = client
+
+    def post(self, data):
+        response = self.client.send_data(data)
+        if not response.content:
+            return {"code": response.status_code, "name": response.reason, "message": ""}
+        # The SDK looks for the error in the text of a non-JSON error page
+        if response.status_code != 200:
+            return response.text
+        return response.content
+
+    def timeout(self, timeout_in_sec):
+        self.client.timeout = (self.client.timeout[0], int(timeout_in_sec))
+
+    def connect_timeout(self, timeout_in_sec):
+        self.client.timeout = (int(timeout_in_sec), self.client.timeout[1])
+
+    def restore_timeout_defaults(self):
+        self.client.timeout = (30, 300)
@@ -0,0 +1,100 @@
+# Counting collectors for volumes and iSCSI sessions
+# Responses are decoded straight from the raw JSON and counted, without
+# building SDK model objects. ListVolumes is paged, so memory stays flat
+# however many volumes the cluster has.
+import itertools
+import json
+
+from sfcheck.client import SFApiError
+from sfcheck.fastjson import loads
+
+# Volumes requested per ListVolumes page
+VOLUME_PAGE = 1000
+
+#Call a method over the SDK connection and return the decoded result dict
+def raw_call(sfe, method, params=None):
+    raw = sfe.send_request(method, None, params or {}, return_response_raw=True)
+    if isinstance(raw, dict):
+        raise SFApiError(method + " failed: " + str(raw.get('message')))
+    try:
+        response = loads(raw)
+    except ValueError as e:
+        raise SFApiError(method + " failed: invalid response (" + str(e) + ")")
+    if 'result' not in response:
+        raise SFApiError(method + " failed: " + str(response.get('error', {}).get('message')))
+    return response['result']
+
+#Let raw calls on an SDK connection skip the SDK's own decode of the response, which
+#raw_call would only repeat. SDK methods still go through the original send_request, and
+#wrappers installed afterwards, the profile, metrics and recorder, see raw calls as before
+def decode_once(sfe):
+    send_request = sfe.send_request
+    ids = itertools.count(1)
+
+    def raw_send_request(method_name, result_type, params=None, since=None, deprecated=None,
+                         return_response_raw=False):
+        if not return_response_raw:
+            return send_request(method_name, result_type, params, since, deprecated)
+        return sfe._dispatcher.post(json.dumps({'method': method_name, 'id': next(ids), 'params': params or {}}))
+    sfe.send_request = raw_send_request
+    return sfe
+
+#Yield volumes one page at a time using ListVolumes startVolumeID and limit
+def iter_volume_pages(sfe, page_size=VOLUME_PAGE):
+    start = 0
+    while True:
+        volumes = raw_call(sfe, "ListVolumes", {"startVolumeID": start, "limit": page_size})['volumes']
+        if volumes:
+            yield volumes
+        if len(volumes) < page_size:
+            return
+        start = volumes[-1]['volumeID'] + 1
+
+def count_volumes(sfe, page_size=VOLUME_PAGE):
+    num_vols = 0
+    for volumes in iter_volume_pages(sfe, page_size):
+        num_vols += len(volumes)
+    return {'num_vols': num_vols}
+
+def count_sessions(sfe):
+    return {'num_sessions': len(raw_call(sfe, "ListISCSISessions")['sessions'])}
+
+def increment(counts, key, by=1):
+    counts[key] = counts.get(key, 0) + by
+
+#Count volumes and sessions per account and per volume access group from the same stream.
+#Sessions carry no access group, they are attributed to the groups of the volume they log in to.
+def count_breakdown(sfe, page_size=VOLUME_PAGE):
+    num_vols = 0
+    vols_by_account = {}
+    vols_by_group = {}
+    volume_groups = {}
+    for volumes in iter_volume_pages(sfe, page_size):
+        for vol in volumes:
+            num_vols += 1
+            # A record without an ID is left out of the breakdown, None keys would not sort with the IDs
+            if vol.get('accountID') is not None:
+                increment(vols_by_account, vol['accountID'])
+            groups = [group for group in vol.get('volumeAccessGroups') or [] if group is not None]
+            for group in groups:
+                increment(vols_by_group, group)
+            if groups:
+                volume_groups[vol['volumeID']] = groups
+
+    sessions = raw_call(sfe, "ListISCSISessions")['sessions']
+    sessions_by_account = {}
+    sessions_by_group = {}
+    for session in sessions:
+        if session.get('accountID') is not None:
+            increment(sessions_by_account, session['accountID'])
+        for group in volume_groups.get(session.get('volumeID'), ()):
+            increment(sessions_by_group, group)
+
+    return {
+        'num_vols': num_vols,
+        'num_sessions': len(sessions),
+        'vols_by_account': vols_by_account,
+        'vols_by_group': vols_by_group,
+        'sessions_by_account': sessions_by_account,
+        'sessions_by_group': sessions_by_group,
+    }
@@ -0,0 +1,282 @@
+# Resident daemon mode for the element check
+# One ElementFactory connection stays open and each collector is refreshed on
+# its own TTL. Every poll result can be pushed to Nagios as a passive check,
+# is served to thin clients over a local unix socket and can refresh the
+# Prometheus exporter's snapshot. With a fault tracker the cluster's active
+# faults are followed too, de-duplicated in memory across polls. A fleet daemon
+# runs one such poller per cluster, each on its own adaptive cadence.
+import os
+import random
+import socket
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from sfcheck.element import collect_cluster, evaluate, summarize
+from sfcheck.faults import evaluate_faults, summarize_faults
+from sfcheck.nagios import STATE_OK, STATE_UNKNOWN, status_name
+from sfcheck.scheduler import Cadence, LatencyMeter, Scheduler
+
+# Seconds each collector's result stays fresh. Cluster info and version
+# rarely change, stats are wanted on every poll.
+DEFAULT_TTLS = {
+    'info': 3600,
+    'version': 3600,
+    'drives': 300,
+    'state': 60,
+    'sessions': 120,
+    'stats': 0,
+    'volumes': 300,
+    'capacity': 300,
+}
+
+#Parse name=seconds overrides from the command line into a TTL table
+def parse_ttls(overrides, defaults=DEFAULT_TTLS):
+    ttls = dict(defaults)
+    for override in overrides or []:
+        name, _, seconds = override.partition("=")
+        if name not in ttls:
+            raise ValueError("unknown collector " + name + ", use one of " + ", ".join(sorted(ttls)))
+        ttls[name] = float(seconds)
+    return ttls
+
+
+class TTLCache(object):
+
+    def __init__(self, ttls, jitter=0):
+        self.ttls = ttls
+        self.jitter = jitter
+        # Factor every TTL is stretched by, the daemon raises it while the MVIP is slow
+        self.scale = 1.0
+        self.entries = {}
+
+    #Seconds a fresh value of name is kept, moved by up to jitter either way so refreshes drift apart
+    def lifetime(self, name):
+        ttl = self.ttls.get(name, 0) * self.scale
+        if ttl and self.jitter:
+            ttl *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return ttl
+
+    #Return the cached value for name, calling fetch() when it is missing or expired
+    def get(self, name, fetch):
+        now = time.time()
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = fetch()
+        self.entries[name] = (now + self.lifetime(name), value)
+        return value
+
+    def invalidate(self, name=None):
+        if name is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(name, None)
+
+
+#Write one result to the Nagios external command file
+def submit_passive(command_file, host, service, exit_status, output):
+    line = "[%d] PROCESS_SERVICE_CHECK_RESULT;%s;%s;%d;%s\n" % (
+        int(time.time()), host, service, exit_status, output.replace("\n", " "))
+    with open(command_file, 'a') as f:
+        f.write(line)
+
+#Ask a running daemon for its latest result, returns the exit state and output line
+def query(socket_path, timeout=10):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        data = b""
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        client.close()
+    status, _, output = data.decode('utf-8').partition("\n")
+    return int(status), output.rstrip("\n")
+
+
+class ResultHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        exit_status, output = self.server.daemon_check.latest_result()
+        self.wfile.write((str(exit_status) + "\n" + output + "\n").encode('utf-8'))
+
+
+class ResultServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+#Serve check.latest_result() on a unix socket from a background thread
+def start_result_server(socket_path, check):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = ResultServer(socket_path, ResultHandler)
+    server.daemon_check = check
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def stop_result_server(server, socket_path):
+    server.shutdown()
+    server.server_close()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+
+class CheckDaemon(object):
+
+    def __init__(self, sfe, interval=60, ttls=None, nagios_cmd=None, nagios_host=None,
+                 nagios_service="SolidFire Cluster", socket_path=None,
+                 check_utilization=1, check_sessions=1, exporter=None, fault_tracker=None,
+                 cadence=None, connect=None, label=None):
+        # Without sfe the first poll opens the connection with connect(), and retries on the next poll
+        self.sfe = sfe
+        self.connect = connect
+        self.label = label
+        self.interval = interval
+        self.cadence = cadence or Cadence(interval)
+        self.meter = LatencyMeter()
+        self.cache = TTLCache(ttls or DEFAULT_TTLS, self.cadence.jitter)
+        self.nagios_cmd = nagios_cmd
+        self.nagios_host = nagios_host
+        self.nagios_service = nagios_service
+        self.socket_path = socket_path
+        self.check_utilization = check_utilization
+        self.check_sessions = check_sessions
+        self.exporter = exporter
+        self.fault_tracker = fault_tracker
+        self.lock = threading.Lock()
+        self.latest = (STATE_UNKNOWN, "UNKNOWN - no poll has completed yet", time.time())
+        self.server = None
+        if sfe is not None:
+            self.meter.instrument(sfe)
+
+    def fetch(self, name, collector):
+        return self.cache.get(name, lambda: collector(self.sfe))
+
+    #Collect from cache or the API, evaluate and publish the result.
+    #The outcome and the API latency set the cadence of the next poll
+    def poll_once(self):
+        start = time.time()
+        cluster = None
+        try:
+            if self.sfe is None:
+                self.sfe = self.meter.instrument(self.connect())
+            cluster = collect_cluster(self.sfe, self.fetch)
+            exit_status, cluster_util, num_sessions = evaluate(
+                cluster, self.check_utilization, self.check_sessions)
+            fault_summary = ""
+            if self.fault_tracker is not None:
+                report = self.fault_tracker.update(self.sfe)
+                fault_status, counts = evaluate_faults(report)
+                exit_status = max(exit_status, fault_status)
+                fault_summary = " " + summarize_faults(report, counts)
+            output = summarize(cluster, exit_status, cluster_util, num_sessions) + fault_summary
+            host = self.nagios_host or cluster['cluster_name']
+        except Exception as e:
+            # Drop everything cached so the next poll starts from a clean sweep
+            self.cache.invalidate()
+            cluster = None
+            exit_status = STATE_UNKNOWN
+            output = "UNKNOWN - poll failed: " + (str(e) or e.__class__.__name__)
+            host = self.nagios_host
+        self.cadence.observe(exit_status, self.meter.take())
+        self.cache.scale = self.cadence.backoff
+        with self.lock:
+            self.latest = (exit_status, output, time.time())
+        if self.exporter is not None:
+            self.exporter.update(cluster, exit_status, time.time() - start)
+        if self.nagios_cmd and host:
+            submit_passive(self.nagios_cmd, host, self.nagios_service, exit_status, output)
+        return exit_status, output
+
+    #Poll for the fleet scheduler, returns the seconds until the next poll
+    def scheduled_poll(self):
+        try:
+            self.poll_once()
+        except Exception as e:
+            # A poll that could not be published is retried on the usual cadence
+            with self.lock:
+                self.latest = (STATE_UNKNOWN, "UNKNOWN - poll failed: " + (str(e) or e.__class__.__name__),
+                               time.time())
+        return self.cadence.delay
+
+    #Latest result for socket clients, a result older than three poll delays is reported as stale
+    def latest_result(self):
+        with self.lock:
+            exit_status, output, polled = self.latest
+        age = time.time() - polled
+        if age > max(self.interval, self.cadence.delay) * 3:
+            return STATE_UNKNOWN, "UNKNOWN - last result is " + str(int(age)) + "s old: " + output
+        return exit_status, output
+
+    def serve(self):
+        self.server = start_result_server(self.socket_path, self)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+        if self.server is not None:
+            stop_result_server(self.server, self.socket_path)
+            self.server = None
+
+    #Poll every interval until interrupted
+    def run(self):
+        if self.socket_path:
+            self.serve()
+        if self.exporter is not None:
+            self.exporter.serve()
+        try:
+            while True:
+                start = time.time()
+                self.poll_once()
+                time.sleep(max(0, self.cadence.delay - (time.time() - start)))
+        finally:
+            self.shutdown()
+
+
+#Poll every cluster of an inventory from one process, each CheckDaemon on its own cadence.
+#First polls are spread over one interval so the clusters never share a start second
+class FleetDaemon(object):
+
+    def __init__(self, daemons, workers=8, socket_path=None):
+        self.daemons = daemons
+        self.workers = workers
+        self.socket_path = socket_path
+        self.server = None
+
+    #Worst state across the fleet and one line per cluster
+    def latest_result(self):
+        exit_status = STATE_OK
+        not_ok = 0
+        lines = []
+        for daemon in self.daemons:
+            cluster_status, output = daemon.latest_result()
+            exit_status = max(exit_status, cluster_status)
+            if cluster_status != STATE_OK:
+                not_ok += 1
+            lines.append(daemon.label + ": " + output)
+        summary = (status_name(exit_status).lstrip("*").upper() + " - Fleet: " + str(len(self.daemons)) +
+                   " clusters, " + str(not_ok) + " not OK")
+        return exit_status, "\n".join([summary] + lines)
+
+    def run(self):
+        if self.socket_path:
+            self.server = start_result_server(self.socket_path, self)
+        scheduler = Scheduler(self.workers)
+        for daemon in self.daemons:
+            scheduler.add(daemon.scheduled_poll, random.uniform(0, daemon.cadence.interval))
+        try:
+            scheduler.run()
+        finally:
+            if self.server is not None:
+                stop_result_server(self.server, self.socket_path)
+                self.server = None
@@ -0,0 +1,64 @@
+# Per node drive index built in one pass over ListDrives
+# Checks look a node up in the index instead of rescanning every drive per node.
+from sfcheck.counting import raw_call
+
+
+#The ListDrives fields the checks use, named like the SDK's Drive model
+class Drive(object):
+    __slots__ = ('drive_id', 'node_id', 'slot', 'type', 'status')
+
+    def __init__(self, drive):
+        self.drive_id = drive.get('driveID')
+        self.node_id = drive.get('nodeID')
+        self.slot = drive.get('slot')
+        self.type = drive.get('type')
+        self.status = drive.get('status')
+
+def list_drives(sfe):
+    return [Drive(drive) for drive in raw_call(sfe, "ListDrives")['drives']]
+
+#Counters for one node, data drives are type block and metadata drives type volume
+def new_counts():
+    return {
+        'num_data_drives': 0,
+        'num_meta_drives': 0,
+        'error_data_drives': 0,
+        'error_meta_drives': 0,
+        'failed_drives': [],
+    }
+
+#Build {node_id: counters} from a ListDrives drive list, any status other than active counts as an error
+def index_drives(drives):
+    index = {}
+    for drive in drives:
+        if drive.type == "block":
+            active_key, error_key = 'num_data_drives', 'error_data_drives'
+        elif drive.type == "volume":
+            active_key, error_key = 'num_meta_drives', 'error_meta_drives'
+        else:
+            continue
+        counts = index.get(drive.node_id)
+        if counts is None:
+            counts = index[drive.node_id] = new_counts()
+        if drive.status == "active":
+            counts[active_key] += 1
+        else:
+            counts[error_key] += 1
+            counts['failed_drives'].append({'drive_id': drive.drive_id, 'slot': drive.slot,
+                                            'type': drive.type, 'status': drive.status})
+    return index
+
+#Counters for one node, nodes without drives get zeroed counters
+def node_drives(index, node_id):
+    counts = index.get(node_id)
+    if counts is None:
+        return new_counts()
+    return counts
+
+#Failed drives across the cluster, for checks that only care about errors
+def failed_drives(index):
+    failed = []
+    for node_id in sorted(index):
+        for drive in index[node_id]['failed_drives']:
+            failed.append(dict(drive, node_id=node_id))
+    return failed
@@ -0,0 +1,214 @@
+# Collectors for the ElementFactory based cluster check
+# Each collector makes one API call and returns plain values, so the single
+# cluster check and the fleet poller share the same gathering code. Responses
+# are decoded once from the raw JSON, without building SDK model objects.
+import time
+
+from sfcheck.counting import raw_call, decode_once, count_volumes, count_sessions, count_breakdown
+from sfcheck.drives import list_drives, index_drives, node_drives
+from sfcheck.nagios import STATE_OK, range_check, add_note, status_name
+
+#Open an ElementFactory connection to an MVIP, posting over a pooled keep-alive session
+def connect(mvip, username, password, timeout=300):
+    from solidfire.factory import ElementFactory
+    from sfcheck.client import SFClient, ElementDispatcher
+    sfe = ElementFactory.create(mvip, username, password, print_ascii_art=False, timeout=timeout)
+    dispatcher = sfe._dispatcher
+    client = SFClient(mvip, username=username, password=password, connect_timeout=dispatcher._connect_timeout,
+                      read_timeout=dispatcher._timeout, verify=dispatcher._verify_ssl)
+    client.url = dispatcher._endpoint
+    sfe._dispatcher = ElementDispatcher(client)
+    return decode_once(sfe)
+
+#Gather name, VIPs, ensemble and protection from GetClusterInfo
+def collect_info(sfe):
+    info = raw_call(sfe, "GetClusterInfo")['clusterInfo']
+    if info.get('repCount') == 2:
+        helix_protection = 'double'
+    # Commented lines below are for understanding rep_count
+    # There is no triple or quadruple helix currently
+    # elif info.get('repCount') == 3:
+        # helix_protection = 'triple'
+    # elif info.get('repCount') == 4:
+        # helix_protection = "quadruple"
+    else:
+        helix_protection = None
+    return {
+        'cluster_name': info.get('name'),
+        'mvip_ip': info.get('mvip'),
+        'mvip_node': info.get('mvipNodeID'),
+        'mvip_bond': info.get('mvipInterface'),
+        'svip_ip': info.get('svip'),
+        'svip_bond': info.get('svipInterface'),
+        'svip_node': info.get('svipNodeID'),
+        'encrypt_state': info.get('encryptionAtRestState'),
+        'ensemble_member': list(info.get('ensemble') or []),
+        'iqn_id': info.get('uniqueID'),
+        'helix_protection': helix_protection,
+    }
+
+#Gather Element OS and API versions from GetClusterVersionInfo
+def collect_version(sfe):
+    version_info = raw_call(sfe, "GetClusterVersionInfo")
+    return {
+        'element_api_ver': version_info.get('clusterAPIVersion'),
+        'element_os_ver': version_info.get('clusterVersion'),
+    }
+
+#Gather drives from ListDrives, indexed by node in a single pass
+def collect_drives(sfe):
+    return index_drives(list_drives(sfe))
+
+#Gather node state from GetClusterState
+def collect_state(sfe):
+    nodes = []
+    num_nodes = 0
+    ensemble_count = 0
+    cluster_state = raw_call(sfe, "GetClusterState", {"force": True})
+    for node in cluster_state.get('nodes') or []:
+        num_nodes += 1
+        if node.get('nodeID') == 0:
+            continue
+        row = {'node_id': node.get('nodeID')}
+        # A node that isn't part of the cluster has no result
+        result = node.get('result')
+        if result is not None:
+            row['state'] = result.get('state')
+            row['cluster_name'] = result.get('cluster')
+            row['in_cluster'] = True
+            ensemble_count += 1
+        else:
+            row['state'] = None
+            row['cluster_name'] = None
+            row['in_cluster'] = False
+        nodes.append(row)
+    return {'nodes': nodes, 'num_nodes': num_nodes, 'ensemble_count': ensemble_count}
+
+#Add per node drive counts from the drive index to a collect_state result
+def add_drive_counts(state, drive_index):
+    nodes = []
+    for node in state['nodes']:
+        row = dict(node)
+        row.update(node_drives(drive_index, node['node_id']))
+        nodes.append(row)
+    return {'nodes': nodes, 'num_nodes': state['num_nodes'], 'ensemble_count': state['ensemble_count']}
+
+def collect_sessions(sfe):
+    return count_sessions(sfe)
+
+#Gather cluster metrics from GetClusterStats
+def collect_stats(sfe):
+    stats = raw_call(sfe, "GetClusterStats")['clusterStats']
+    read_bytes = stats['readBytes']
+    write_bytes = stats['writeBytes']
+    read_ops = stats['readOps']
+    write_ops = stats['writeOps']
+    read_Gibytes = round((read_bytes/1024/1024/1024),2)
+    write_Gibytes = round((write_bytes/1024/1024/1024),2)
+    total_Gibytes = (read_Gibytes + write_Gibytes)
+    total_ops = read_ops + write_ops
+    return {
+        'read_bytes': read_bytes,
+        'read_Gibytes': read_Gibytes,
+        'read_ops': read_ops,
+        'read_latent': stats.get('readLatencyUSec'),
+        'write_bytes': write_bytes,
+        'write_Gibytes': write_Gibytes,
+        'write_ops': write_ops,
+        'write_latent': stats.get('writeLatencyUSec'),
+        'cluster_util': float(stats['clusterUtilization']),
+        'total_Gibytes': total_Gibytes,
+        'total_ops': total_ops,
+        'average_iop_size': stats.get('averageIOPSize'),
+        'pct_read_bytes': percent(read_Gibytes, total_Gibytes),
+        'pct_write_bytes': percent(write_Gibytes, total_Gibytes),
+        'pct_read_ops': percent(read_ops, total_ops),
+        'pct_write_ops': percent(write_ops, total_ops),
+        'cluster_latent': stats.get('latencyUSec'),
+        'sample_time': time.time(),
+    }
+
+#Gather block and metadata space from GetClusterCapacity
+def collect_capacity(sfe):
+    capacity = raw_call(sfe, "GetClusterCapacity")['clusterCapacity']
+    return {
+        'used_space': capacity.get('usedSpace'),
+        'max_used_space': capacity.get('maxUsedSpace'),
+        'used_metadata_space': capacity.get('usedMetadataSpace'),
+        'max_used_metadata_space': capacity.get('maxUsedMetadataSpace'),
+        'provisioned_space': capacity.get('provisionedSpace'),
+        'max_provisioned_space': capacity.get('maxProvisionedSpace'),
+    }
+
+def collect_volumes(sfe):
+    return count_volumes(sfe)
+
+def percent(part, total):
+    if not total:
+        return 0.0
+    return round((part/total)*100,2)
+
+#Run every collector against one cluster and merge the results
+#fetch(name, collector) returns collector(sfe) by default, the daemon passes one that caches by name
+#breakdown adds per account and per access group volume and session counts
+def collect_cluster(sfe, fetch=None, breakdown=False):
+    if fetch is None:
+        fetch = lambda name, collector: collector(sfe)
+    cluster = {}
+    cluster.update(fetch('info', collect_info))
+    cluster.update(fetch('version', collect_version))
+    cluster['drive_index'] = fetch('drives', collect_drives)
+    cluster.update(add_drive_counts(fetch('state', collect_state), cluster['drive_index']))
+    if breakdown:
+        cluster.update(fetch('breakdown', count_breakdown))
+        cluster.update(fetch('stats', collect_stats))
+    else:
+        cluster.update(fetch('sessions', collect_sessions))
+        cluster.update(fetch('stats', collect_stats))
+        cluster.update(fetch('volumes', collect_volumes))
+    cluster.update(fetch('capacity', collect_capacity))
+    return cluster
+
+#Fields kept in the metric history for one collected cluster
+def history_values(cluster):
+    return {
+        'sample_time': cluster['sample_time'],
+        'cluster_util': cluster['cluster_util'],
+        'used_space': cluster['used_space'],
+        'max_used_space': cluster['max_used_space'],
+        'latency_usec': cluster['cluster_latent'],
+        'read_latency_usec': cluster['read_latent'],
+        'write_latency_usec': cluster['write_latent'],
+    }
+
+#Apply the utilization and session thresholds
+#Returns the exit state plus the utilization and session values with any error notes added
+def evaluate(cluster, check_utilization=1, check_sessions=1, exit_status=STATE_OK):
+    cluster_util = str(cluster['cluster_util'])
+    num_sessions = str(cluster['num_sessions'])
+    if check_utilization == 1:
+        test_result=range_check(90, 80, float(cluster['cluster_util']))
+        exit_status, cluster_util=add_note(test_result, exit_status, cluster_util)
+
+    #In SolidFire OS v.5 we have a soft limit of 250 Volumes * 4 active sessions per node
+    max_sessions=cluster['ensemble_count'] * 1000
+    warn_sessions=max_sessions * .90
+    if check_sessions == 1:
+        test_result=range_check(max_sessions, warn_sessions, cluster['num_sessions'])
+        exit_status, num_sessions=add_note(test_result, exit_status, num_sessions)
+    return exit_status, cluster_util, num_sessions
+
+#Connect, collect and evaluate one inventory entry, used by the fleet poller
+def check_cluster(entry):
+    sfe = connect(entry['mvip'], entry['username'], entry['password'])
+    cluster = collect_cluster(sfe)
+    return evaluate(cluster)[0], cluster
+
+#One line plugin output, used for passive check results and the daemon socket
+def summarize(cluster, exit_status, cluster_util, num_sessions):
+    return (status_name(exit_status).lstrip("*").upper() + " - " + str(cluster['cluster_name']) +
+            " Version: " + str(cluster['element_os_ver']) +
+            " Utilization: " + cluster_util + "%" +
+            " iSCSI Sessions: " + num_sessions +
+            " Nodes: " + str(cluster['num_nodes']) +
+            " Volumes: " + str(cluster['num_vols']))
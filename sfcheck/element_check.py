@@ -0,0 +1,954 @@
+# ElementFactory based cluster check as an importable entry point
+# main() parses its own argv and returns the Nagios state instead of exiting,
+# so a scheduler can run the check in-process.  Each mode builds a CheckResult
+# that is rendered once in the format asked for.  The SDK and the modules used
+# by a single mode are imported inside that mode, keeping plugin startup to the
+# interpreter plus argparse.
+import argparse
+import sys
+import time
+
+from sfcheck.nagios import STATE_OK, STATE_UNKNOWN
+from sfcheck.nagios import add_note, status_name
+from sfcheck.output import CheckResult, FORMATS, default_format, format_number, render, write_output
+from sfcheck.profiling import Profile
+
+version="1.8 2018-Aug-14"
+
+checkUtilization=1 #Generate Alerts on the utilization of cluster space
+checkSessions=1    #Generate Alerts on the number of iSCSI sessions
+checkDiskUse=0     #Generate Alerts on disk access
+
+#Set vars for connectivity using argparse
+def build_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-sm', type=str,
+                        metavar='mvip',
+                        help='MVIP/node name or IP')
+    parser.add_argument('-su', type=str,
+                        metavar='username',
+                        help='username to connect with')
+    parser.add_argument('-sp', type=str,
+                        metavar='password',
+                        help='password for user')
+    parser.add_argument('-f', type=str,
+                        metavar='inventory',
+                        help='poll every cluster in an inventory file (MVIP USERNAME PASSWORD per line) instead of -sm/-su/-sp')
+    parser.add_argument('-w', type=int,
+                        default=8,
+                        metavar='workers',
+                        help='clusters polled at once in fleet mode, default 8')
+    parser.add_argument('--processes', type=int,
+                        default=1,
+                        metavar='N',
+                        help='fleet mode shards the inventory across N worker processes of -w clusters each, '
+                             'results come back through shared memory, default 1')
+    parser.add_argument('--daemon', action='store_true',
+                        help='stay resident and poll the cluster every --interval seconds, with -f every cluster of the inventory')
+    parser.add_argument('--interval', type=float,
+                        default=60,
+                        metavar='seconds',
+                        help='daemon poll interval, default 60')
+    parser.add_argument('--alert-interval', type=float,
+                        metavar='seconds',
+                        help='daemon poll interval while the cluster is WARNING or CRITICAL, default a quarter of --interval')
+    parser.add_argument('--jitter', type=float,
+                        default=0.1,
+                        metavar='fraction',
+                        help='daemon moves every poll and collector refresh by up to this fraction of its interval, default 0.1')
+    parser.add_argument('--latency-limit', type=float,
+                        default=2.0,
+                        metavar='seconds',
+                        help='daemon backs off while the mean API call latency is above this, default 2')
+    parser.add_argument('--max-backoff', type=float,
+                        default=8,
+                        metavar='factor',
+                        help='most the daemon stretches the poll interval and collector TTLs when backing off, default 8')
+    parser.add_argument('--ttl', action='append',
+                        metavar='collector=seconds',
+                        help='daemon or --cache lifetime for one collector (info, version, drives, state, sessions, breakdown, stats, volumes, capacity), may be repeated')
+    parser.add_argument('--nagios-cmd', type=str,
+                        metavar='path',
+                        help='daemon submits each result as a passive check to this Nagios command file')
+    parser.add_argument('--nagios-host', type=str,
+                        metavar='host',
+                        help='Nagios host name for passive results, default is the cluster name')
+    parser.add_argument('--nagios-service', type=str,
+                        default='SolidFire Cluster',
+                        metavar='service',
+                        help='Nagios service description for passive results')
+    parser.add_argument('--socket', type=str,
+                        metavar='path',
+                        help='with --daemon serve results on this unix socket, without it read the latest result from a running daemon')
+    parser.add_argument('--metrics-listen', type=str,
+                        metavar='[host:]port',
+                        help='run as a daemon that serves Prometheus metrics on http://host:port/metrics')
+    parser.add_argument('--breakdown', action='store_true',
+                        help='also count volumes and iSCSI sessions per account and per volume access group')
+    parser.add_argument('--cache', action='store_true',
+                        help='keep slow moving responses in --state-dir between runs, refetched when their TTL runs out or the set of cluster faults changes')
+    parser.add_argument('--state-dir', type=str,
+                        metavar='path',
+                        help='directory for the per cluster samples, history and cursors, default /tmp, '
+                             'or a scratch directory that is removed afterwards with --replay')
+    parser.add_argument('--record', type=str,
+                        metavar='path',
+                        help='save every API response of this run to a gzip compressed snapshot, '
+                             'a directory gets one file per run')
+    parser.add_argument('--replay', type=str,
+                        metavar='snapshot',
+                        help='run the check against a recorded snapshot instead of the cluster, -su and -sp are not needed')
+    parser.add_argument('--mode', type=str,
+                        choices=['cluster', 'trend', 'hotspot', 'faults', 'capacity', 'nodes', 'sessions'],
+                        help='cluster runs the full health check, trend alerts on fullness growth and latency history, '
+                             'hotspot ranks volumes by latency, IOPS and throttle, faults reports active cluster faults '
+                             'and the events since the last run (with --daemon, alongside the cluster check), capacity '
+                             'checks fullness, efficiency and node loss headroom for -sm or every cluster in -f, '
+                             'nodes reports per node CPU, IOPS and throughput with imbalance and outliers, sessions '
+                             'checks iSCSI sessions per node against the node limit and the paths of every initiator '
+                             'to each of its volumes.  Default cluster, or the recorded mode with --replay')
+    parser.add_argument('--samples', type=int,
+                        default=60,
+                        metavar='N',
+                        help='trend mode looks at the last N history samples, default 60')
+    parser.add_argument('--days-warn', type=float,
+                        default=30,
+                        metavar='days',
+                        help='trend mode warns when block fullness reaches 90%% within this many days, default 30')
+    parser.add_argument('--days-crit', type=float,
+                        default=7,
+                        metavar='days',
+                        help='trend mode is critical when block fullness reaches 90%% within this many days, default 7')
+    parser.add_argument('--latency-warn', type=float,
+                        default=10000,
+                        metavar='usec',
+                        help='trend mode warns when p95 cluster latency is above this, hotspot mode when any volume is, default 10000')
+    parser.add_argument('--latency-crit', type=float,
+                        default=30000,
+                        metavar='usec',
+                        help='trend mode is critical when p95 cluster latency is above this, hotspot mode when any volume is, default 30000')
+    parser.add_argument('--capacity-warn', type=float,
+                        default=80,
+                        metavar='percent',
+                        help='capacity mode warns when block or metadata fullness is above this, default 80')
+    parser.add_argument('--capacity-crit', type=float,
+                        default=90,
+                        metavar='percent',
+                        help='capacity mode is critical when block or metadata fullness is above this, default 90')
+    parser.add_argument('--cpu-warn', type=float,
+                        default=80,
+                        metavar='percent',
+                        help='nodes mode warns when a node\'s CPU is above this, default 80')
+    parser.add_argument('--cpu-crit', type=float,
+                        default=95,
+                        metavar='percent',
+                        help='nodes mode is critical when a node\'s CPU is above this, default 95')
+    parser.add_argument('--imbalance-warn', type=float,
+                        default=2.0,
+                        metavar='ratio',
+                        help='nodes mode warns when the busiest node\'s CPU is this many times the mean, default 2.0')
+    parser.add_argument('--imbalance-crit', type=float,
+                        default=3.0,
+                        metavar='ratio',
+                        help='nodes mode is critical when the busiest node\'s CPU is this many times the mean, default 3.0')
+    parser.add_argument('--node-session-limit', type=int,
+                        default=1000,
+                        metavar='N',
+                        help='sessions mode is critical when a node has more iSCSI sessions than this and warns above 90%% of it, default 1000')
+    parser.add_argument('--min-paths', type=int,
+                        default=2,
+                        metavar='N',
+                        help='sessions mode warns when an initiator has fewer sessions than this to one of its volumes, default 2')
+    parser.add_argument('--max-paths', type=int,
+                        default=8,
+                        metavar='N',
+                        help='sessions mode warns when an initiator has more sessions than this to one of its volumes, default 8')
+    parser.add_argument('--top', type=int,
+                        default=10,
+                        metavar='K',
+                        help='hotspot mode lists the top K volumes in each ranking, sessions mode the top K initiators and volumes, default 10')
+    parser.add_argument('--throttle-warn', type=float,
+                        default=0.5,
+                        metavar='fraction',
+                        help='hotspot mode warns when a volume is throttled more than this, default 0.5')
+    parser.add_argument('--throttle-crit', type=float,
+                        default=0.8,
+                        metavar='fraction',
+                        help='hotspot mode is critical when a volume is throttled more than this, default 0.8')
+    parser.add_argument('--profile', action='store_true',
+                        help='add the time spent in each phase and API call, with response sizes, to the output')
+    parser.add_argument('--cprofile', type=str,
+                        metavar='path',
+                        help='with --profile, also run under cProfile and write the stats to this file')
+    parser.add_argument('--tracemalloc', type=int,
+                        default=0,
+                        metavar='N',
+                        help='with --profile, also trace memory and list the N largest allocation sites')
+    parser.add_argument('--output', type=str,
+                        choices=FORMATS,
+                        help='output format, default table on a terminal and nagios plugin output with perfdata otherwise')
+    return parser
+
+#Result for a mode that could not run, it carries only the exit state and the reason
+def unknown_result(check, labels, summary):
+    result = CheckResult(check, labels)
+    result.exit_status = STATE_UNKNOWN
+    result.summary = summary
+    return result
+
+#One line summary of an error from connecting to or querying the cluster
+def error_summary(mvip, e):
+    from solidfire.common import ApiServerError
+    from sfcheck.client import SFApiError
+    if isinstance(e, ApiServerError):
+        summary = e.method_name + " failed: " + e.error_name + " " + str(e.message)
+    elif isinstance(e, SFApiError):
+        summary = str(e)
+    else:
+        summary = "Unable to connect to host: " + mvip + " (" + str(e) + ")"
+    return " ".join(summary.split())
+
+#Fleet mode, check every cluster in the inventory from this process or from --processes worker processes
+def run_fleet(parser, args):
+    from sfcheck.element import check_cluster
+    from sfcheck.fleet import read_inventory, poll_fleet, fleet_result
+    start_time = time.time()
+    try:
+        inventory = read_inventory(args.f)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    if args.processes > 1:
+        from sfcheck.sweep import sweep_fleet
+        results, exit_status = sweep_fleet(inventory, args.processes, args.w)
+    else:
+        results, exit_status = poll_fleet(inventory, check_cluster, args.w)
+    return fleet_result(results, exit_status, time.time() - start_time)
+
+#Capacity mode over an inventory, every cluster's counters feed one columnar computation
+def run_capacity_fleet(parser, args):
+    from sfcheck.capacity import collect_capacity_counters
+    from sfcheck.element import connect
+    from sfcheck.fleet import read_inventory, poll_fleet
+    try:
+        inventory = read_inventory(args.f)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    check = lambda entry: (STATE_OK, collect_capacity_counters(connect(entry['mvip'], entry['username'],
+                                                                       entry['password'])))
+    results, _ = poll_fleet(inventory, check, args.w)
+    return capacity_result(args, results, fleet=True)
+
+#Thin client, print the latest result from a running daemon
+def run_query(args):
+    from sfcheck.daemon import query
+    try:
+        exit_status, output = query(args.socket)
+    except (IOError, OSError, ValueError) as e:
+        write_output("UNKNOWN - unable to read " + args.socket + ": " + str(e) + "\n")
+        return STATE_UNKNOWN
+    write_output(output + "\n")
+    return exit_status
+
+def make_cadence(args):
+    from sfcheck.scheduler import Cadence
+    return Cadence(args.interval, args.alert_interval, args.jitter, args.latency_limit, args.max_backoff)
+
+#Daemon mode, keep the connection open and poll until stopped
+def run_daemon(parser, args, sfe):
+    import signal
+    from sfcheck.daemon import CheckDaemon, parse_ttls
+    exporter = None
+    try:
+        ttls = parse_ttls(args.ttl)
+        if args.metrics_listen:
+            from sfcheck.exporter import Exporter, parse_listen
+            exporter = Exporter(*parse_listen(args.metrics_listen))
+            exporter.instrument(sfe)
+    except ValueError as e:
+        parser.error(str(e))
+    fault_tracker = None
+    if args.mode == 'faults':
+        from sfcheck.faults import FaultTracker
+        fault_tracker = FaultTracker()
+    check_daemon = CheckDaemon(sfe, args.interval, ttls, args.nagios_cmd, args.nagios_host,
+                               args.nagios_service, args.socket, checkUtilization, checkSessions,
+                               exporter, fault_tracker, make_cadence(args))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(STATE_OK))
+    try:
+        check_daemon.run()
+    except KeyboardInterrupt:
+        pass
+    return STATE_OK
+
+#Daemon mode over an inventory, every cluster polled on its own cadence from one process
+def run_fleet_daemon(parser, args):
+    import signal
+    from sfcheck.daemon import CheckDaemon, FleetDaemon, parse_ttls
+    from sfcheck.element import connect
+    from sfcheck.fleet import read_inventory
+    try:
+        inventory = read_inventory(args.f)
+        ttls = parse_ttls(args.ttl)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    daemons = []
+    for entry in inventory:
+        fault_tracker = None
+        if args.mode == 'faults':
+            from sfcheck.faults import FaultTracker
+            fault_tracker = FaultTracker()
+        daemons.append(CheckDaemon(None, args.interval, ttls, args.nagios_cmd, None, args.nagios_service, None,
+                                   checkUtilization, checkSessions, None, fault_tracker, make_cadence(args),
+                                   lambda entry=entry: connect(entry['mvip'], entry['username'], entry['password']),
+                                   entry['mvip']))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(STATE_OK))
+    try:
+        FleetDaemon(daemons, args.w, args.socket).run()
+    except KeyboardInterrupt:
+        pass
+    return STATE_OK
+
+#Trend mode, sample stats and capacity into the history and evaluate its trends
+def run_trend(args, sfe):
+    from sfcheck.element import collect_info, collect_stats, collect_capacity, history_values
+    from sfcheck.history import RingBuffer, history_path, evaluate_trend
+    labels = {'cluster': args.sm}
+    cluster = {}
+    cluster.update(collect_stats(sfe))
+    cluster.update(collect_capacity(sfe))
+    try:
+        with RingBuffer(history_path(args.state_dir, collect_info(sfe)['mvip_ip'])) as history:
+            history.append(history_values(cluster))
+            exit_status, trend = evaluate_trend(history, args.samples, args.days_warn, args.days_crit,
+                                                args.latency_warn, args.latency_crit)
+    except (IOError, OSError, ValueError) as e:
+        return unknown_result('trend', labels, "unable to use metric history in " + args.state_dir + ": " + str(e))
+
+    result = CheckResult('trend', labels)
+    result.exit_status = exit_status
+    section = result.section("Trend information")
+    section.row("Cluster", args.sm)
+    section.row("Samples", str(trend['samples']))
+    section.row("Block Fullness %", trend['fullness'])
+    section.row("Growth % per day", trend['growth'])
+    section.row("Days to 90% full", trend['days_to_90'])
+    section.row("Latency p50 usec", trend['latency'][50])
+    section.row("Latency p95 usec", trend['latency'][95])
+    section.row("Latency p99 usec", trend['latency'][99])
+    result.stamp(section, exit_status)
+    result.summary = ("Cluster: " + args.sm + " Block Fullness: " + trend['fullness'] + " Growth/day: " + trend['growth'] +
+                      " Days to 90%: " + trend['days_to_90'] + " Latency p95: " + trend['latency'][95])
+
+    values = trend['values']
+    result.perf("samples", trend['samples'], minimum=0)
+    result.perf("fullness", values['fullness'], "%", minimum=0, maximum=100)
+    result.perf("growth_per_day", values['growth'], "%")
+    #Fewer days is worse, the range form alerts below the threshold
+    result.perf("days_to_90", values['days_to_90'], warn=format_number(args.days_warn) + ":",
+                crit=format_number(args.days_crit) + ":", minimum=0)
+    result.perf("latency_p50", values['latency'][50], "us", minimum=0)
+    result.perf("latency_p95", values['latency'][95], "us", args.latency_warn, args.latency_crit, minimum=0)
+    result.perf("latency_p99", values['latency'][99], "us", minimum=0)
+    return result
+
+#Hot spot mode, rank volumes from one ListVolumeStatsByVolume call
+def run_hotspot(args, sfe):
+    from sfcheck.hotspots import check_hotspots, describe_row
+    labels = {'cluster': args.sm}
+    try:
+        exit_status, hotspots = check_hotspots(sfe, args.state_dir, args.sm, args.top,
+                                               args.latency_warn, args.latency_crit,
+                                               args.throttle_warn, args.throttle_crit)
+    except (IOError, OSError) as e:
+        return unknown_result('hotspot', labels, "unable to store volume sample in " + args.state_dir + ": " + str(e))
+
+    result = CheckResult('hotspot', labels)
+    result.exit_status = exit_status
+    outliers = hotspots['outliers']
+    for ranking, title in (('latency', "Volumes by latency"), ('iops', "Volumes by IOPS"),
+                           ('throttle', "Volumes by throttle")):
+        section = result.section(title)
+        for row in hotspots['top'][ranking]:
+            section.row("Volume " + str(row[0]), describe_row(row))
+        if ranking == 'iops' and not hotspots['has_rates']:
+            section.row("IOPS", "n/a, no previous sample")
+    section = result.section("Hot spot information")
+    section.row("Cluster", args.sm)
+    section.row("Volumes", str(hotspots['volumes']))
+    section.row("Latency over warning", str(outliers['latency_warn']))
+    section.row("Latency over critical", str(outliers['latency_crit']))
+    section.row("Throttle over warning", str(outliers['throttle_warn']))
+    section.row("Throttle over critical", str(outliers['throttle_crit']))
+    result.stamp(section, exit_status)
+
+    worst = hotspots['top']['latency'][:1]
+    result.summary = ("Cluster: " + args.sm + " Volumes: " + str(hotspots['volumes']) +
+                      " Latency warn/crit: " + str(outliers['latency_warn']) + "/" + str(outliers['latency_crit']) +
+                      " Throttle warn/crit: " + str(outliers['throttle_warn']) + "/" + str(outliers['throttle_crit']) +
+                      (" Worst: volume " + str(worst[0][0]) + " " + describe_row(worst[0]) if worst else ""))
+    for row in hotspots['top']['latency']:
+        result.detail("Volume " + str(row[0]) + ": " + describe_row(row))
+
+    result.perf("volumes", hotspots['volumes'], minimum=0)
+    for name in ('latency_warn', 'latency_crit', 'throttle_warn', 'throttle_crit'):
+        result.perf(name, outliers[name], minimum=0)
+    if worst:
+        result.perf("worst_latency", worst[0][1], "us", args.latency_warn, args.latency_crit, minimum=0)
+    return result
+
+def tib(value):
+    return "n/a" if value != value else str(round(value / 1024 ** 4, 2)) + " TiB"
+
+def ratio_text(value, suffix="x"):
+    return "n/a" if value != value else str(round(value, 2)) + suffix
+
+#Capacity mode for one cluster
+def run_capacity(args, sfe):
+    from sfcheck.capacity import collect_capacity_counters
+    results = [{'mvip': args.sm, 'cluster': collect_capacity_counters(sfe), 'error': None, 'exit_status': STATE_OK}]
+    return capacity_result(args, results, fleet=False)
+
+#Per cluster capacity states and the fleet roll-up from poll results holding capacity counters.
+#One table per cluster for a single cluster, one row per cluster and the roll-up for a fleet.
+def capacity_result(args, results, fleet):
+    from sfcheck.capacity import capacity_columns, capacity_states, capacity_rollup, days_to_full
+    answered = [r for r in results if r['error'] is None]
+    columns = capacity_columns([r['cluster'] for r in answered])
+    states = capacity_states(columns, args.capacity_warn, args.capacity_crit)
+    rollup = capacity_rollup(columns, states, args.capacity_warn, args.capacity_crit)
+    for row, (entry, exit_status) in enumerate(zip(answered, states)):
+        entry['exit_status'] = exit_status
+        entry['row'] = row
+        entry['days_to_90'] = days_to_full(args.state_dir, entry['cluster'].get('mvip') or entry['mvip'],
+                                           entry['cluster'], args.samples)
+    exit_status = max([STATE_OK] + [r['exit_status'] for r in results])
+
+    result = CheckResult('capacity', {} if fleet else {'cluster': args.sm})
+    result.exit_status = exit_status
+    if fleet:
+        section = result.section("Fleet capacity")
+    for entry in results:
+        if entry['error'] is not None:
+            section.row(entry['mvip'], status_name(entry['exit_status']) + " " + entry['error'][:30])
+            result.detail(entry['mvip'] + ": " + status_name(entry['exit_status']).lstrip("*") + " " + entry['error'])
+            continue
+        row = entry['row']
+        block = columns['block_fullness'][row]
+        metadata = columns['metadata_fullness'][row]
+        efficiency = columns['efficiency'][row]
+        node_loss = columns['node_loss_free'][row]
+        days = "n/a" if entry['days_to_90'] is None else str(round(entry['days_to_90'], 1))
+        line = ("block " + ratio_text(block, "%") + " metadata " + ratio_text(metadata, "%") + " efficiency " +
+                ratio_text(efficiency) + " node loss free " + tib(node_loss))
+        result.detail(entry['mvip'] + ": " + status_name(entry['exit_status']).lstrip("*") + " " + line +
+                      " days to 90% " + days)
+        if fleet:
+            section.row(entry['mvip'], status_name(entry['exit_status']) + " block " + ratio_text(block, "%") +
+                        " meta " + ratio_text(metadata, "%"))
+            section.row("", "eff " + ratio_text(efficiency) + " node loss " + tib(node_loss))
+            continue
+        section = result.section("Capacity information")
+        section.row("Cluster", entry['mvip'])
+        section.row("Block Fullness %", ratio_text(block, ""))
+        section.row("Metadata Fullness %", ratio_text(metadata, ""))
+        section.row("Thin Provisioning", ratio_text(columns['thin_provisioning'][row]))
+        section.row("Deduplication", ratio_text(columns['deduplication'][row]))
+        section.row("Compression", ratio_text(columns['compression'][row]))
+        section.row("Efficiency", ratio_text(efficiency))
+        section.row("Used Space", tib(columns['usedSpace'][row]))
+        section.row("Usable Space", tib(columns['maxUsedSpace'][row]))
+        section.row("Active Nodes", str(int(columns['activeNodes'][row])))
+        section.row("Free after node loss", tib(node_loss))
+        section.row("Days to 90% full", days)
+        result.stamp(section, entry['exit_status'])
+        result.summary = "Cluster: " + entry['mvip'] + " " + line + " days to 90% " + days
+        result.perf("block_fullness", float(block), "%", args.capacity_warn, args.capacity_crit, 0, 100)
+        result.perf("metadata_fullness", float(metadata), "%", args.capacity_warn, args.capacity_crit, 0, 100)
+        result.perf("efficiency", float(efficiency), minimum=0)
+        result.perf("used_space", float(columns['usedSpace'][row]), "B", minimum=0,
+                    maximum=float(columns['maxUsedSpace'][row]))
+        result.perf("node_loss_free", float(node_loss), "B", crit="0:")
+        if entry['days_to_90'] is not None:
+            result.perf("days_to_90", entry['days_to_90'], minimum=0)
+    if not fleet:
+        return result
+
+    section.row("Clusters", str(len(results)))
+    section.row("Fleet Fullness %", ratio_text(rollup['fullness'], ""))
+    section.row("Worst Fullness %", ratio_text(rollup['worst_fullness'], ""))
+    section.row("Over warning / critical", str(rollup['over_warn']) + " / " + str(rollup['over_crit']))
+    section.row("Mean Efficiency", ratio_text(rollup['mean_efficiency']))
+    section.row("Least node loss free", tib(rollup['min_node_loss_free']))
+    result.stamp(section, exit_status)
+    result.summary = ("Fleet: " + str(len(results)) + " clusters, " + str(len(results) - len(answered)) +
+                      " unreachable, " + str(rollup['not_ok']) + " not OK, fullness " +
+                      ratio_text(rollup['fullness'], "%") + " worst " + ratio_text(rollup['worst_fullness'], "%"))
+    result.perf("clusters", len(results), minimum=0)
+    result.perf("not_ok", rollup['not_ok'], minimum=0)
+    result.perf("fleet_fullness", rollup['fullness'], "%", minimum=0, maximum=100)
+    result.perf("worst_fullness", rollup['worst_fullness'], "%", args.capacity_warn, args.capacity_crit, 0, 100)
+    result.perf("over_warn", rollup['over_warn'], minimum=0)
+    result.perf("over_crit", rollup['over_crit'], minimum=0)
+    result.perf("used_space", rollup['used_space'], "B", minimum=0, maximum=rollup['max_used_space'])
+    result.perf("mean_efficiency", rollup['mean_efficiency'], minimum=0)
+    result.perf("min_node_loss_free", rollup['min_node_loss_free'], "B")
+    return result
+
+#Node mode, per node CPU and IO rates from one ListNodeStats call
+def run_nodes(args, sfe):
+    from sfcheck.nodestats import check_nodes, describe_node
+    labels = {'cluster': args.sm}
+    try:
+        exit_status, nodes = check_nodes(sfe, args.state_dir, args.sm, args.cpu_warn, args.cpu_crit,
+                                         args.imbalance_warn, args.imbalance_crit)
+    except (IOError, OSError) as e:
+        return unknown_result('nodes', labels, "unable to store node sample in " + args.state_dir + ": " + str(e))
+
+    result = CheckResult('nodes', labels)
+    result.exit_status = exit_status
+    columns = nodes['columns']
+    rates = nodes['rates']
+    node_ids = columns['nodeID']
+    section = result.section("Node performance")
+    for row, node_id in enumerate(node_ids):
+        section.row("Node " + str(node_id) + (" <<-- OUTLIER" if row in nodes['outliers'] else ""),
+                    describe_node(nodes, row))
+        result.detail("Node " + str(node_id) + ": " + describe_node(nodes, row) +
+                      " read latency " + ratio_text(rates['read_latency'][row], "us") +
+                      " write latency " + ratio_text(rates['write_latency'][row], "us") +
+                      " cluster network " + ratio_text(rates['cluster_bytes_sec'][row] / 1024 / 1024, "MiB/s"))
+    if not nodes['has_rates']:
+        section.row("IO Rates", "n/a, no previous sample")
+    hottest = "n/a" if nodes['hottest'] is None else str(node_ids[nodes['hottest']])
+    busiest = "n/a" if nodes['busiest'] is None else str(node_ids[nodes['busiest']])
+    outliers = " ".join(str(node_ids[row]) for row in nodes['outliers']) or "none"
+    section = result.section("Node balance")
+    section.row("Cluster", args.sm)
+    section.row("Nodes", str(len(node_ids)))
+    section.row("Hottest CPU node", hottest)
+    section.row("CPU imbalance", ratio_text(nodes['cpu_imbalance']))
+    section.row("Busiest IOPS node", busiest)
+    section.row("IOPS imbalance", ratio_text(nodes['iops_imbalance']))
+    section.row("Outliers", outliers)
+    result.stamp(section, exit_status)
+    result.summary = ("Cluster: " + args.sm + " Nodes: " + str(len(node_ids)) + " Hottest: " + hottest +
+                      " CPU imbalance: " + ratio_text(nodes['cpu_imbalance']) + " IOPS imbalance: " +
+                      ratio_text(nodes['iops_imbalance']) + " Outliers: " + outliers)
+
+    result.perf("nodes", len(node_ids), minimum=0)
+    result.perf("cpu_imbalance", nodes['cpu_imbalance'], "", args.imbalance_warn, args.imbalance_crit, 0)
+    result.perf("iops_imbalance", nodes['iops_imbalance'], minimum=0)
+    result.perf("outliers", len(nodes['outliers']), minimum=0)
+    for row, node_id in enumerate(node_ids):
+        result.perf("node" + str(node_id) + "_cpu", columns['cpu'][row], "%", args.cpu_warn, args.cpu_crit, 0, 100)
+        result.perf("node" + str(node_id) + "_iops", rates['iops'][row], minimum=0)
+    return result
+
+#Sessions mode, iSCSI sessions per node, initiator and volume from one ListISCSISessions call
+def run_sessions(args, sfe):
+    from sfcheck.sessions import check_sessions, describe_initiator
+    labels = {'cluster': args.sm}
+    exit_status, sessions = check_sessions(sfe, args.node_session_limit, args.min_paths, args.max_paths, args.top)
+    warn_sessions = args.node_session_limit * .90
+
+    result = CheckResult('sessions', labels)
+    result.exit_status = exit_status
+    section = result.section("Sessions by node")
+    for node_id, count in sessions['nodes']:
+        section.row("Node " + str(node_id), str(count) + (" <<-- NEAR LIMIT" if node_id in sessions['near_limit'] else ""))
+    section = result.section("Initiators by sessions")
+    for initiator, entry in sessions['top_initiators']:
+        section.row(str(initiator), describe_initiator(entry))
+    if sessions['top_problems']:
+        section = result.section("Initiators with path problems")
+        for initiator, entry in sessions['top_problems']:
+            section.row(str(initiator), describe_initiator(entry))
+            result.detail("Initiator " + str(initiator) + ": " + describe_initiator(entry))
+    section = result.section("Volumes by sessions")
+    for volume_id, count in sessions['top_volumes']:
+        section.row("Volume " + str(volume_id), str(count))
+    busiest = "n/a" if sessions['busiest'] is None else str(sessions['busiest'])
+    section = result.section("Session balance")
+    section.row("Cluster", args.sm)
+    section.row("iSCSI Sessions", str(sessions['sessions']))
+    section.row("Nodes", str(len(sessions['nodes'])))
+    section.row("Initiators", str(sessions['initiators']))
+    section.row("Volumes with sessions", str(sessions['volumes']))
+    section.row("Busiest node", busiest)
+    section.row("Session imbalance", ratio_text(sessions['imbalance']))
+    section.row("Nodes near limit", str(len(sessions['near_limit'])))
+    section.row("Initiator volumes under " + str(args.min_paths) + " paths", str(sessions['missing']))
+    section.row("Initiator volumes over " + str(args.max_paths) + " paths", str(sessions['excess']))
+    result.stamp(section, exit_status)
+    result.summary = ("Cluster: " + args.sm + " iSCSI Sessions: " + str(sessions['sessions']) + " Busiest node: " +
+                      busiest + " Imbalance: " + ratio_text(sessions['imbalance']) + " Nodes near limit: " +
+                      str(len(sessions['near_limit'])) + " Initiators with path problems: " +
+                      str(sessions['problem_initiators']))
+    for node_id, count in sessions['nodes']:
+        result.detail("Node " + str(node_id) + ": " + str(count) + " sessions" +
+                      (" near limit" if node_id in sessions['near_limit'] else ""))
+
+    result.perf("sessions", sessions['sessions'], minimum=0)
+    result.perf("initiators", sessions['initiators'], minimum=0)
+    result.perf("session_imbalance", sessions['imbalance'], minimum=0)
+    result.perf("missing_paths", sessions['missing'], minimum=0)
+    result.perf("excess_paths", sessions['excess'], minimum=0)
+    for node_id, count in sessions['nodes']:
+        result.perf("node" + str(node_id) + "_sessions", count, "", warn_sessions, args.node_session_limit, 0)
+    return result
+
+#Fault mode, active faults by severity and the events logged since the cursor
+def run_faults(args, sfe):
+    from sfcheck.faults import (cursor_path, load_tracker, save_tracker, evaluate_faults,
+                                describe_fault, describe_event, summarize_faults, SEVERITIES)
+    labels = {'cluster': args.sm}
+    path = cursor_path(args.state_dir, args.sm)
+    tracker = load_tracker(path)
+    report = tracker.update(sfe)
+    try:
+        save_tracker(path, tracker)
+    except (IOError, OSError) as e:
+        return unknown_result('faults', labels, "unable to store event cursor in " + args.state_dir + ": " + str(e))
+    exit_status, counts = evaluate_faults(report)
+
+    result = CheckResult('faults', labels)
+    result.exit_status = exit_status
+    section = result.section("Active faults")
+    for fault in report['faults']:
+        section.row("Fault " + str(fault['clusterFaultID']), describe_fault(fault))
+    section = result.section("Fault information")
+    section.row("Cluster", args.sm)
+    section.row("Active faults", str(len(report['faults'])))
+    for severity in SEVERITIES:
+        section.row("Severity " + severity, str(counts[severity]))
+    section.row("New faults", str(len(report['new'])))
+    section.row("Resolved faults", str(len(report['resolved'])))
+    section.row("New events", str(len(report['events'])))
+    section.row("Last event ID", str(report['event_id']))
+    result.stamp(section, exit_status)
+
+    result.summary = "Cluster: " + args.sm + " " + summarize_faults(report, counts)
+    for fault in report['new']:
+        result.detail("New fault " + str(fault['clusterFaultID']) + ": " + describe_fault(fault) + " " +
+                      str(fault.get('details', "")))
+    for fault_id in report['resolved']:
+        result.detail("Resolved fault " + str(fault_id))
+    for event in report['events']:
+        result.detail("Event " + str(event['eventID']) + ": " + describe_event(event))
+
+    for severity in SEVERITIES:
+        result.perf("faults_" + severity, counts[severity], minimum=0)
+    result.perf("new_faults", len(report['new']), minimum=0)
+    result.perf("resolved_faults", len(report['resolved']), minimum=0)
+    result.perf("new_events", len(report['events']), minimum=0)
+    return result
+
+#Full health check, one table per node followed by the cluster and IO tables
+#With cache_ttls, collectors are served from the persistent cache while the fault fingerprint holds
+def run_cluster(args, sfe, fetch=None, cache_ttls=None):
+    from sfcheck.element import collect_cluster, evaluate, history_values
+    from sfcheck.history import record_sample
+    from sfcheck.samples import SampleStore, compute_rates, disk_activity
+    exit_status = STATE_OK
+
+    cache = None
+    if cache_ttls is not None:
+        from sfcheck.cache import FingerprintCache, fault_fingerprint
+        cache = FingerprintCache(args.state_dir, args.sm, cache_ttls).load()
+        cache.verify(fault_fingerprint(sfe))
+        fetch = cache.fetcher(sfe, fetch)
+    cluster = collect_cluster(sfe, fetch, breakdown=args.breakdown)
+    if cache is not None:
+        try:
+            cache.save()
+        except (IOError, OSError):
+            pass
+    labels = {'cluster': cluster['cluster_name']}
+    cluster_name = cluster['cluster_name']
+    mvip_ip = cluster['mvip_ip']
+    #The history and the stats sample are both kept under the MVIP the cluster reports,
+    #so every script and address used for a cluster feeds and reads the same files
+    try:
+        record_sample(args.state_dir, mvip_ip, history_values(cluster))
+    except (IOError, OSError, ValueError):
+        pass
+    if cluster['helix_protection'] is None:
+        return unknown_result('cluster', labels, "unknown helix type, script has exited")
+    result = CheckResult('cluster', labels)
+
+    for node in cluster['nodes']:
+        # If a node isn't part of the cluster generate specific output
+        if node['in_cluster']:
+            cluster_name = node['cluster_name']
+            node_state = node['state']
+            node_cluster = cluster_name
+            node_mvip = mvip_ip
+        else:
+            node_state = "Node is not part of the cluster"
+            node_cluster = "N/A"
+            node_mvip = "N/A"
+        result.detail("Node " + str(node['node_id']) + " Status: " + node_state + " Cluster Name: " + node_cluster +
+                      " MVIP: " + node_mvip)
+        # Write output to table
+        section = result.section("Node information")
+        section.row("Node Status", node_state)
+        section.row("Cluster Name", node_cluster)
+        section.row("Node ID", str(node['node_id']))
+        section.row("Active data drives", str(node['num_data_drives']))
+        section.row("Active metadata drives", str(node['num_meta_drives']))
+        if node['error_data_drives'] > 0:
+            section.row("DATA DRIVES IN ERROR", str(node['error_data_drives'])+" <<-- DRIVE IN ERROR")
+        if node['error_meta_drives'] > 0:
+            section.row("METADATA DRIVES IN ERROR", str(node['error_meta_drives'])+" <<-- DRIVE IN ERROR")
+        for drive in node['failed_drives']:
+            section.row("Drive " + str(drive['drive_id']) + " slot " + str(drive['slot']), drive['status'] + " " + drive['type'])
+            result.detail("Node " + str(node['node_id']) + " drive " + str(drive['drive_id']) + " slot " +
+                          str(drive['slot']) + ": " + drive['status'] + " " + drive['type'])
+        section.row("MVIP", node_mvip)
+        result.stamp(section)
+
+    #Rates come from the previous GetClusterStats sample kept for this cluster
+    sample_store = SampleStore(args.state_dir)
+    try:
+        rates = compute_rates(sample_store.swap(mvip_ip, cluster), cluster)
+    except (IOError, OSError) as e:
+        if checkDiskUse == 1:
+            return unknown_result('cluster', labels, "Unable to store stats sample in " + args.state_dir +
+                                  " check perms or set checkDiskUse=0: " + str(e))
+        rates = None
+
+    if checkDiskUse == 1:
+        disk_use, test_result=disk_activity(cluster, rates)
+        exit_status, disk_use=add_note(test_result, exit_status, disk_use)
+
+    else:
+        disk_use="n/a"
+
+    exit_status, cluster_util, num_sessions = evaluate(cluster, checkUtilization, checkSessions, exit_status)
+    result.exit_status = exit_status
+    ensemble_string = ('%s' % ' '.join(map(str, cluster['ensemble_member'])))
+    ensemble_string = ensemble_string.strip()
+
+    section = result.section("Cluster information")
+    section.row("Cluster", mvip_ip)
+    section.row("Version", cluster['element_os_ver'])
+    section.row("iSCSI Sessions", num_sessions)
+    section.row("Node count", str(cluster['num_nodes']))
+    section.row("Volume Count", str(cluster['num_vols']))
+    section.row("Cluster Name", cluster_name)
+    section.row("Ensemble Members", ensemble_string)
+    section.row("Helix protection", cluster['helix_protection'])
+    section.row("Encryption", cluster['encrypt_state'])
+    result.stamp(section, exit_status)
+    if args.breakdown:
+        section = result.section("Account information")
+        for account in sorted(cluster['vols_by_account']):
+            section.row("Account " + str(account), str(cluster['vols_by_account'][account]) + " volumes, " +
+                        str(cluster['sessions_by_account'].get(account, 0)) + " sessions")
+        section = result.section("Access group information")
+        for group in sorted(cluster['vols_by_group']):
+            section.row("Access group " + str(group), str(cluster['vols_by_group'][group]) + " volumes, " +
+                        str(cluster['sessions_by_group'].get(group, 0)) + " sessions")
+
+    section = result.section("IO information")
+    section.row("Disk Activity", disk_use)
+    if rates is None:
+        section.row("IO Rates", "n/a, no previous sample")
+    else:
+        section.row("Sample Interval", str(round(rates['interval'], 1)) + "s")
+        section.row("Read MiB/s", str(round(rates['read_bytes_sec']/1024/1024, 2)))
+        section.row("Write MiB/s", str(round(rates['write_bytes_sec']/1024/1024, 2)))
+        section.row("Read IOPS", str(round(rates['read_iops'], 1)))
+        section.row("Write IOPS", str(round(rates['write_iops'], 1)))
+        section.row("Total IOPS", str(round(rates['total_iops'], 1)))
+        section.row("Average IO Size", str(int(rates['avg_io_size'])))
+    section.row("Read GiBytes", str(cluster['read_Gibytes']))
+    section.row("Total GiBytes", str(cluster['total_Gibytes']))
+    section.row("Write GiBytes", str(cluster['write_Gibytes']))
+    section.row("Percent Read Bytes", str(cluster['pct_read_bytes']))
+    section.row("Percent Write Bytes", str(cluster['pct_write_bytes']))
+    section.row("Read Ops", str(cluster['read_ops']))
+    section.row("Write Ops", str(cluster['write_ops']))
+    section.row("Total Ops", str(cluster['total_ops']))
+    section.row("Percent Read Ops", str(cluster['pct_read_ops']))
+    section.row("Percent Write Ops", str(cluster['pct_write_ops']))
+    section.row("Read Latency", str(cluster['read_latent']))
+    section.row("Write Latency", str(cluster['write_latent']))
+    section.row("cluster Latency", str(cluster['cluster_latent']))
+    section.row("Utilization %", cluster_util)
+    result.stamp(section, exit_status)
+
+    if cache is not None:
+        result.detail("Cache: " + str(cache.hits) + " hits, " + str(cache.misses) + " fetched, fingerprint " +
+                      cache.fingerprint)
+    result.summary = ("Cluster: " + mvip_ip + " Version: " + str(cluster['element_os_ver']) +
+                      " Disk Activity: " + disk_use + " Utilization: " + cluster_util +
+                      " Nodes: " + str(cluster['num_nodes']) + " iSCSI Sessions: " + num_sessions +
+                      " Volumes: " + str(cluster['num_vols']) + " Name: " + cluster_name +
+                      " Ensemble: " + ensemble_string)
+
+    max_sessions = cluster['ensemble_count'] * 1000
+    result.perf("util", cluster['cluster_util'], "%", 80, 90, 0, 100)
+    result.perf("sessions", cluster['num_sessions'], "", max_sessions * .90, max_sessions, 0)
+    result.perf("nodes", cluster['num_nodes'], minimum=0)
+    result.perf("volumes", cluster['num_vols'], minimum=0)
+    result.perf("read_bytes", cluster['read_bytes'], "c")
+    result.perf("write_bytes", cluster['write_bytes'], "c")
+    result.perf("read_ops", cluster['read_ops'], "c")
+    result.perf("write_ops", cluster['write_ops'], "c")
+    result.perf("read_latency", cluster['read_latent'], "us", minimum=0)
+    result.perf("write_latency", cluster['write_latent'], "us", minimum=0)
+    result.perf("latency", cluster['cluster_latent'], "us", minimum=0)
+    result.perf("used_space", cluster['used_space'], "B", minimum=0, maximum=cluster['max_used_space'])
+    if rates is not None:
+        result.perf("read_iops", rates['read_iops'], minimum=0)
+        result.perf("write_iops", rates['write_iops'], minimum=0)
+        result.perf("read_bytes_sec", rates['read_bytes_sec'], "B", minimum=0)
+        result.perf("write_bytes_sec", rates['write_bytes_sec'], "B", minimum=0)
+    return result
+
+#Parse argv, run the selected mode, write its output and return its Nagios state
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.metrics_listen:
+        args.daemon = True
+
+    if args.socket and not args.daemon and not args.f:
+        return run_query(args)
+
+    if args.cprofile or args.tracemalloc:
+        args.profile = True
+    profile = Profile(args.cprofile, args.tracemalloc)
+    if args.profile and not args.daemon:
+        profile.start()
+
+    if (args.record or args.replay) and (args.f or args.daemon):
+        parser.error("--record and --replay check a single cluster, they do not go with -f or --daemon")
+    if args.f and args.daemon and (args.metrics_listen or args.nagios_host):
+        parser.error("--metrics-listen and --nagios-host are for one cluster, with -f results go to each cluster's name")
+    if args.jitter < 0 or args.jitter >= 1:
+        parser.error("--jitter must be at least 0 and below 1")
+    if args.max_backoff < 1:
+        parser.error("--max-backoff must be at least 1")
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.processes > 1 and (not args.f or args.daemon or args.mode == 'capacity'):
+        parser.error("--processes is for the -f fleet check, not --daemon or capacity mode")
+    snapshot = None
+    if args.replay:
+        from sfcheck.snapshot import Snapshot
+        try:
+            snapshot = Snapshot(args.replay)
+        except (IOError, OSError, ValueError, KeyError) as e:
+            parser.error("unable to read snapshot " + args.replay + ": " + str(e))
+        if snapshot.script != 'element':
+            parser.error(args.replay + " was recorded by the " + snapshot.script + " check")
+        args.sm = args.sm or snapshot.target
+        #A replay runs the recorded mode, the snapshot only answers the calls that mode made
+        recorded_mode = snapshot.meta.get('mode')
+        if args.mode is None:
+            args.mode = recorded_mode
+        elif recorded_mode and args.mode != recorded_mode:
+            parser.error(args.replay + " was recorded in " + recorded_mode + " mode, not " + args.mode)
+    if args.mode is None:
+        args.mode = 'cluster'
+    scratch = None
+    if args.state_dir is None:
+        if snapshot is not None:
+            import tempfile
+            scratch = args.state_dir = tempfile.mkdtemp(prefix="sfcheck-replay-")
+        else:
+            args.state_dir = '/tmp'
+    try:
+        return run_check(parser, args, profile, snapshot)
+    finally:
+        if scratch is not None:
+            import shutil
+            shutil.rmtree(scratch, ignore_errors=True)
+
+#Connect or open the snapshot, run the selected mode and write its output
+def run_check(parser, args, profile, snapshot):
+    recorder = None
+    if args.f and args.daemon:
+        return run_fleet_daemon(parser, args)
+    if args.f:
+        with profile.phase("fleet"):
+            if args.mode == 'capacity':
+                result = run_capacity_fleet(parser, args)
+            else:
+                result = run_fleet(parser, args)
+    else:
+        if snapshot is None and not (args.sm and args.su and args.sp):
+            parser.error("-sm, -su and -sp are required unless -f, --socket or --replay is given")
+
+        cache_ttls = None
+        if args.cache and not args.daemon:
+            from sfcheck.cache import PERSISTENT_TTLS
+            from sfcheck.daemon import parse_ttls
+            try:
+                cache_ttls = parse_ttls(args.ttl, PERSISTENT_TTLS)
+            except ValueError as e:
+                parser.error(str(e))
+
+        from requests import RequestException
+        from solidfire.common import ApiConnectionError, ApiServerError
+        from sfcheck.client import SFApiError
+        api_errors = (SFApiError, ApiConnectionError, ApiServerError, RequestException)
+        try:
+            with profile.phase("connect"):
+                if snapshot is not None:
+                    from sfcheck.snapshot import replay_element
+                    sfe = replay_element(snapshot)
+                else:
+                    from sfcheck.element import connect
+                    sfe = connect(args.sm, args.su, args.sp)
+        except api_errors as e:
+            result = unknown_result(args.mode, {'cluster': args.sm}, error_summary(args.sm, e))
+            write_output(render(result, args.output or default_format(), version))
+            return result.exit_status
+
+        if args.daemon:
+            return run_daemon(parser, args, sfe)
+        if args.record:
+            from sfcheck.snapshot import Recorder
+            recorder = Recorder(args.record, 'element', args.sm, {'mode': args.mode})
+            recorder.instrument(sfe)
+        if args.profile:
+            profile.instrument(sfe)
+        try:
+            with profile.phase("check"):
+                if args.mode == 'trend':
+                    result = run_trend(args, sfe)
+                elif args.mode == 'hotspot':
+                    result = run_hotspot(args, sfe)
+                elif args.mode == 'faults':
+                    result = run_faults(args, sfe)
+                elif args.mode == 'capacity':
+                    result = run_capacity(args, sfe)
+                elif args.mode == 'nodes':
+                    result = run_nodes(args, sfe)
+                elif args.mode == 'sessions':
+                    result = run_sessions(args, sfe)
+                else:
+                    result = run_cluster(args, sfe, profile.fetch(sfe) if args.profile else None, cache_ttls)
+        except api_errors as e:
+            result = unknown_result(args.mode, {'cluster': args.sm}, error_summary(args.sm, e))
+        if snapshot is not None:
+            result.restamp(snapshot.recorded)
+        if recorder is not None:
+            try:
+                result.detail("Recorded snapshot " + recorder.save())
+            except (IOError, OSError) as e:
+                result.detail("Unable to record snapshot in " + args.record + ": " + str(e))
+
+    output_format = args.output or default_format()
+    if args.profile:
+        # Render once for its timing, the profile has to be in the result before the real pass
+        with profile.phase("render"):
+            render(result, output_format, version)
+        profile.stop()
+        profile.report(result)
+    write_output(render(result, output_format, version))
+    return result.exit_status
@@ -0,0 +1,164 @@
+# Prometheus /metrics endpoint for the resident element check
+# The daemon's poll loop refreshes a pre-rendered snapshot of the cluster
+# metrics; scrapes only join that snapshot with the self-instrumentation
+# histograms, so any number of scrapers cost the MVIP nothing extra.
+import threading
+import time
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    import socketserver
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    import SocketServer as socketserver
+
+from sfcheck.metrics import Histogram, instrument
+from sfcheck.output import format_number, label_string
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Cluster gauges and counters: metric name, cluster dict key, type, help text
+CLUSTER_METRICS = (
+    ('sfcheck_cluster_utilization_percent', 'cluster_util', 'gauge', "Cluster utilization from GetClusterStats"),
+    ('sfcheck_cluster_read_bytes_total', 'read_bytes', 'counter', "Bytes read by clients"),
+    ('sfcheck_cluster_write_bytes_total', 'write_bytes', 'counter', "Bytes written by clients"),
+    ('sfcheck_cluster_read_ops_total', 'read_ops', 'counter', "Read operations"),
+    ('sfcheck_cluster_write_ops_total', 'write_ops', 'counter', "Write operations"),
+    ('sfcheck_cluster_read_latency_microseconds', 'read_latent', 'gauge', "Average read latency"),
+    ('sfcheck_cluster_write_latency_microseconds', 'write_latent', 'gauge', "Average write latency"),
+    ('sfcheck_cluster_latency_microseconds', 'cluster_latent', 'gauge', "Average latency"),
+    ('sfcheck_cluster_used_space_bytes', 'used_space', 'gauge', "Used block space"),
+    ('sfcheck_cluster_max_used_space_bytes', 'max_used_space', 'gauge', "Usable block space"),
+    ('sfcheck_cluster_used_metadata_space_bytes', 'used_metadata_space', 'gauge', "Used metadata space"),
+    ('sfcheck_cluster_max_used_metadata_space_bytes', 'max_used_metadata_space', 'gauge', "Usable metadata space"),
+    ('sfcheck_cluster_provisioned_space_bytes', 'provisioned_space', 'gauge', "Provisioned volume space"),
+    ('sfcheck_cluster_iscsi_sessions', 'num_sessions', 'gauge', "Active iSCSI sessions"),
+    ('sfcheck_cluster_volumes', 'num_vols', 'gauge', "Volumes"),
+    ('sfcheck_cluster_nodes', 'num_nodes', 'gauge', "Nodes reported by GetClusterState"),
+    ('sfcheck_cluster_ensemble_size', 'ensemble_count', 'gauge', "Nodes in the ensemble"),
+)
+
+#Append one metric family, samples are (labels, value) pairs
+def add_family(lines, name, metric_type, help_text, samples):
+    lines.append("# HELP " + name + " " + help_text)
+    lines.append("# TYPE " + name + " " + metric_type)
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(name + label_string(labels) + " " + format_number(value))
+
+#Text exposition lines for one collected cluster
+def cluster_metrics(cluster, exit_status):
+    base = {'cluster': cluster['cluster_name']}
+    lines = []
+    add_family(lines, 'sfcheck_cluster_status', 'gauge', "Nagios exit state of the last poll", [(base, exit_status)])
+    info = dict(base, version=cluster['element_os_ver'], helix=cluster['helix_protection'] or "unknown",
+                mvip=cluster['mvip_ip'])
+    add_family(lines, 'sfcheck_cluster_info', 'gauge', "Element OS version, protection and MVIP", [(info, 1)])
+    add_family(lines, 'sfcheck_cluster_encryption_info', 'gauge', "Encryption at rest state",
+               [(dict(base, state=cluster['encrypt_state']), 1)])
+    for name, key, metric_type, help_text in CLUSTER_METRICS:
+        if key in cluster:
+            add_family(lines, name, metric_type, help_text, [(base, cluster[key])])
+
+    in_cluster = []
+    drives = []
+    for node in cluster['nodes']:
+        node_labels = dict(base, node_id=node['node_id'])
+        in_cluster.append((node_labels, 1 if node['in_cluster'] else 0))
+        drives.append((dict(node_labels, type="data", state="active"), node['num_data_drives']))
+        drives.append((dict(node_labels, type="metadata", state="active"), node['num_meta_drives']))
+        drives.append((dict(node_labels, type="data", state="error"), node['error_data_drives']))
+        drives.append((dict(node_labels, type="metadata", state="error"), node['error_meta_drives']))
+    add_family(lines, 'sfcheck_node_in_cluster', 'gauge', "Node is part of the cluster", in_cluster)
+    add_family(lines, 'sfcheck_node_drives', 'gauge', "Drives per node by type and state", drives)
+    return lines
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = self.server.exporter.scrape().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class MetricsServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Exporter(object):
+
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.lock = threading.Lock()
+        self.snapshot = []
+        self.up = 0
+        self.last_poll = 0
+        self.api_calls = Histogram('sfcheck_api_call_duration_seconds', "Element API call latency", ('method',))
+        self.polls = Histogram('sfcheck_poll_duration_seconds', "Time to collect and evaluate one poll")
+        self.scrapes = Histogram('sfcheck_scrape_duration_seconds', "Time to answer one /metrics request",
+                                 buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+        self.server = None
+
+    #Route every API call on the connection through the latency histogram
+    def instrument(self, sfe):
+        return instrument(sfe, self.api_calls)
+
+    #Called by the daemon after each poll, cluster is None when the poll failed
+    def update(self, cluster, exit_status, duration):
+        lines = cluster_metrics(cluster, exit_status) if cluster is not None else None
+        self.polls.observe(duration)
+        with self.lock:
+            self.up = 0 if cluster is None else 1
+            self.last_poll = time.time()
+            # A failed poll keeps the last snapshot, sfcheck_up tells it is stale
+            if lines is not None:
+                self.snapshot = lines
+
+    def scrape(self):
+        start = time.time()
+        with self.lock:
+            lines = list(self.snapshot)
+            up = self.up
+            last_poll = self.last_poll
+        add_family(lines, 'sfcheck_up', 'gauge', "Last poll of the MVIP succeeded", [({}, up)])
+        add_family(lines, 'sfcheck_last_poll_timestamp_seconds', 'gauge', "Unix time of the last poll",
+                   [({}, float(last_poll))])
+        lines.extend(self.api_calls.render())
+        lines.extend(self.polls.render())
+        lines.extend(self.scrapes.render())
+        text = "\n".join(lines) + "\n"
+        self.scrapes.observe(time.time() - start)
+        return text
+
+    def serve(self):
+        self.server = MetricsServer((self.address, self.port), MetricsHandler)
+        self.server.exporter = self
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+#Split [HOST:]PORT for the listen address, the host defaults to every interface
+def parse_listen(listen):
+    host, sep, port = listen.rpartition(":")
+    if not port.isdigit():
+        raise ValueError("listen address must be [HOST:]PORT, got " + listen)
+    return host.strip("[]") if sep else "", int(port)
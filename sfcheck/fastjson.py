@@ -0,0 +1,19 @@
+# JSON decoding for API responses
+# orjson decodes the response bytes as they came off the socket, without first
+# building a str of the whole body, and is several times faster on the large
+# list responses. It is used when it is installed and the standard json module
+# otherwise, so it stays an optional speed up rather than a requirement.
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#Decode a response body given as bytes or str, raises ValueError when it isn't JSON
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
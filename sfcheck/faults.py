@@ -0,0 +1,134 @@
+# Cluster faults and the event log, read incrementally
+# Current faults are a short list and are fetched whole. The event log can
+# hold months of history, so only events after the last seen eventID are
+# requested. The cursor and the IDs of the active faults are kept per cluster
+# in a small state file, or in memory by the daemon.
+import json
+import os
+import tempfile
+
+from sfcheck.counting import raw_call
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL
+from sfcheck.samples import safe_name
+
+# Fault severity to Nagios state, an unknown severity is a warning
+SEVERITY_STATES = {
+    'bestPractice': STATE_OK,
+    'warning': STATE_WARNING,
+    'error': STATE_CRITICAL,
+    'critical': STATE_CRITICAL,
+}
+SEVERITIES = ('critical', 'error', 'warning', 'bestPractice')
+
+# Events requested per ListEvents page and pages read per run at most
+EVENT_PAGE = 500
+MAX_EVENT_PAGES = 20
+
+def cursor_path(directory, key):
+    return os.path.join(directory, "cluster-" + safe_name(key) + ".events")
+
+def fault_state(fault):
+    return SEVERITY_STATES.get(fault.get('severity'), STATE_WARNING)
+
+def list_current_faults(sfe):
+    return raw_call(sfe, "ListClusterFaults", {"faultTypes": "current"})['faults']
+
+#ID of the newest event, where a cluster without a cursor starts reading
+def latest_event_id(sfe):
+    events = raw_call(sfe, "ListEvents", {"maxEvents": 1})['events']
+    return events[0]['eventID'] if events else 0
+
+#Events with an ID above after, oldest first. A full page is followed towards the
+#unread end of the range whichever order the cluster returns it in, up to max_pages
+def list_new_events(sfe, after, page_size=EVENT_PAGE, max_pages=MAX_EVENT_PAGES):
+    params = {"startEventID": after + 1, "maxEvents": page_size}
+    events = {}
+    for _ in range(max_pages):
+        page = raw_call(sfe, "ListEvents", params)['events']
+        for event in page:
+            if event['eventID'] > after:
+                events[event['eventID']] = event
+        if len(page) < page_size:
+            break
+        ids = [event['eventID'] for event in page]
+        if ids[0] > ids[-1]:
+            if min(ids) - 1 <= after:
+                break
+            params = {"startEventID": after + 1, "endEventID": min(ids) - 1, "maxEvents": page_size}
+        else:
+            params = {"startEventID": max(ids) + 1, "maxEvents": page_size}
+    return [events[event_id] for event_id in sorted(events)]
+
+
+class FaultTracker(object):
+
+    def __init__(self, event_id=None, active_ids=()):
+        self.event_id = event_id
+        # clusterFaultID -> fault, a fault listed on every poll is announced once
+        self.active = dict((fault_id, None) for fault_id in active_ids)
+
+    #Read the current faults and the events since the cursor, returns what changed
+    def update(self, sfe):
+        current = {}
+        for fault in list_current_faults(sfe):
+            current[fault['clusterFaultID']] = fault
+        new = [current[fault_id] for fault_id in sorted(current) if fault_id not in self.active]
+        resolved = sorted(fault_id for fault_id in self.active if fault_id not in current)
+        if self.event_id is None:
+            events = []
+            self.event_id = latest_event_id(sfe)
+        else:
+            events = list_new_events(sfe, self.event_id)
+            if events:
+                self.event_id = events[-1]['eventID']
+        self.active = current
+        return {'faults': [current[fault_id] for fault_id in sorted(current)], 'new': new,
+                'resolved': resolved, 'events': events, 'event_id': self.event_id}
+
+#Tracker from the state file, a missing or unreadable file starts at the newest event
+def load_tracker(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return FaultTracker(int(data['event_id']), [int(fault_id) for fault_id in data['active']])
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return FaultTracker()
+
+#Write the cursor and active fault IDs to a temporary file and rename it over the previous one
+def save_tracker(path, tracker):
+    handle, temp_path = tempfile.mkstemp(prefix=".events-", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'event_id': tracker.event_id, 'active': sorted(tracker.active)}, f)
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+#Worst state of the active faults and the number of faults per severity
+def evaluate_faults(report):
+    exit_status = STATE_OK
+    counts = dict((severity, 0) for severity in SEVERITIES)
+    for fault in report['faults']:
+        exit_status = max(exit_status, fault_state(fault))
+        counts[fault.get('severity')] = counts.get(fault.get('severity'), 0) + 1
+    return exit_status, counts
+
+def describe_fault(fault):
+    where = ""
+    if fault.get('nodeID'):
+        where += " node " + str(fault['nodeID'])
+    if fault.get('driveID'):
+        where += " drive " + str(fault['driveID'])
+    return str(fault.get('severity')) + " " + str(fault.get('code')) + where
+
+def describe_event(event):
+    return (str(event.get('timeOfReport', "")) + " " + str(event.get('eventType', "")) + " " +
+            str(event.get('message', ""))).strip()
+
+#One line for the daemon output and passive results
+def summarize_faults(report, counts):
+    return ("Faults: " + str(len(report['faults'])) + " active (" +
+            ", ".join(str(counts[severity]) + " " + severity for severity in SEVERITIES) + ") " +
+            str(len(report['new'])) + " new, " + str(len(report['resolved'])) + " resolved, " +
+            str(len(report['events'])) + " new events")
@@ -0,0 +1,77 @@
+# Poll a whole fleet of clusters from one process
+# Clusters are checked concurrently on a bounded thread pool and their Nagios
+# states rolled up into one report, so a cycle costs one interpreter start.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sfcheck.nagios import STATE_OK, STATE_UNKNOWN, status_name
+from sfcheck.output import CheckResult
+
+#Read a cluster inventory, one cluster per line: MVIP USERNAME PASSWORD
+#Blank lines and lines starting with # are skipped
+def read_inventory(path):
+    inventory = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split()
+            if len(fields) != 3:
+                raise ValueError(path + " line " + str(line_no) + ": expected MVIP USERNAME PASSWORD")
+            inventory.append({'mvip': fields[0], 'username': fields[1], 'password': fields[2]})
+    return inventory
+
+#Poll one cluster, a failure becomes an UNKNOWN result instead of stopping the sweep
+def poll_cluster(entry, check):
+    start = time.time()
+    result = {'mvip': entry['mvip'], 'cluster': {}, 'error': None}
+    try:
+        result['exit_status'], result['cluster'] = check(entry)
+    except Exception as e:
+        result['exit_status'] = STATE_UNKNOWN
+        result['error'] = str(e) or e.__class__.__name__
+    result['elapsed'] = time.time() - start
+    return result
+
+#Check every inventory entry with at most `workers` clusters in flight
+#Returns the per cluster results in inventory order and the worst exit state
+def poll_fleet(inventory, check, workers=8):
+    exit_status = STATE_OK
+    if not inventory:
+        return [], exit_status
+    with ThreadPoolExecutor(max_workers=min(workers, len(inventory))) as executor:
+        results = list(executor.map(lambda entry: poll_cluster(entry, check), inventory))
+    for result in results:
+        if result['exit_status'] > exit_status:
+            exit_status = result['exit_status']
+    return results, exit_status
+
+#One line summary for a cluster, shown in the table and in the non-TTY output
+def describe(result):
+    if result['error']:
+        return result['error'][:76]
+    cluster = result['cluster']
+    return (str(cluster.get('cluster_name', '')) + " util " + str(cluster.get('cluster_util', '')) +
+            "% sessions " + str(cluster.get('num_sessions', '')))
+
+#Fleet table, one line per cluster in the long output
+def fleet_result(results, exit_status, wall_time):
+    result = CheckResult('fleet')
+    result.exit_status = exit_status
+    problems = [r for r in results if r['exit_status'] != STATE_OK]
+    section = result.section("Fleet information")
+    for cluster in results:
+        section.row(cluster['mvip'], status_name(cluster['exit_status']) + " " + ("%.2fs" % cluster['elapsed']))
+        section.row("", describe(cluster))
+        result.detail(cluster['mvip'] + ": " + status_name(cluster['exit_status']).lstrip("*") + " " +
+                      ("%.2fs" % cluster['elapsed']) + " " + describe(cluster))
+    section.row("Clusters", str(len(results)))
+    section.row("Wall Time", "%.2fs" % wall_time)
+    result.stamp(section, exit_status)
+    result.summary = ("Fleet: " + str(len(results)) + " clusters, " + str(len(problems)) +
+                      " not OK, wall time " + ("%.2fs" % wall_time))
+    result.perf("clusters", len(results), minimum=0)
+    result.perf("not_ok", len(problems), minimum=0)
+    result.perf("wall_time", wall_time, "s", minimum=0)
+    return result
@@ -0,0 +1,180 @@
+# Fixed record time-series store for trend checks
+# Every cluster gets a memory mapped ring buffer of fixed size records. Writers
+# overwrite the oldest slot and readers walk back from the newest one, so
+# neither ever loads the whole file.
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from sfcheck.nagios import STATE_OK, STATE_UNKNOWN, range_check, add_note
+from sfcheck.samples import safe_name
+
+MAGIC = b"SFTS"
+# Magic, record size, capacity, records ever appended
+HEADER = struct.Struct("<4sIIQ")
+FIELDS = ('sample_time', 'cluster_util', 'used_space', 'max_used_space',
+          'latency_usec', 'read_latency_usec', 'write_latency_usec')
+RECORD = struct.Struct("<" + "d" * len(FIELDS))
+# A week of one minute samples
+DEFAULT_CAPACITY = 10080
+
+def history_path(directory, key):
+    return os.path.join(directory, "cluster-" + safe_name(key) + ".history")
+
+
+class RingBuffer(object):
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        if not os.path.exists(path):
+            self.create(path, capacity)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, record_size, self.capacity, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ValueError(path + " is not a metric history file")
+
+    #Write the header and size the file, the record area stays sparse until used
+    @staticmethod
+    def create(path, capacity):
+        #Built under a temporary name and linked into place, so a check that starts at the same time
+        #never sees a half written header.  If it got there first its file is kept and this one dropped.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".history-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, RECORD.size, capacity, 0))
+                f.truncate(HEADER.size + RECORD.size * capacity)
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def total(self):
+        return HEADER.unpack_from(self.map, 0)[3]
+
+    def __len__(self):
+        return min(self.total(), self.capacity)
+
+    def offset(self, index):
+        return HEADER.size + RECORD.size * (index % self.capacity)
+
+    #Append one record, fields that are missing are stored as NaN
+    def append(self, values):
+        record = [float(values.get(name, float('nan'))) for name in FIELDS]
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            total = self.total()
+            RECORD.pack_into(self.map, self.offset(total), *record)
+            HEADER.pack_into(self.map, 0, MAGIC, RECORD.size, self.capacity, total + 1)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    #Yield up to n records as dicts, newest first
+    def recent(self, n):
+        total = self.total()
+        for index in range(total - 1, max(total - min(n, self.capacity), 0) - 1, -1):
+            yield dict(zip(FIELDS, RECORD.unpack_from(self.map, self.offset(index))))
+
+
+#Append one sample to a cluster's history, creating the file on first use
+def record_sample(directory, key, values, capacity=DEFAULT_CAPACITY):
+    with RingBuffer(history_path(directory, key), capacity) as history:
+        history.append(values)
+
+#Block fullness in percent, NaN when capacity wasn't sampled
+def fullness(record):
+    if not record['max_used_space'] or math.isnan(record['max_used_space']):
+        return float('nan')
+    return record['used_space'] / record['max_used_space'] * 100
+
+#Least squares growth of block fullness over the last n records, one pass with running sums.
+#Returns the latest fullness and the growth in percentage points per day, growth is None with fewer than two points.
+def fullness_growth(history, n):
+    count = 0
+    sum_x = sum_y = sum_xx = sum_xy = 0.0
+    latest = None
+    origin = None
+    for record in history.recent(n):
+        value = fullness(record)
+        if math.isnan(value):
+            continue
+        if origin is None:
+            origin = record['sample_time']
+            latest = value
+        x = (record['sample_time'] - origin) / 86400.0
+        count += 1
+        sum_x += x
+        sum_y += value
+        sum_xx += x * x
+        sum_xy += x * value
+    denominator = count * sum_xx - sum_x * sum_x
+    if count < 2 or denominator == 0:
+        return latest, None
+    return latest, (count * sum_xy - sum_x * sum_y) / denominator
+
+#Days until fullness reaches threshold at the current growth, None when it isn't growing
+def days_until(threshold, latest, growth):
+    if latest is None or growth is None or growth <= 0:
+        return None
+    return max(0.0, (threshold - latest) / growth)
+
+#Nearest rank percentiles of one field over the last n records, only the window is held in memory
+def percentiles(history, field, n, pcts=(50, 95, 99)):
+    values = sorted(v for v in (record[field] for record in history.recent(n)) if not math.isnan(v))
+    result = {}
+    for pct in pcts:
+        if values:
+            result[pct] = values[min(len(values) - 1, int(math.ceil(pct / 100.0 * len(values))) - 1)]
+        else:
+            result[pct] = None
+    return result
+
+#Evaluate the trend check over the last n records.
+#Alerts when block fullness will reach 90% within days_crit/days_warn days, or when p95 latency is over its limits.
+def evaluate_trend(history, n, days_warn=30, days_crit=7, latency_warn=10000, latency_crit=30000):
+    exit_status = STATE_OK
+    latest, growth = fullness_growth(history, n)
+    days = days_until(90, latest, growth)
+    latency = percentiles(history, 'latency_usec', n)
+    trend = {
+        'samples': min(n, len(history)),
+        'fullness': "n/a" if latest is None else str(round(latest, 2)),
+        'growth': "n/a" if growth is None else str(round(growth, 3)),
+        'days_to_90': "n/a" if days is None else str(round(days, 1)),
+        'latency': dict((pct, "n/a" if value is None else str(int(value))) for pct, value in latency.items()),
+        'values': {'fullness': latest, 'growth': growth, 'days_to_90': days, 'latency': latency},
+    }
+    if latest is None:
+        exit_status = STATE_UNKNOWN
+    elif days is not None:
+        # range_check alerts on values above the limits, so compare negated days
+        test_result = range_check(-days_crit, -days_warn, -days)
+        exit_status, trend['days_to_90'] = add_note(test_result, exit_status, trend['days_to_90'])
+    if latency[95] is not None:
+        test_result = range_check(latency_crit, latency_warn, latency[95])
+        exit_status, trend['latency'][95] = add_note(test_result, exit_status, trend['latency'][95])
+    return exit_status, trend
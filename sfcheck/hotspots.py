@@ -0,0 +1,104 @@
+# Per volume hot spot check from one bulk ListVolumeStatsByVolume call
+# Stats are read as raw JSON, turned into per volume rates against the
+# previous sample and the top K volumes picked with heap selection, so a
+# cluster with tens of thousands of volumes stays cheap to check.
+import heapq
+import os
+import time
+from array import array
+from operator import itemgetter
+
+from sfcheck.counting import raw_call
+from sfcheck.nagios import STATE_OK, STATE_CRITICAL, range_check
+from sfcheck.samples import safe_name, load_columns, save_columns
+
+MAGIC = b"SFVS"
+COUNTERS = ('readOps', 'writeOps', 'readBytes', 'writeBytes')
+# One uint64 column per field
+LAYOUT = (('volumeID', 'Q'),) + tuple((name, 'Q') for name in COUNTERS)
+
+# Row layout used for ranking, plain tuples keep 10k+ volumes light
+VOLUME_ID, LATENCY, IOPS, BYTES_SEC, THROTTLE = range(5)
+
+def volume_sample_path(directory, key):
+    return os.path.join(directory, "cluster-" + safe_name(key) + ".volstats")
+
+def collect_volume_stats(sfe):
+    return {'volume_stats': raw_call(sfe, "ListVolumeStatsByVolume")['volumeStats'],
+            'sample_time': time.time()}
+
+#Previous per volume counters as (sample time, {volume_id: row index}, arrays by counter)
+def load_volume_sample(path):
+    sample = load_columns(path, MAGIC, LAYOUT)
+    if sample is None:
+        return None
+    sample_time, columns = sample
+    index = dict((volume_id, row) for row, volume_id in enumerate(columns['volumeID']))
+    return sample_time, index, columns
+
+def save_volume_sample(path, volume_stats, sample_time):
+    columns = {'volumeID': array('Q', [int(stat['volumeID']) for stat in volume_stats])}
+    for name in COUNTERS:
+        columns[name] = array('Q', [int(stat.get(name, 0)) for stat in volume_stats])
+    save_columns(path, MAGIC, sample_time, LAYOUT, columns)
+
+#One ranking row per volume. IOPS and throughput are None without a usable previous sample
+#or when the volume's counters went backwards.
+def volume_rows(volume_stats, sample_time, previous):
+    elapsed = 0
+    if previous is not None:
+        elapsed = sample_time - previous[0]
+    for stat in volume_stats:
+        iops = bytes_sec = None
+        row = previous[1].get(stat['volumeID']) if elapsed > 0 else None
+        if row is not None:
+            columns = previous[2]
+            ops = stat.get('readOps', 0) + stat.get('writeOps', 0) - columns['readOps'][row] - columns['writeOps'][row]
+            moved = (stat.get('readBytes', 0) + stat.get('writeBytes', 0) -
+                     columns['readBytes'][row] - columns['writeBytes'][row])
+            if ops >= 0 and moved >= 0:
+                iops = ops / elapsed
+                bytes_sec = moved / elapsed
+        yield (stat['volumeID'], stat.get('latencyUSec') or 0, iops, bytes_sec, stat.get('throttle') or 0.0)
+
+#Top k rows by latency, IOPS and throttle, O(n log k) each
+def rank(rows, k):
+    with_rates = [row for row in rows if row[IOPS] is not None]
+    return {
+        'latency': heapq.nlargest(k, rows, key=itemgetter(LATENCY)),
+        'iops': heapq.nlargest(k, with_rates, key=itemgetter(IOPS)),
+        'throttle': heapq.nlargest(k, rows, key=itemgetter(THROTTLE)),
+    }
+
+#Collect, rank and apply latency and throttle thresholds to every volume
+def check_hotspots(sfe, directory, key, k=10, latency_warn=10000, latency_crit=30000,
+                   throttle_warn=0.5, throttle_crit=0.8):
+    sample = collect_volume_stats(sfe)
+    path = volume_sample_path(directory, key)
+    previous = load_volume_sample(path)
+    save_volume_sample(path, sample['volume_stats'], sample['sample_time'])
+    rows = list(volume_rows(sample['volume_stats'], sample['sample_time'], previous))
+
+    exit_status = STATE_OK
+    outliers = {'latency_warn': 0, 'latency_crit': 0, 'throttle_warn': 0, 'throttle_crit': 0}
+    for row in rows:
+        latency_result = range_check(latency_crit, latency_warn, row[LATENCY])
+        throttle_result = range_check(throttle_crit, throttle_warn, row[THROTTLE])
+        if latency_result:
+            outliers['latency_crit' if latency_result == STATE_CRITICAL else 'latency_warn'] += 1
+        if throttle_result:
+            outliers['throttle_crit' if throttle_result == STATE_CRITICAL else 'throttle_warn'] += 1
+        exit_status = max(exit_status, latency_result, throttle_result)
+    return exit_status, {
+        'volumes': len(rows),
+        'has_rates': previous is not None,
+        'top': rank(rows, k),
+        'outliers': outliers,
+    }
+
+#Short text for one ranking row, sized to fit the table's value column
+def describe_row(row):
+    text = str(int(row[LATENCY])) + "us"
+    if row[IOPS] is not None:
+        text += " " + str(int(row[IOPS])) + "iops " + str(round(row[BYTES_SEC] / 1024 / 1024, 1)) + "MiB/s"
+    return text + " thr " + str(round(row[THROTTLE], 2))
@@ -0,0 +1,359 @@
+# JSON-RPC node and MVIP check as an importable entry point
+# main() takes the same positional arguments as checkSF_http and returns the
+# Nagios state instead of exiting.  Each check builds a CheckResult that is
+# rendered once, either as the table or in the format given with --output.
+# requests is only loaded once the arguments have been validated, so a usage
+# error costs nothing but the interpreter.
+import os.path
+import sys
+import time
+
+from sfcheck.client import SFApiError
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+from sfcheck.nagios import range_check, add_note, status_name
+from sfcheck.output import CheckResult, FORMATS, default_format, render, write_output
+from sfcheck.profiling import Profile
+
+version="1.6 2018-Feb-2"
+
+checkUtilization=1 #Generate Alerts on the utilization of cluster space
+checkSessions=1    #Generate Alerts on the number of iSCSI sessions
+checkDiskUse=0     #Generate Alerts on disk access
+
+connectTimeout=10  #Seconds to wait for the TLS connection to the node or MVIP
+readTimeout=60     #Seconds to wait for an API response before giving up
+retries=3          #Retries with backoff on connection errors and 5xx responses
+keepHistory=1      #Append stats and capacity to the per cluster metric history used by trend checks
+historyDir="/tmp"  #Directory for the metric history files
+
+nodeWorkers=16        #Nodes probed at once in nodes mode
+nodeConnectTimeout=5  #Seconds to wait for the TLS connection to each node
+nodeReadTimeout=10    #Seconds to wait for each node API response, a hung node only stalls its own probe
+
+pairWorkers=16        #Remote clusters queried at once in replication mode
+pairConnectTimeout=5  #Seconds to wait for the TLS connection to each remote cluster
+pairReadTimeout=30    #Seconds to wait for each remote cluster API response
+lagWarn=600           #Seconds of replication lag on a volume pair before a warning
+lagCrit=1800          #Seconds of replication lag on a volume pair before a critical
+
+murl="/json-rpc/9.0"
+
+def print_usage(prog, error):
+    print("ERROR: " + error)
+    print("USAGE: " + prog + " (IP|HOSTNAME) PORT USERNAME PASSWORD (mvip|node|nodes|replication) [NODEFILE] [--output " +
+          "|".join(FORMATS) + "] [--profile] [--record PATH | --replay SNAPSHOT]")
+    return STATE_UNKNOWN
+
+#Check if new data has been written to disk
+def read_write_check(file_name, new_use):
+    if os.path.isfile(file_name):
+        with open(file_name, 'r+') as f:
+            previous_use=f.readline()
+            f.seek(0)
+            f.write(new_use)
+            f.truncate()
+        if new_use == "00":
+            disk_use="No"
+            exit_status=STATE_CRITICAL
+        elif previous_use == new_use:
+            disk_use="No"
+            exit_status=STATE_WARNING
+        else:
+            disk_use="Yes"
+            exit_status=STATE_OK
+
+    else:
+        with open(file_name, 'w') as f:
+            f.write(new_use)
+        disk_use="n/a"
+        exit_status=STATE_UNKNOWN
+    return disk_use, exit_status
+
+#Get stats, sessions, cluster info, version and capacity in one round trip
+def collect_mvip(client):
+    stats, sessions, info, version_info, capacity=client.batch(
+        ["GetClusterStats", "ListISCSISessions", "GetClusterInfo", "GetClusterVersionInfo", "GetClusterCapacity"])
+    cluster_stats=stats['clusterStats']
+    cluster_capacity=capacity['clusterCapacity']
+    details=info['clusterInfo']
+    return {
+        'read_bytes': cluster_stats['readBytes'],
+        'write_bytes': cluster_stats['writeBytes'],
+        'cluster_util': cluster_stats['clusterUtilization'],
+        'num_sessions': len(sessions['sessions']),
+        'cluster_name': details['name'],
+        'mvip': details.get('mvip', ""),
+        'ensemble': details['ensemble'],
+        'cluster_version': version_info['clusterVersion'],
+        'history': {
+            'sample_time': time.time(),
+            'cluster_util': cluster_stats['clusterUtilization'],
+            'used_space': cluster_capacity['usedSpace'],
+            'max_used_space': cluster_capacity['maxUsedSpace'],
+            'latency_usec': cluster_stats.get('latencyUSec', float('nan')),
+            'read_latency_usec': cluster_stats.get('readLatencyUSec', float('nan')),
+            'write_latency_usec': cluster_stats.get('writeLatencyUSec', float('nan'))},
+    }
+
+def check_node(client):
+    from sfcheck.nodes import collect_node
+    node=collect_node(client)
+    result=CheckResult('node', {'node': client.host})
+    result.exit_status=node['exit_status']
+    section=result.section("")
+    section.row("Node Status", node['state'])
+    section.row("Cluster Name", node['cluster_name'])
+    section.row("MVIP", node['mvip'])
+    result.stamp(section, result.exit_status)
+    result.summary="Node Status: " + node['state'] + " Cluster Name: " + node['cluster_name'] + " MVIP: " + node['mvip']
+    result.perf("active", 1 if node['state'] == "Active" else 0, minimum=0, maximum=1)
+    return result
+
+#Probe every node of the cluster, or every node in node_file, and print one row per node
+def check_nodes(client, ip, username, password, node_file=None):
+    from sfcheck.nodes import read_node_file, list_nodes, probe_nodes, describe
+    start_time=time.time()
+    if node_file:
+        try:
+            nodes=read_node_file(node_file)
+        except (IOError, ValueError) as e:
+            raise SFApiError(str(e))
+    else:
+        nodes=list_nodes(client)
+    results, exit_status=probe_nodes(nodes, username, password, nodeConnectTimeout, nodeReadTimeout, nodeWorkers)
+    wall_time=time.time() - start_time
+    problems=[probe for probe in results if probe['exit_status'] != STATE_OK]
+
+    result=CheckResult('nodes', {'cluster': ip})
+    result.exit_status=exit_status
+    section=result.section("Node matrix")
+    for probe in results:
+        node=probe['node']
+        section.row(str(node['name']) + " " + node['host'], status_name(probe['exit_status']))
+        section.row("", describe(probe))
+        result.detail(str(node['name']) + " " + node['host'] + ": " +
+                      status_name(probe['exit_status']).lstrip("*") + " " + describe(probe))
+    section.row("Nodes", str(len(results)))
+    section.row("Nodes not OK", str(len(problems)))
+    section.row("Wall Time", "%.2fs" % wall_time)
+    result.stamp(section, exit_status)
+    result.summary=("Cluster IP: " + ip + " Nodes: " + str(len(results)) + " Not OK: " + str(len(problems)) +
+                    " Wall Time: " + ("%.2fs" % wall_time))
+    result.perf("nodes", len(results), minimum=0)
+    result.perf("not_ok", len(problems), minimum=0)
+    result.perf("wall_time", wall_time, "s", minimum=0)
+    return result
+
+#Replication state and lag of every cluster pair, each remote cluster is queried concurrently
+def check_replication(client, ip, port, username, password):
+    from sfcheck.replication import check_replication as check_pairs, describe_pair, format_lag
+    start_time=time.time()
+    exit_status, replication=check_pairs(client, username, password, port, pairConnectTimeout, pairReadTimeout,
+                                         pairWorkers, lagWarn, lagCrit)
+    wall_time=time.time() - start_time
+    pairs=replication['pairs']
+    problems=[pair for pair in pairs if pair['exit_status'] != STATE_OK]
+
+    result=CheckResult('replication', {'cluster': ip})
+    result.exit_status=exit_status
+    section=result.section("Cluster pairs")
+    for pair in pairs:
+        cluster_pair=pair['cluster_pair']
+        name=str(cluster_pair.get('clusterName', "")) + " " + str(cluster_pair.get('mvip', ""))
+        section.row(name, status_name(pair['exit_status']))
+        section.row("", describe_pair(pair))
+        result.detail(name + ": " + status_name(pair['exit_status']).lstrip("*") + " " + describe_pair(pair) +
+                      (" %.2fs" % pair['elapsed']))
+    if replication['top_lag']:
+        section=result.section("Volume pairs by lag")
+        for lag, cluster_name, volume in replication['top_lag']:
+            section.row(str(volume['volume_id']) + " " + volume['name'][:24], format_lag(lag) + " " + cluster_name)
+    section=result.section("Replication")
+    worst_lag=format_lag(replication['worst_lag'])
+    if replication['worst_lag'] is not None:
+        test_result=range_check(lagCrit, lagWarn, replication['worst_lag'])
+        result.exit_status, worst_lag=add_note(test_result, result.exit_status, worst_lag)
+    section.row("Cluster Pairs", str(len(pairs)))
+    section.row("Pairs not OK", str(len(problems)))
+    section.row("Volume Pairs", str(replication['volumes']))
+    section.row("Paused", str(replication['paused']))
+    section.row("Errors", str(replication['errors']))
+    section.row("Worst Lag", worst_lag)
+    section.row("Wall Time", "%.2fs" % wall_time)
+    result.stamp(section, result.exit_status)
+    result.summary=("Cluster IP: " + ip + " Cluster Pairs: " + str(len(pairs)) + " Not OK: " + str(len(problems)) +
+                    " Volume Pairs: " + str(replication['volumes']) + " Paused: " + str(replication['paused']) +
+                    " Errors: " + str(replication['errors']) + " Worst Lag: " + worst_lag)
+    result.perf("pairs", len(pairs), minimum=0)
+    result.perf("not_ok", len(problems), minimum=0)
+    result.perf("volume_pairs", replication['volumes'], minimum=0)
+    result.perf("paused", replication['paused'], minimum=0)
+    result.perf("errors", replication['errors'], minimum=0)
+    if replication['worst_lag'] is not None:
+        result.perf("lag", replication['worst_lag'], "s", lagWarn, lagCrit, 0)
+    result.perf("wall_time", wall_time, "s", minimum=0)
+    return result
+
+def check_mvip(client, ip, keep_history=True):
+    exit_status=STATE_OK
+    cluster=collect_mvip(client)
+    cluster_read_bytes=str(cluster['read_bytes'])
+    cluster_write_bytes=str(cluster['write_bytes'])
+    cluster_use=str(cluster['cluster_util'])
+    ensemble=cluster['ensemble']
+
+    #Feed the metric history shared with the element script's trend mode, a replayed run has nothing new to add.
+    #Like the element script it is kept under the MVIP the cluster reports, not the address given here.
+    if keepHistory == 1 and keep_history:
+        from sfcheck.history import record_sample
+        try:
+            record_sample(historyDir, cluster['mvip'] or ip, cluster['history'])
+        except (IOError, OSError, ValueError):
+            pass
+
+    if checkDiskUse == 1:
+        file_name="/tmp/cluster-" + ip + ".txt"
+        try:
+            disk_use, test_result=read_write_check(file_name, cluster_read_bytes + cluster_write_bytes)
+        except (IOError, OSError):
+            raise SFApiError("Unable to open & write to " + file_name + " check perms or set checkDiskUse=0")
+        exit_status, disk_use=add_note(test_result, exit_status, disk_use)
+
+    else:
+        disk_use="n/a"
+
+    if checkUtilization == 1:
+        test_result=range_check(90, 80, float(cluster_use))
+        exit_status, cluster_use=add_note(test_result, exit_status, cluster_use)
+
+    #In SolidFire OS v.5 we have a soft limit of 250 Volumes * 4 active sessions per node
+    max_sessions=len(ensemble) * 1000
+    warn_sessions=max_sessions * .90
+    num_sessions=str(cluster['num_sessions'])
+    if checkSessions == 1:
+        test_result=range_check(max_sessions, warn_sessions, cluster['num_sessions'])
+        exit_status, num_sessions=add_note(test_result, exit_status, num_sessions)
+    ensemble_string = ('%s' % ' '.join(map(str, ensemble)))
+    ensemble_string = ensemble_string.strip()
+    result=CheckResult('mvip', {'cluster': ip})
+    result.exit_status=exit_status
+    section=result.section("")
+    section.row("Cluster", ip)
+    section.row("Version", cluster['cluster_version'])
+    section.row("Disk Activity", disk_use)
+    section.row("Read Bytes", cluster_read_bytes)
+    section.row("Write Bytes", cluster_write_bytes)
+    section.row("Utilization %", cluster_use)
+    section.row("iSCSI Sessions", num_sessions)
+    section.row("Cluster Name", cluster['cluster_name'])
+    section.row("Ensemble Members", ensemble_string)
+    result.stamp(section, exit_status)
+    result.summary=("Cluster IP: " + ip + " Version: " + cluster['cluster_version'] + " Disk Activity: " + disk_use +
+                    " Read Bytes: " + cluster_read_bytes + " Write Bytes: " + cluster_write_bytes +
+                    " Utilization: " + cluster_use + " ISCSI Sessions: " + num_sessions +
+                    " Name: " + cluster['cluster_name'] + " Ensemble: "  + '[%s]' % ', '.join(map(str, ensemble)))
+    result.perf("util", cluster['cluster_util'], "%", 80, 90, 0, 100)
+    result.perf("sessions", cluster['num_sessions'], "", warn_sessions, max_sessions, 0)
+    result.perf("read_bytes", cluster['read_bytes'], "c")
+    result.perf("write_bytes", cluster['write_bytes'], "c")
+    history=cluster['history']
+    result.perf("used_space", history['used_space'], "B", minimum=0, maximum=history['max_used_space'])
+    result.perf("latency", history['latency_usec'], "us", minimum=0)
+    return result
+
+#Take --output FORMAT (or --output=FORMAT), --profile, --record PATH and --replay SNAPSHOT out of argv,
+#the rest stays positional
+def split_options(argv):
+    output_format=None
+    profile=False
+    record=None
+    replay=None
+    positional=[]
+    args=iter(argv)
+    for arg in args:
+        if arg == "--output":
+            output_format=next(args, "")
+        elif arg.startswith("--output="):
+            output_format=arg[len("--output="):]
+        elif arg == "--profile":
+            profile=True
+        elif arg == "--record":
+            record=next(args, "")
+        elif arg == "--replay":
+            replay=next(args, "")
+        else:
+            positional.append(arg)
+    return output_format, profile, record, replay, positional
+
+#Check the command line options, then run the node, nodes, replication or mvip check, write its output and return its Nagios state
+def main(argv=None):
+    if argv is None:
+        argv=sys.argv[1:]
+    prog=sys.argv[0]
+    output_format, profiling, record_path, replay_path, argv=split_options(argv)
+    if output_format is not None and output_format not in FORMATS:
+        return print_usage(prog, "Invalid output format " + output_format + ", use " + ", ".join(FORMATS))
+    snapshot=None
+    if replay_path is not None:
+        from sfcheck.snapshot import Snapshot
+        try:
+            snapshot=Snapshot(replay_path)
+        except (IOError, OSError, ValueError, KeyError) as e:
+            return print_usage(prog, "Unable to read snapshot " + replay_path + ": " + str(e))
+        if snapshot.script != "http":
+            return print_usage(prog, replay_path + " was recorded by the " + snapshot.script + " check")
+        #The address and type come from the snapshot when they are not given
+        if len(argv) < 5:
+            argv=[snapshot.target, "443", "", "", snapshot.meta.get("ip_type", "mvip")]
+    if len(argv) < 5:
+        return print_usage(prog, "Incorrect Number of Arguments.")
+    ip, port, username, password, ip_type=argv[:5]
+    if ip_type not in ("mvip", "node", "nodes", "replication"):
+        return print_usage(prog, "Invalid type specified, use node, nodes, replication or mvip")
+    node_file=argv[5] if len(argv) > 5 and ip_type == "nodes" else None
+    if ip_type in ("nodes", "replication") and (record_path or replay_path):
+        return print_usage(prog, "--record and --replay are not available for the " + ip_type + " check")
+
+    profile=Profile()
+    #One client serves every call below, so the connection and auth header are set up once
+    if snapshot is not None:
+        from sfcheck.snapshot import ReplayClient
+        client=ReplayClient(snapshot)
+    else:
+        from sfcheck.client import SFClient
+        client=SFClient(ip, port, username, password, murl, connectTimeout, readTimeout, retries)
+    recorder=None
+    with client:
+        if profiling:
+            client.profile=profile
+        if record_path:
+            from sfcheck.snapshot import Recorder
+            recorder=Recorder(record_path, "http", ip, {"ip_type": ip_type})
+            client.recorder=recorder
+        try:
+            with profile.phase("check"):
+                if ip_type == 'node':
+                    result=check_node(client)
+                elif ip_type == 'nodes':
+                    result=check_nodes(client, ip, username, password, node_file)
+                elif ip_type == 'replication':
+                    result=check_replication(client, ip, port, username, password)
+                else:
+                    result=check_mvip(client, ip, snapshot is None)
+        except SFApiError as e:
+            return print_usage(prog, str(e))
+    if snapshot is not None:
+        result.restamp(snapshot.recorded)
+    if recorder is not None:
+        try:
+            result.detail("Recorded snapshot " + recorder.save())
+        except (IOError, OSError) as e:
+            result.detail("Unable to record snapshot in " + record_path + ": " + str(e))
+    output_format=output_format or default_format()
+    if profiling:
+        # Render once for its timing, the profile has to be in the result before the real pass
+        with profile.phase("render"):
+            render(result, output_format, version)
+        profile.report(result)
+    write_output(render(result, output_format, version))
+    return result.exit_status
@@ -0,0 +1,79 @@
+# Prometheus histograms for self-instrumentation and API call timing
+# Kept to what the exporter needs: cumulative buckets per label set, guarded
+# by a lock so the poller can observe while a scrape is rendering.
+import threading
+import time
+
+from sfcheck.output import label_string
+
+# Seconds, from a cached scrape up to a slow ListVolumes page on a busy MVIP
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram(object):
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        # label values -> [bucket counts..., sum, count]
+        self.series = {}
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    #Time a block: with histogram.time('GetClusterStats'): ...
+    def time(self, *label_values):
+        return Timer(self, label_values)
+
+    #Text exposition lines for every label set seen so far
+    def render(self, labels=None):
+        labels = labels or {}
+        lines = ["# HELP " + self.name + " " + self.help_text, "# TYPE " + self.name + " histogram"]
+        with self.lock:
+            series = sorted((key, list(values)) for key, values in self.series.items())
+        for label_values, values in series:
+            own = dict(labels)
+            own.update(zip(self.label_names, label_values))
+            for bound, count in zip(self.buckets, values):
+                lines.append(self.name + "_bucket" + label_string(own, {'le': repr(float(bound))}) +
+                             " " + str(count))
+            lines.append(self.name + "_bucket" + label_string(own, {'le': "+Inf"}) + " " + str(values[-1]))
+            lines.append(self.name + "_sum" + label_string(own) + " " + repr(float(values[-2])))
+            lines.append(self.name + "_count" + label_string(own) + " " + str(values[-1]))
+        return lines
+
+
+class Timer(object):
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.time() - self.start, *self.label_values)
+
+#Time every API call made through an ElementFactory connection, SDK methods and raw calls alike,
+#by wrapping the send_request every one of them goes through
+def instrument(sfe, histogram):
+    send_request = sfe.send_request
+
+    def timed_send_request(method_name, *args, **kwargs):
+        with histogram.time(method_name):
+            return send_request(method_name, *args, **kwargs)
+    sfe.send_request = timed_send_request
+    return sfe
@@ -0,0 +1,49 @@
+# Nagios plugin states and the threshold helpers shared by the check scripts
+import textwrap
+
+#This is a nagios thing, nagionic you might say.
+STATE_OK=0
+STATE_WARNING=1
+STATE_CRITICAL=2
+STATE_UNKNOWN=3
+
+STATUS_NAMES = {
+    STATE_OK: "OK",
+    STATE_WARNING: "*Warning",
+    STATE_CRITICAL: "*Critical",
+    STATE_UNKNOWN: "*Unknown",
+}
+
+#Compare ranges of numbers
+def range_check(critical, warning, value):
+    if value > critical:
+        exit_status=STATE_CRITICAL
+    elif value > warning:
+        exit_status=STATE_WARNING
+    else:
+        exit_status=STATE_OK
+    return exit_status
+
+#Add a asterik to values that are in error
+def add_note(test_result, exit_status, value):
+    if test_result != 0:
+        value=value + "*"
+        if test_result > exit_status:
+            exit_status = test_result
+    return exit_status, value
+
+#Name of an exit state as shown in the Exit State row
+def status_name(exit_status):
+    return STATUS_NAMES.get(exit_status, "*Unknown")
+
+#Lines of one table row
+def table_row(description, value, width):
+    #When printing values wider than the second column, split and print them
+    int_width = (int(width/2))
+    if len(value) > int_width:
+        lines = ["| "  + description.ljust(int_width) + " |" + "|".rjust(int_width + 1)]
+        wrapped=textwrap.wrap(value, 18)
+        for loop in wrapped:
+            lines.append("| ".ljust(int_width+2) + " | " + loop + "|".rjust(int_width-(len(loop))))
+        return lines
+    return ["| " + description.ljust(int_width) + " | " + value  + "|".rjust(int_width-(len(value)))]
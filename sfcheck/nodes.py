@@ -0,0 +1,107 @@
+# Per-node health probes over the node API
+# Every node is probed on its own client and a bounded thread pool, so one
+# hung node costs a worker and its own timeouts instead of stalling the sweep.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sfcheck.client import SFClient, SFApiError, SFConnectionError
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+
+NODE_PORT = 442
+
+#Get the node's cluster state and, for an active node, the MVIP it can reach
+def collect_node(client):
+    response = client.call("GetClusterState")
+    try:
+        cluster_state = response['state']
+    except (KeyError, TypeError):
+        raise SFApiError("State not found, are you sure this is a node?")
+
+    if cluster_state != "Active":
+        return {'state': cluster_state, 'cluster_name': "n/a", 'mvip': "n/a",
+                'exit_status': STATE_UNKNOWN}
+    details = client.call("TestConnectMvip")['details']
+    if 'mvip' in details:
+        cluster_mvip = details['mvip']
+        exit_status = STATE_OK
+    else:
+        cluster_mvip = "*n/a Not in Cluster"
+        exit_status = STATE_WARNING
+    return {'state': cluster_state, 'cluster_name': response['cluster'], 'mvip': cluster_mvip,
+            'exit_status': exit_status}
+
+#Split HOST, HOST:PORT or [IPV6]:PORT, the node API port is the default
+def split_address(address, default_port=NODE_PORT):
+    if address.startswith('['):
+        host, sep, port = address[1:].partition(']:')
+    elif address.count(':') == 1:
+        host, sep, port = address.partition(':')
+    else:
+        return address, default_port
+    if sep and port.isdigit():
+        return host, int(port)
+    return address.strip('[]'), default_port
+
+#Read a node list, one node per line: ADDRESS [NAME] where ADDRESS is HOST or HOST:PORT
+#Blank lines and lines starting with # are skipped
+def read_node_file(path):
+    nodes = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split()
+            if len(fields) > 2:
+                raise ValueError(path + " line " + str(line_no) + ": expected ADDRESS [NAME]")
+            host, port = split_address(fields[0])
+            nodes.append({'node_id': None, 'name': fields[1] if len(fields) == 2 else host,
+                          'host': host, 'port': port})
+    return nodes
+
+#Active nodes from ListAllNodes on the MVIP, each probed on its management IP
+def list_nodes(client, port=NODE_PORT):
+    nodes = []
+    for node in client.call("ListAllNodes")['nodes']:
+        host, node_port = split_address(node['mip'], port)
+        nodes.append({'node_id': node.get('nodeID'), 'name': node.get('name') or host,
+                      'host': host, 'port': node_port})
+    return nodes
+
+#Probe one node, a failure becomes a CRITICAL result instead of stopping the sweep
+def probe_node(node, username, password, connect_timeout, read_timeout):
+    start = time.time()
+    result = {'node': node, 'error': None}
+    try:
+        with SFClient(node['host'], node['port'], username, password, "/json-rpc/9.0",
+                      connect_timeout, read_timeout, retries=0) as client:
+            result.update(collect_node(client))
+    except SFConnectionError:
+        result.update({'state': "n/a", 'cluster_name': "n/a", 'mvip': "n/a",
+                       'exit_status': STATE_CRITICAL, 'error': "unreachable"})
+    except (SFApiError, KeyError, TypeError) as e:
+        result.update({'state': "n/a", 'cluster_name': "n/a", 'mvip': "n/a",
+                       'exit_status': STATE_CRITICAL, 'error': str(e) or e.__class__.__name__})
+    result['elapsed'] = time.time() - start
+    return result
+
+#Probe every node with at most `workers` in flight
+#Returns the per node results in list order and the worst exit state
+def probe_nodes(nodes, username, password, connect_timeout=5, read_timeout=10, workers=16):
+    exit_status = STATE_OK
+    if not nodes:
+        return [], exit_status
+    with ThreadPoolExecutor(max_workers=min(workers, len(nodes))) as executor:
+        results = list(executor.map(lambda node: probe_node(node, username, password,
+                                                             connect_timeout, read_timeout), nodes))
+    for result in results:
+        if result['exit_status'] > exit_status:
+            exit_status = result['exit_status']
+    return results, exit_status
+
+#One cell of the status matrix: state, cluster, MVIP and probe time, or the error
+def describe(result):
+    if result['error']:
+        return result['error'][:32] + (" %.2fs" % result['elapsed'])
+    return (result['state'] + " " + result['cluster_name'] + " " + result['mvip'] +
+            (" %.2fs" % result['elapsed']))
@@ -0,0 +1,137 @@
+# Per node performance from one bulk ListNodeStats call
+# The response is laid out straight into array columns, one per counter, and
+# kept as the previous sample for rates. Deltas, the CPU and IOPS imbalance and
+# outliers are computed column by column, so a 40 node cluster checked every
+# minute costs one API call and a few small arrays.
+import math
+import os
+import time
+from array import array
+
+from sfcheck.counting import raw_call
+from sfcheck.nagios import STATE_OK, range_check
+from sfcheck.samples import safe_name, load_columns, save_columns
+
+MAGIC = b"SFNS"
+# Cumulative counters, rates come from the difference to the previous sample
+COUNTERS = ('readOps', 'writeOps', 'readLatencyUSecTotal', 'writeLatencyUSecTotal',
+            'sBytesIn', 'sBytesOut', 'cBytesIn', 'cBytesOut')
+# Point in time values
+GAUGES = ('cpu', 'usedMemory', 'networkUtilizationStorage', 'networkUtilizationCluster')
+LAYOUT = ((('nodeID', 'Q'),) + tuple((name, 'Q') for name in COUNTERS) +
+          tuple((name, 'd') for name in GAUGES))
+
+# Modified z-score above which a node is an outlier (Iglewicz and Hoaglin)
+OUTLIER_SCORE = 3.5
+
+def node_sample_path(directory, key):
+    return os.path.join(directory, "cluster-" + safe_name(key) + ".nodestats")
+
+#ListNodeStats as columns by field name, rows ordered by node ID
+def collect_node_stats(sfe):
+    nodes = sorted(raw_call(sfe, "ListNodeStats")['nodeStats']['nodes'], key=lambda node: node['nodeID'])
+    columns = {}
+    for name, typecode in LAYOUT:
+        if typecode == 'Q':
+            columns[name] = array('Q', [int(node.get(name) or 0) for node in nodes])
+        else:
+            columns[name] = array('d', [float(node.get(name) or 0) for node in nodes])
+    return time.time(), columns
+
+#Per second rate columns against the previous sample, NaN for a node without a usable previous row
+def node_rates(sample_time, columns, previous):
+    nan = float('nan')
+    count = len(columns['nodeID'])
+    rates = dict((name, array('d', [nan] * count))
+                 for name in ('iops', 'read_latency', 'write_latency', 'storage_bytes_sec', 'cluster_bytes_sec'))
+    if previous is None or sample_time <= previous[0]:
+        return rates
+    elapsed = sample_time - previous[0]
+    old = previous[1]
+    index = dict((node_id, row) for row, node_id in enumerate(old['nodeID']))
+    old_rows = [index.get(node_id) for node_id in columns['nodeID']]
+    deltas = {}
+    for name in COUNTERS:
+        current = columns[name]
+        before = old[name]
+        deltas[name] = array('d', [nan if old_row is None else float(current[row]) - before[old_row]
+                                   for row, old_row in enumerate(old_rows)])
+    for row in range(count):
+        # A counter going backwards means the node restarted, there is no rate this time
+        if any(not deltas[name][row] >= 0 for name in COUNTERS):
+            continue
+        read_ops = deltas['readOps'][row]
+        write_ops = deltas['writeOps'][row]
+        rates['iops'][row] = (read_ops + write_ops) / elapsed
+        if read_ops:
+            rates['read_latency'][row] = deltas['readLatencyUSecTotal'][row] / read_ops
+        if write_ops:
+            rates['write_latency'][row] = deltas['writeLatencyUSecTotal'][row] / write_ops
+        rates['storage_bytes_sec'][row] = (deltas['sBytesIn'][row] + deltas['sBytesOut'][row]) / elapsed
+        rates['cluster_bytes_sec'][row] = (deltas['cBytesIn'][row] + deltas['cBytesOut'][row]) / elapsed
+    return rates
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+#Max over mean of a column, with the row holding the max. NaN rows are left out.
+def imbalance(column):
+    rows = [row for row, value in enumerate(column) if not math.isnan(value)]
+    if not rows:
+        return float('nan'), None
+    hottest = max(rows, key=lambda row: column[row])
+    mean = sum(column[row] for row in rows) / len(rows)
+    if mean <= 0:
+        return float('nan'), hottest
+    return column[hottest] / mean, hottest
+
+#Rows whose modified z-score from the median absolute deviation is above OUTLIER_SCORE on the high side
+def outliers(column, score=OUTLIER_SCORE):
+    values = [value for value in column if not math.isnan(value)]
+    if len(values) < 3:
+        return []
+    center = median(values)
+    deviation = median([abs(value - center) for value in values])
+    if deviation == 0:
+        return []
+    return [row for row, value in enumerate(column)
+            if not math.isnan(value) and 0.6745 * (value - center) / deviation > score]
+
+#Collect, store the sample and evaluate per node CPU and the CPU imbalance
+def check_nodes(sfe, directory, key, cpu_warn=80, cpu_crit=95, imbalance_warn=2.0, imbalance_crit=3.0):
+    sample_time, columns = collect_node_stats(sfe)
+    path = node_sample_path(directory, key)
+    previous = load_columns(path, MAGIC, LAYOUT)
+    save_columns(path, MAGIC, sample_time, LAYOUT, columns)
+    rates = node_rates(sample_time, columns, previous)
+
+    exit_status = STATE_OK
+    for cpu in columns['cpu']:
+        exit_status = max(exit_status, range_check(cpu_crit, cpu_warn, cpu))
+    cpu_imbalance, hottest = imbalance(columns['cpu'])
+    if not math.isnan(cpu_imbalance):
+        exit_status = max(exit_status, range_check(imbalance_crit, imbalance_warn, cpu_imbalance))
+    iops_imbalance, busiest = imbalance(rates['iops'])
+    hot = sorted(set(outliers(columns['cpu'])) | set(outliers(rates['iops'])))
+    return exit_status, {
+        'columns': columns,
+        'rates': rates,
+        'has_rates': previous is not None,
+        'cpu_imbalance': cpu_imbalance,
+        'hottest': hottest,
+        'iops_imbalance': iops_imbalance,
+        'busiest': busiest,
+        'outliers': hot,
+    }
+
+#Short text for one node, sized to fit the table's value column
+def describe_node(nodes, row):
+    text = "cpu " + str(round(nodes['columns']['cpu'][row], 1)) + "%"
+    iops = nodes['rates']['iops'][row]
+    if not math.isnan(iops):
+        text += " " + str(int(iops)) + "iops " + str(round(nodes['rates']['storage_bytes_sec'][row] / 1024 / 1024, 1)) + "MiB/s"
+    return text
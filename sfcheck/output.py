@@ -0,0 +1,182 @@
+# One result model for every check and the renderers that turn it into text
+# A check fills a CheckResult with table sections, perfdata and a summary;
+# the chosen renderer builds the whole output as one string and write_output
+# hands it to stdout in a single write instead of one print per row.
+import json
+import re
+import sys
+import time
+
+from sfcheck.nagios import STATE_OK, STATUS_NAMES, status_name, table_row
+
+FORMATS = ('table', 'nagios', 'json', 'prometheus')
+
+#Units Nagios perfdata allows and the suffix the Prometheus metric name gets for each
+PROMETHEUS_UNITS = {'': '', '%': '_percent', 's': '_seconds', 'ms': '_milliseconds', 'us': '_microseconds',
+                    'B': '_bytes', 'KB': '_kilobytes', 'MB': '_megabytes', 'TB': '_terabytes', 'c': '_total'}
+
+
+class Section(object):
+
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+
+    def row(self, label, value):
+        self.rows.append((label, value))
+
+
+class CheckResult(object):
+
+    def __init__(self, check, labels=None):
+        self.check = check
+        self.labels = labels or {}
+        self.exit_status = STATE_OK
+        self.summary = ""
+        self.sections = []
+        self.perfdata = []
+        self.details = []
+        self.timestamp = time.time()
+
+    #Start a new table, rows are added to the returned section
+    def section(self, title):
+        section = Section(title)
+        self.sections.append(section)
+        return section
+
+    #Execution Time and, when given, Exit State rows that close most tables
+    def stamp(self, section, exit_status=None):
+        section.row("Execution Time ", time.asctime(time.localtime(self.timestamp)))
+        if exit_status is not None:
+            section.row("Exit State ", status_name(exit_status))
+
+    #Move the result and its Execution Time rows to another time, as for a replayed snapshot
+    def restamp(self, timestamp):
+        self.timestamp = timestamp
+        text = time.asctime(time.localtime(timestamp))
+        for section in self.sections:
+            section.rows = [(label, text if label == "Execution Time " else value) for label, value in section.rows]
+
+    #One perfdata value, uom is one of the Nagios units in PROMETHEUS_UNITS
+    def perf(self, label, value, uom="", warn=None, crit=None, minimum=None, maximum=None):
+        self.perfdata.append((label, value, uom, warn, crit, minimum, maximum))
+
+    #One line of Nagios long output
+    def detail(self, line):
+        self.details.append(line)
+
+#Perfdata and Prometheus numbers: integers stay integers, floats lose trailing zeros
+def format_number(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return ('%.3f' % value).rstrip('0').rstrip('.')
+    return str(value)
+
+def render_table(result, version):
+    lines = []
+    rule = "+" + "-"*83 + "+"
+    for section in result.sections:
+        lines.append(rule)
+        lines.append("| SolidFire Monitoring Plugin v." + version + (" " + section.title + " |").rjust(39))
+        lines.append(rule)
+        for label, value in section.rows:
+            lines.extend(table_row(label, value, 80))
+        lines.append(rule)
+    return "\n".join(lines) + "\n"
+
+#Plugin output: STATUS - summary | 'label'=value[uom];warn;crit;min;max followed by the long output lines
+def render_nagios(result, version=None):
+    perfdata = []
+    for label, value, uom, warn, crit, minimum, maximum in result.perfdata:
+        if value is None or value != value:
+            continue
+        fields = [format_number(value) + uom, format_number(warn), format_number(crit),
+                  format_number(minimum), format_number(maximum)]
+        perfdata.append("'" + label.replace("'", "") + "'=" + ";".join(fields).rstrip(";"))
+    line = status_name(result.exit_status).lstrip("*").upper() + " - " + result.summary
+    if perfdata:
+        line += " | " + " ".join(perfdata)
+    return "\n".join([line] + result.details) + "\n"
+
+def render_json(result, version=None):
+    return json.dumps({
+        'check': result.check,
+        'version': version,
+        'timestamp': result.timestamp,
+        'labels': result.labels,
+        'exit_status': result.exit_status,
+        'status': STATUS_NAMES.get(result.exit_status, "*Unknown").lstrip("*").upper(),
+        'summary': result.summary,
+        'perfdata': [{'label': label, 'value': value, 'uom': uom, 'warn': warn, 'crit': crit,
+                      'min': minimum, 'max': maximum}
+                     for label, value, uom, warn, crit, minimum, maximum in result.perfdata],
+        'sections': [{'title': section.title, 'rows': [[label, value] for label, value in section.rows]}
+                     for section in result.sections],
+        'details': result.details,
+    }) + "\n"
+
+def metric_name(check, label, uom):
+    name = re.sub(r'[^a-zA-Z0-9_]+', '_', label).strip('_').lower()
+    suffix = PROMETHEUS_UNITS.get(uom, '')
+    if name.endswith(suffix):
+        suffix = ''
+    return "sfcheck_" + check + "_" + name + suffix
+
+def label_string(labels, extra=None):
+    pairs = sorted(labels.items()) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(key + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+                          for key, value in pairs) + "}"
+
+#Text exposition format, one gauge per perfdata value plus the check's exit state
+def render_prometheus(result, version=None):
+    lines = []
+    labels = label_string(result.labels)
+    seen = set()
+    name = "sfcheck_" + result.check + "_status"
+    lines.append("# HELP " + name + " Nagios exit state of the " + result.check + " check")
+    lines.append("# TYPE " + name + " gauge")
+    lines.append(name + labels + " " + str(result.exit_status))
+    for label, value, uom, warn, crit, minimum, maximum in result.perfdata:
+        if value is None:
+            continue
+        name = metric_name(result.check, label, uom)
+        if name not in seen:
+            seen.add(name)
+            lines.append("# HELP " + name + " " + label)
+            lines.append("# TYPE " + name + (" counter" if uom == 'c' else " gauge"))
+        lines.append(name + labels + " " + format_number(value))
+    return "\n".join(lines) + "\n"
+
+RENDERERS = {
+    'table': render_table,
+    'nagios': render_nagios,
+    'json': render_json,
+    'prometheus': render_prometheus,
+}
+
+#Table on a terminal, plugin output with perfdata for Nagios
+def default_format(stream=None):
+    stream = stream or sys.stdout
+    return 'table' if stream.isatty() else 'nagios'
+
+def render(result, output_format, version):
+    return RENDERERS[output_format](result, version)
+
+#Hand the rendered output to the stream in one write
+def write_output(text, stream=None):
+    stream = stream or sys.stdout
+    buffer = getattr(stream, 'buffer', None)
+    if buffer is None:
+        stream.write(text)
+        stream.flush()
+        return
+    stream.flush()
+    buffer.write(text.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace'))
+    buffer.flush()
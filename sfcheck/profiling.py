@@ -0,0 +1,143 @@
+# Where a check spends its time: phases, API calls and optionally memory
+# A Profile times named phases and every API call on an instrumented
+# connection, with the response size and the number of JSON objects in it.
+# The breakdown is added to the CheckResult as a table section and perfdata,
+# so it comes out in whatever format the check is rendered in.
+import threading
+import time
+
+
+class Profile(object):
+
+    def __init__(self, cprofile_path=None, trace_memory=0):
+        self.cprofile_path = cprofile_path
+        self.trace_memory = trace_memory
+        self.phases = []
+        # method -> [calls, wall seconds, response bytes, JSON objects]
+        self.calls = {}
+        self.order = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.profiler = None
+        self.memory = None
+
+    #Start the optional cProfile and tracemalloc hooks
+    def start(self):
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.cprofile_path:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    #Stop the hooks, write the cProfile stats and keep the memory snapshot for the report
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.cprofile_path)
+            self.profiler = None
+        if self.trace_memory:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                top = tracemalloc.take_snapshot().statistics('lineno')[:self.trace_memory]
+                tracemalloc.stop()
+                self.memory = (current, peak, top)
+
+    #Time a block: with profile.phase('connect'): ...
+    def phase(self, name):
+        return Phase(self, name)
+
+    def record_call(self, method, wall, size, objects):
+        with self.lock:
+            entry = self.calls.get(method)
+            if entry is None:
+                entry = self.calls[method] = [0, 0.0, 0, 0]
+                self.order.append(method)
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += size
+            entry[3] += objects
+
+    #fetch hook for collect_cluster, every collector becomes a phase
+    def fetch(self, sfe):
+        def timed_fetch(name, collector):
+            with self.phase("collect " + name):
+                return collector(sfe)
+        return timed_fetch
+
+    #Time every API call on an ElementFactory connection. send_request gives the wall time
+    #including parsing, the dispatcher underneath it sees the raw response
+    def instrument(self, sfe):
+        send_request = sfe.send_request
+        dispatcher = sfe._dispatcher
+        post = dispatcher.post
+        local = self.local
+
+        def measured_post(data):
+            response = post(data)
+            if not isinstance(response, dict):
+                local.size = len(response)
+                local.objects = response.count(b'{' if isinstance(response, bytes) else '{')
+            return response
+
+        def timed_send_request(method_name, *args, **kwargs):
+            local.size = local.objects = 0
+            start = time.time()
+            try:
+                return send_request(method_name, *args, **kwargs)
+            finally:
+                self.record_call(method_name, time.time() - start, local.size, local.objects)
+        dispatcher.post = measured_post
+        sfe.send_request = timed_send_request
+        return sfe
+
+    #Add the breakdown to a CheckResult as a Profile table, long output lines and perfdata
+    def report(self, result):
+        section = result.section("Profile")
+        for name, wall in self.phases:
+            section.row(name, "%.3fs" % wall)
+            result.perf("phase_" + name.replace(" ", "_"), wall, "s", minimum=0)
+        for method in self.order:
+            calls, wall, size, objects = self.calls[method]
+            section.row(method, str(calls) + "x " + ("%.3fs " % wall) + size_text(size) + " " +
+                        str(objects) + " obj")
+            result.detail("API " + method + ": " + str(calls) + " calls " + ("%.3fs " % wall) +
+                          str(size) + " bytes " + str(objects) + " objects")
+            result.perf("api_" + method, wall, "s", minimum=0)
+            result.perf("api_" + method + "_bytes", size, "B", minimum=0)
+        if self.memory is not None:
+            current, peak, top = self.memory
+            section.row("Traced memory peak", size_text(peak))
+            section.row("Traced memory now", size_text(current))
+            result.perf("traced_memory_peak", peak, "B", minimum=0)
+            for stat in top:
+                frame = stat.traceback[0]
+                site = frame.filename.rsplit("/", 1)[-1] + ":" + str(frame.lineno)
+                section.row(site[-40:], size_text(stat.size) + " in " + str(stat.count) + " blocks")
+                result.detail("Memory " + frame.filename + ":" + str(frame.lineno) + ": " +
+                              str(stat.size) + " bytes in " + str(stat.count) + " blocks")
+        if self.cprofile_path:
+            section.row("cProfile stats", self.cprofile_path)
+
+
+class Phase(object):
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.phases.append((self.name, time.time() - self.start))
+
+def size_text(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return str(round(size, 1)) + unit
+        size = size / 1024.0
+    return str(round(size, 1)) + "GiB"
@@ -0,0 +1,177 @@
+# Replication health across paired clusters
+# The source cluster lists its cluster pairs and paired volumes in one batch,
+# then every remote cluster is queried on its own client at the same time as
+# the source's volume stats, so N pairs cost about one extra round trip. The
+# lag of a volume pair is the worst asyncDelay reported by either side.
+import heapq
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sfcheck.client import SFClient, SFApiError, SFConnectionError
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, range_check
+from sfcheck.nodes import split_address
+
+# Replication states of a healthy volume pair, PAUSED_STATES were paused by an operator
+ACTIVE_STATES = ("Active", "Idle")
+PAUSED_STATES = ("PausedManual", "PausedManualRemote")
+
+ISO_DURATION = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?)?$')
+
+#Seconds in an asyncDelay, given as HH:MM:SS.ffffff or an ISO 8601 duration, None when the volume has none
+def parse_delay(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = ISO_DURATION.match(value)
+    if match:
+        days, hours, minutes, seconds = [float(field or 0) for field in match.groups()]
+        return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+    seconds = 0.0
+    for field in value.split(':'):
+        seconds = seconds * 60 + float(field)
+    return seconds
+
+#ok, paused or error for a replication state
+def classify(state):
+    if state in ACTIVE_STATES:
+        return 'ok'
+    if state in PAUSED_STATES:
+        return 'paused'
+    return 'error'
+
+#Worse of two classes, an error on either side outweighs a pause
+def worse(first, second):
+    order = ('ok', 'paused', 'error')
+    return first if order.index(first) >= order.index(second) else second
+
+#Replication state and lag from ListActivePairedVolumes and volume stats, keyed by (volume ID, remote volume ID)
+#so a volume paired with several clusters is matched to the right pair
+def volume_states(volumes, stats):
+    delays = dict((stat['volumeID'], parse_delay(stat.get('asyncDelay'))) for stat in stats)
+    states = {}
+    for volume in volumes:
+        for pair in volume.get('volumePairs') or ():
+            state = (pair.get('remoteReplication') or {}).get('state')
+            states[(volume['volumeID'], pair.get('remoteVolumeID'))] = (state, delays.get(volume['volumeID']))
+    return states
+
+#Volume pairs of one cluster pair from the source's paired volumes
+def pair_volumes(volumes, cluster_pair_id):
+    pairs = []
+    for volume in volumes:
+        for pair in volume.get('volumePairs') or ():
+            if pair.get('clusterPairID') == cluster_pair_id:
+                state = (pair.get('remoteReplication') or {}).get('state')
+                pairs.append({'volume_id': volume['volumeID'], 'name': volume.get('name', ""),
+                              'remote_volume_id': pair.get('remoteVolumeID'), 'state': state})
+    return pairs
+
+#Paired volumes and the stats of the ones in volume_ids, in one round trip
+def collect_side(client, volume_ids):
+    if not volume_ids:
+        return client.call("ListActivePairedVolumes")['volumes'], []
+    volumes, stats = client.batch(["ListActivePairedVolumes",
+                                   ("ListVolumeStatsByVolumeID", {"volumeIDs": volume_ids})])
+    return volumes['volumes'], stats['volumeStats']
+
+#Query the remote end of one cluster pair, a failure is kept in the result instead of stopping the check
+def query_remote(cluster_pair, volume_ids, username, password, port, connect_timeout, read_timeout):
+    start = time.time()
+    result = {'states': {}, 'error': None}
+    host, remote_port = split_address(cluster_pair.get('mvip') or "", port)
+    try:
+        with SFClient(host, remote_port, username, password, "/json-rpc/9.0",
+                      connect_timeout, read_timeout, retries=0) as client:
+            volumes, stats = collect_side(client, volume_ids)
+            result['states'] = volume_states(volumes, stats)
+    except SFConnectionError:
+        result['error'] = "unreachable"
+    except (SFApiError, KeyError, TypeError) as e:
+        result['error'] = str(e) or e.__class__.__name__
+    result['elapsed'] = time.time() - start
+    return result
+
+#Stats of the source's paired volumes, on the source client next to the remote queries
+def query_source(client, volume_ids):
+    if not volume_ids:
+        return []
+    return client.call("ListVolumeStatsByVolumeID", {"volumeIDs": volume_ids})['volumeStats']
+
+#Per cluster pair volume counts, paused and errored volumes and the worst lag, and the worst lagging volume pairs.
+#Remote clusters are reached at the MVIP of their pair with the source's credentials.
+def check_replication(client, username, password, port=443, connect_timeout=5, read_timeout=30, workers=16,
+                      lag_warn=600, lag_crit=1800, top=10):
+    cluster_pairs, paired = client.batch(["ListClusterPairs", "ListActivePairedVolumes"])
+    cluster_pairs = sorted(cluster_pairs['clusterPairs'], key=lambda pair: pair['clusterPairID'])
+    volumes = paired['volumes']
+    by_pair = [(cluster_pair, pair_volumes(volumes, cluster_pair['clusterPairID'])) for cluster_pair in cluster_pairs]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(by_pair)) + 1) as executor:
+        source = executor.submit(query_source, client, sorted(set(volume['volumeID'] for volume in volumes)))
+        remotes = [executor.submit(query_remote, cluster_pair,
+                                   sorted(set(volume['remote_volume_id'] for volume in volume_pairs)),
+                                   username, password, port, connect_timeout, read_timeout)
+                   for cluster_pair, volume_pairs in by_pair]
+        delays = dict((stat['volumeID'], parse_delay(stat.get('asyncDelay'))) for stat in source.result())
+        remotes = [remote.result() for remote in remotes]
+
+    exit_status = STATE_OK
+    pairs = []
+    lagging = []
+    for (cluster_pair, volume_pairs), remote in zip(by_pair, remotes):
+        pair_status = STATE_OK
+        if cluster_pair.get('status') != "Connected" or remote['error']:
+            pair_status = STATE_CRITICAL
+        counts = {'ok': 0, 'paused': 0, 'error': 0}
+        worst_lag = None
+        for volume in volume_pairs:
+            remote_state, remote_delay = remote['states'].get((volume['remote_volume_id'], volume['volume_id']),
+                                                             (None, None))
+            state_class = classify(volume['state'])
+            if remote_state is not None:
+                state_class = worse(state_class, classify(remote_state))
+            counts[state_class] += 1
+            known = [delay for delay in (delays.get(volume['volume_id']), remote_delay) if delay is not None]
+            if known:
+                lag = max(known)
+                worst_lag = lag if worst_lag is None else max(worst_lag, lag)
+                lagging.append((lag, cluster_pair.get('clusterName', ""), volume))
+        if counts['error']:
+            pair_status = STATE_CRITICAL
+        elif counts['paused']:
+            pair_status = max(pair_status, STATE_WARNING)
+        if worst_lag is not None:
+            pair_status = max(pair_status, range_check(lag_crit, lag_warn, worst_lag))
+        exit_status = max(exit_status, pair_status)
+        pairs.append({'cluster_pair': cluster_pair, 'volumes': len(volume_pairs), 'paused': counts['paused'],
+                      'errors': counts['error'], 'worst_lag': worst_lag, 'remote_error': remote['error'],
+                      'elapsed': remote['elapsed'], 'exit_status': pair_status})
+    return exit_status, {
+        'pairs': pairs,
+        'volumes': sum(pair['volumes'] for pair in pairs),
+        'paused': sum(pair['paused'] for pair in pairs),
+        'errors': sum(pair['errors'] for pair in pairs),
+        'worst_lag': max([pair['worst_lag'] for pair in pairs if pair['worst_lag'] is not None] or [None]),
+        'top_lag': heapq.nlargest(top, lagging, key=lambda item: item[0]),
+    }
+
+#Lag as H:MM:SS, n/a when no side reported one
+def format_lag(seconds):
+    if seconds is None:
+        return "n/a"
+    seconds = int(seconds)
+    return "%d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+#Short text for one cluster pair, sized to fit the table's value column
+def describe_pair(pair):
+    if pair['remote_error']:
+        return pair['cluster_pair'].get('status', "n/a") + " " + pair['remote_error'][:24]
+    text = (pair['cluster_pair'].get('status', "n/a") + " " + str(pair['volumes']) + " vols lag " +
+            format_lag(pair['worst_lag']))
+    if pair['paused']:
+        text += " " + str(pair['paused']) + " paused"
+    if pair['errors']:
+        text += " " + str(pair['errors']) + " err"
+    return text
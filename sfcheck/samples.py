@@ -0,0 +1,141 @@
+# Previous GetClusterStats sample store for rate based IO metrics
+# Each cluster gets its own small fixed size binary file, replaced atomically
+# on every run, so concurrent checks of different clusters never share a file
+# and a reader never sees a half written sample.
+import os
+import re
+import struct
+import tempfile
+from array import array
+
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+
+# Sample time followed by the cumulative counters from GetClusterStats
+COUNTERS = ('read_bytes', 'write_bytes', 'read_ops', 'write_ops')
+SAMPLE = struct.Struct("<d4Q")
+
+# Columnar samples: magic, sample time, row count, then one 8 byte array per column
+COLUMN_HEADER = struct.Struct("<4sdI")
+
+
+#File name safe form of an MVIP or host name
+def safe_name(key):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', key)
+
+
+class SampleStore(object):
+
+    def __init__(self, directory="/tmp", prefix="cluster-", suffix=".stats"):
+        self.directory = directory
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def path(self, key):
+        return os.path.join(self.directory, self.prefix + safe_name(key) + self.suffix)
+
+    #Previous sample for key, None when there is none or it can't be read
+    def load(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read(SAMPLE.size)
+        except (IOError, OSError):
+            return None
+        if len(data) != SAMPLE.size:
+            return None
+        values = SAMPLE.unpack(data)
+        sample = dict(zip(COUNTERS, values[1:]))
+        sample['sample_time'] = values[0]
+        return sample
+
+    #Write to a temporary file in the same directory then rename it over the old sample
+    def save(self, key, sample):
+        data = SAMPLE.pack(sample['sample_time'], *[int(sample[name]) for name in COUNTERS])
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".sample-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    #Store the new sample and return the one it replaced
+    def swap(self, key, sample):
+        previous = self.load(key)
+        self.save(key, sample)
+        return previous
+
+
+#Columnar sample as (sample time, {name: array}), None when it is missing or not in this layout.
+#layout is the (name, typecode) of every column in file order, typecodes are 8 byte ones like 'Q' and 'd'
+def load_columns(path, magic, layout):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except (IOError, OSError):
+        return None
+    if len(data) < COLUMN_HEADER.size:
+        return None
+    file_magic, sample_time, count = COLUMN_HEADER.unpack_from(data, 0)
+    if file_magic != magic:
+        return None
+    columns = {}
+    offset = COLUMN_HEADER.size
+    for name, typecode in layout:
+        column = array(typecode)
+        column.frombytes(data[offset:offset + 8 * count])
+        if len(column) != count:
+            return None
+        columns[name] = column
+        offset += 8 * count
+    return sample_time, columns
+
+#Write the columns to a temporary file and rename it over the previous sample
+def save_columns(path, magic, sample_time, layout, columns):
+    count = len(columns[layout[0][0]])
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".columns-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(COLUMN_HEADER.pack(magic, sample_time, count))
+            for name, typecode in layout:
+                f.write(columns[name].tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+#Per second rates between two samples, None when there is no usable interval.
+#A counter going backwards means the cluster reset it, so there is no rate either.
+def compute_rates(previous, current):
+    if previous is None:
+        return None
+    elapsed = current['sample_time'] - previous['sample_time']
+    if elapsed <= 0:
+        return None
+    deltas = {}
+    for name in COUNTERS:
+        deltas[name] = current[name] - previous[name]
+        if deltas[name] < 0:
+            return None
+    delta_ops = deltas['read_ops'] + deltas['write_ops']
+    delta_bytes = deltas['read_bytes'] + deltas['write_bytes']
+    return {
+        'interval': elapsed,
+        'read_bytes_sec': deltas['read_bytes'] / elapsed,
+        'write_bytes_sec': deltas['write_bytes'] / elapsed,
+        'read_iops': deltas['read_ops'] / elapsed,
+        'write_iops': deltas['write_ops'] / elapsed,
+        'total_iops': delta_ops / elapsed,
+        'avg_io_size': (delta_bytes / delta_ops) if delta_ops else 0.0,
+        'active': delta_ops > 0 or delta_bytes > 0,
+    }
+
+#Disk activity state, replaces comparing the counters as strings against the last run
+def disk_activity(current, rates):
+    if current['read_bytes'] == 0 and current['write_bytes'] == 0:
+        return "No", STATE_CRITICAL
+    if rates is None:
+        return "n/a", STATE_UNKNOWN
+    if not rates['active']:
+        return "No", STATE_WARNING
+    return "Yes", STATE_OK
@@ -0,0 +1,123 @@
+# Adaptive poll cadence for the resident daemon
+# Every cluster is polled on its own clock. A poll that ends WARNING or
+# CRITICAL brings the next one forward so a fault is followed closely, slow API
+# calls push polls and the refresh of expensive collectors further apart, and
+# jitter keeps clusters and collectors from lining up on the same second.
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sfcheck.nagios import STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+
+# Weight of the latest poll in the smoothed API call latency
+SMOOTHING = 0.3
+
+
+class Cadence(object):
+
+    def __init__(self, interval=60, alert_interval=None, jitter=0.1, latency_limit=2.0, max_backoff=8):
+        self.interval = interval
+        self.alert_interval = alert_interval if alert_interval is not None else interval / 4.0
+        self.jitter = jitter
+        self.latency_limit = latency_limit
+        self.max_backoff = max_backoff
+        # Factor the interval and the collector TTLs are stretched by, 1 while the MVIP keeps up
+        self.backoff = 1.0
+        self.latency = None
+        self.delay = interval
+
+    #seconds moved by a random fraction of up to jitter either way
+    def jittered(self, seconds):
+        if not self.jitter:
+            return seconds
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    #Take the result of a poll and its mean API call latency, returns the seconds until the next poll.
+    #A failed poll or a smoothed latency over the limit doubles the backoff, one under half the limit halves it
+    def observe(self, exit_status, latency=None):
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency = SMOOTHING * latency + (1 - SMOOTHING) * self.latency
+        if exit_status == STATE_UNKNOWN or (self.latency is not None and self.latency > self.latency_limit):
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+        elif self.latency is None or self.latency < self.latency_limit / 2.0:
+            self.backoff = max(self.backoff / 2, 1.0)
+        interval = self.interval
+        if exit_status in (STATE_WARNING, STATE_CRITICAL):
+            interval = min(self.alert_interval, self.interval)
+        self.delay = self.jittered(interval * self.backoff)
+        return self.delay
+
+
+#Mean wall time of the API calls made through an ElementFactory connection
+class LatencyMeter(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0.0
+        self.calls = 0
+
+    def instrument(self, sfe):
+        send_request = sfe.send_request
+
+        def timed_send_request(method_name, *args, **kwargs):
+            start = time.time()
+            try:
+                return send_request(method_name, *args, **kwargs)
+            finally:
+                with self.lock:
+                    self.total += time.time() - start
+                    self.calls += 1
+        sfe.send_request = timed_send_request
+        return sfe
+
+    #Mean latency of the calls since the last take, None when there were none
+    def take(self):
+        with self.lock:
+            total, calls = self.total, self.calls
+            self.total, self.calls = 0.0, 0
+        if not calls:
+            return None
+        return total / calls
+
+
+#Run jobs when they fall due on a bounded thread pool. A job returns the seconds
+#from its start until it should run again.
+class Scheduler(object):
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.queue = []
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def add(self, job, delay=0):
+        with self.lock:
+            heapq.heappush(self.queue, (time.time() + delay, next(self.sequence), job))
+        self.wake.set()
+
+    def execute(self, job):
+        start = time.time()
+        delay = job()
+        self.add(job, max(0, delay - (time.time() - start)))
+
+    #Hand out due jobs until interrupted
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                self.wake.clear()
+                job = None
+                with self.lock:
+                    due = self.queue[0][0] if self.queue else None
+                    if due is not None and due <= time.time():
+                        job = heapq.heappop(self.queue)[2]
+                if job is not None:
+                    executor.submit(self.execute, job)
+                    continue
+                self.wake.wait(None if due is None else max(0, due - time.time()))
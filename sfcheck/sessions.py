@@ -0,0 +1,91 @@
+# iSCSI session distribution from one ListISCSISessions call
+# Sessions are counted per node, per volume and per initiator and volume pair
+# in a single pass. The pair counts are the paths an initiator has to a volume:
+# too few leave the volume without multipath redundancy, too many point at a
+# misconfigured initiator. Per initiator totals are folded from the pairs.
+import heapq
+
+from sfcheck.counting import raw_call, increment
+from sfcheck.nagios import STATE_OK, STATE_WARNING, range_check
+from sfcheck.nodestats import imbalance
+
+# Soft limit of iSCSI sessions per node, 250 volumes * 4 active sessions
+NODE_SESSION_LIMIT = 1000
+
+#Session counts per node, per volume and per (initiator, volume) pair.
+#Nodes in node_ids start at zero, so a node without sessions shows in the balance.
+def count_distribution(sessions, node_ids=()):
+    by_node = dict((node_id, 0) for node_id in node_ids)
+    by_volume = {}
+    paths = {}
+    for session in sessions:
+        volume_id = session.get('volumeID')
+        increment(by_node, session.get('nodeID'))
+        increment(by_volume, volume_id)
+        increment(paths, (session.get('initiatorName'), volume_id))
+    return by_node, by_volume, paths
+
+#Per initiator sessions, volumes, fewest and most paths to a volume, and the volumes outside min_paths..max_paths
+def initiator_paths(paths, min_paths, max_paths):
+    initiators = {}
+    for (initiator, volume_id), count in paths.items():
+        entry = initiators.get(initiator)
+        if entry is None:
+            entry = initiators[initiator] = {'sessions': 0, 'volumes': 0, 'min_paths': count, 'max_paths': count,
+                                             'missing': 0, 'excess': 0}
+        entry['sessions'] += count
+        entry['volumes'] += 1
+        entry['min_paths'] = min(entry['min_paths'], count)
+        entry['max_paths'] = max(entry['max_paths'], count)
+        if count < min_paths:
+            entry['missing'] += 1
+        elif count > max_paths:
+            entry['excess'] += 1
+    return initiators
+
+#Count the sessions and evaluate the per node limit and the path counts
+def check_sessions(sfe, node_limit=NODE_SESSION_LIMIT, min_paths=2, max_paths=8, top=10):
+    node_ids = [node['nodeID'] for node in raw_call(sfe, "ListActiveNodes")['nodes']]
+    by_node, by_volume, paths = count_distribution(raw_call(sfe, "ListISCSISessions")['sessions'], node_ids)
+    initiators = initiator_paths(paths, min_paths, max_paths)
+
+    exit_status = STATE_OK
+    near_limit = []
+    nodes = sorted(by_node.items(), key=lambda item: (item[0] is None, item[0]))
+    for node_id, count in nodes:
+        node_status = range_check(node_limit, node_limit * .90, count)
+        if node_status != STATE_OK:
+            near_limit.append(node_id)
+            exit_status = max(exit_status, node_status)
+    missing = sum(entry['missing'] for entry in initiators.values())
+    excess = sum(entry['excess'] for entry in initiators.values())
+    if missing or excess:
+        exit_status = max(exit_status, STATE_WARNING)
+
+    node_imbalance, busiest = imbalance([float(count) for node_id, count in nodes])
+    problems = [item for item in initiators.items() if item[1]['missing'] or item[1]['excess']]
+    return exit_status, {
+        'sessions': sum(by_node.values()),
+        'nodes': nodes,
+        'near_limit': near_limit,
+        'imbalance': node_imbalance,
+        'busiest': None if busiest is None else nodes[busiest][0],
+        'initiators': len(initiators),
+        'volumes': len(by_volume),
+        'missing': missing,
+        'excess': excess,
+        'problem_initiators': len(problems),
+        'top_initiators': heapq.nlargest(top, initiators.items(), key=lambda item: item[1]['sessions']),
+        'top_problems': heapq.nlargest(top, problems, key=lambda item: item[1]['missing'] + item[1]['excess']),
+        'top_volumes': heapq.nlargest(top, by_volume.items(), key=lambda item: item[1]),
+    }
+
+#Short text for one initiator, sized to fit the table's value column
+def describe_initiator(entry):
+    text = (str(entry['sessions']) + " sess " + str(entry['volumes']) + " vols paths " +
+            str(entry['min_paths']) + "-" + str(entry['max_paths']))
+    if entry['missing']:
+        text += " " + str(entry['missing']) + " low"
+    if entry['excess']:
+        text += " " + str(entry['excess']) + " high"
+    return text
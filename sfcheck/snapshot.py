@@ -0,0 +1,162 @@
+# Record and replay of raw JSON-RPC responses
+# A recorded run keeps every request with the response text exactly as the
+# cluster sent it, in one gzip compressed JSON snapshot per run. A replay
+# answers the same requests from the snapshot without touching the network, so
+# thresholds can be re-evaluated over many snapshots and the parse, evaluate
+# and render stages timed without the API latency.
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+
+from sfcheck.client import SFApiError, SFClient
+from sfcheck.counting import decode_once
+from sfcheck.samples import safe_name
+
+SNAPSHOT_VERSION = 1
+
+#Requests are matched on method and params, ids differ from run to run
+def request_key(request):
+    if isinstance(request, list):
+        return json.dumps([[entry.get('method'), entry.get('params') or {}] for entry in request], sort_keys=True)
+    return json.dumps([request.get('method'), request.get('params') or {}], sort_keys=True)
+
+def request_methods(request):
+    if isinstance(request, list):
+        return ",".join(str(entry.get('method')) for entry in request)
+    return str(request.get('method'))
+
+
+class Recorder(object):
+
+    def __init__(self, path, script, target, meta=None):
+        self.path = path
+        self.script = script
+        self.target = target
+        self.meta = dict(meta or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    #request is the decoded JSON-RPC payload, response the raw body as received
+    def record(self, request, response):
+        if isinstance(response, bytes):
+            response = response.decode('utf-8')
+        with self.lock:
+            self.calls.append({'request': request, 'response': response})
+
+    #Keep every response an ElementFactory connection receives
+    def instrument(self, sfe):
+        dispatcher = sfe._dispatcher
+        post = dispatcher.post
+
+        def recorded_post(data):
+            response = post(data)
+            self.record(json.loads(data), response)
+            return response
+        dispatcher.post = recorded_post
+        self.meta['api_version'] = sfe._api_version
+        return sfe
+
+    #Write the snapshot, a directory gets one file per run named after the target and time
+    def save(self):
+        path = self.path
+        if os.path.isdir(path):
+            path = os.path.join(path, safe_name(self.target) + "-" + time.strftime("%Y%m%dT%H%M%S") + ".json.gz")
+        data = json.dumps({'version': SNAPSHOT_VERSION, 'script': self.script, 'target': self.target,
+                           'recorded': time.time(), 'meta': self.meta, 'calls': self.calls})
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with gzip.GzipFile(fileobj=f, mode='wb') as compressed:
+                    compressed.write(data.encode('utf-8'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+
+class Snapshot(object):
+
+    def __init__(self, path):
+        with gzip.open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError("not a version " + str(SNAPSHOT_VERSION) + " snapshot")
+        self.script = data['script']
+        self.target = data['target']
+        self.recorded = data['recorded']
+        self.meta = data.get('meta') or {}
+        self.responses = {}
+        for call in data['calls']:
+            self.responses.setdefault(request_key(call['request']), []).append(call)
+        self.used = {}
+        self.lock = threading.Lock()
+
+    #Recorded responses for a request in the order they were received, the last one repeats
+    def answer(self, request):
+        key = request_key(request)
+        calls = self.responses.get(key)
+        if not calls:
+            raise SFApiError("No recorded response for " + request_methods(request))
+        with self.lock:
+            index = self.used.get(key, 0)
+            self.used[key] = index + 1
+        call = calls[min(index, len(calls) - 1)]
+        response = call['response']
+        # Batch results are matched up by id, give them the ids of this run's requests
+        if isinstance(request, list) and not isinstance(response, dict):
+            ids = dict((old.get('id'), new.get('id')) for old, new in zip(call['request'], request))
+            if any(old != new for old, new in ids.items()):
+                decoded = json.loads(response)
+                if isinstance(decoded, list):
+                    for entry in decoded:
+                        if isinstance(entry, dict) and entry.get('id') in ids:
+                            entry['id'] = ids[entry['id']]
+                response = json.dumps(decoded)
+        return response
+
+
+#Dispatcher for an ElementFactory connection that answers from a snapshot
+class ReplayDispatcher(object):
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def post(self, data):
+        return self.snapshot.answer(json.loads(data))
+
+    def timeout(self, timeout_in_sec):
+        pass
+
+    def connect_timeout(self, timeout_in_sec):
+        pass
+
+    def restore_timeout_defaults(self):
+        pass
+
+#ElementFactory connection to a recorded cluster, at the API version it was recorded with
+def replay_element(snapshot):
+    from solidfire import Element
+    return decode_once(Element(snapshot.target, "replay", "replay", snapshot.meta.get('api_version', 8.0), False,
+                               dispatcher=ReplayDispatcher(snapshot)))
+
+
+#SFClient that answers from a snapshot instead of the network
+class ReplayClient(SFClient):
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.host = snapshot.target
+        self.url = "replay://" + snapshot.target
+        self.next_id = 0
+        self.profile = None
+        self.recorder = None
+
+    def send(self, payload):
+        return self.snapshot.answer(payload).encode('utf-8')
+
+    def close(self):
+        pass
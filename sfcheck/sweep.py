@@ -0,0 +1,95 @@
+# Fleet sweep sharded across worker processes
+# With hundreds of clusters one interpreter spends its time on TLS and JSON
+# decoding under the GIL. The inventory is dealt out to worker processes that
+# each poll their share on a thread pool and write every cluster's result into
+# a fixed row of shared memory, so the parent only reads the rows back and
+# nothing is pickled on the way.
+import ctypes
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from sfcheck.fleet import poll_cluster
+from sfcheck.nagios import STATE_OK, STATE_UNKNOWN
+
+# Numeric fields of a row, the text slot holds the cluster name or, with the error flag set, the error
+FIELDS = ('exit_status', 'elapsed', 'cluster_util', 'num_sessions', 'error')
+TEXT_WIDTH = 128
+# exit_status of a row no worker has written
+UNWRITTEN = -1.0
+
+
+#Per cluster rows in shared memory, one array of doubles and one of fixed width text
+class ResultRows(object):
+
+    def __init__(self, count):
+        self.count = count
+        self.values = multiprocessing.RawArray(ctypes.c_double, [UNWRITTEN] * (count * len(FIELDS)))
+        self.text = multiprocessing.RawArray(ctypes.c_char, count * TEXT_WIDTH)
+
+    #Store a poll_cluster result, each row is written by one thread only
+    def write(self, row, result):
+        cluster = result['cluster']
+        error = result['error']
+        text = (error if error else str(cluster.get('cluster_name', ''))).encode('utf-8')[:TEXT_WIDTH]
+        start = row * TEXT_WIDTH
+        self.text[start:start + TEXT_WIDTH] = text.ljust(TEXT_WIDTH, b'\0')
+        values = (result['elapsed'], float(cluster.get('cluster_util', 0) or 0),
+                  float(cluster.get('num_sessions', 0) or 0), 1.0 if error else 0.0)
+        start = row * len(FIELDS)
+        self.values[start + 1:start + len(FIELDS)] = values
+        # The exit state goes in last, it marks the row as written
+        self.values[start] = result['exit_status']
+
+    #A row as the poll_cluster result it was written from, None when it was never written
+    def read(self, row, mvip):
+        start = row * len(FIELDS)
+        exit_status, elapsed, cluster_util, num_sessions, error = self.values[start:start + len(FIELDS)]
+        if exit_status == UNWRITTEN:
+            return None
+        text = self.text[row * TEXT_WIDTH:(row + 1) * TEXT_WIDTH].rstrip(b'\0').decode('utf-8', 'ignore')
+        result = {'mvip': mvip, 'exit_status': int(exit_status), 'elapsed': elapsed, 'cluster': {}, 'error': None}
+        if error:
+            result['error'] = text
+        else:
+            result['cluster'] = {'cluster_name': text, 'cluster_util': cluster_util,
+                                 'num_sessions': int(num_sessions)}
+        return result
+
+#Worker process, poll the inventory rows in shard with `workers` clusters in flight
+def sweep_shard(rows, inventory, shard, workers):
+    from sfcheck.element import check_cluster
+
+    def poll(row):
+        rows.write(row, poll_cluster(inventory[row], check_cluster))
+    with ThreadPoolExecutor(max_workers=min(workers, len(shard))) as executor:
+        list(executor.map(poll, shard))
+
+#Check every inventory entry from `processes` worker processes with `workers` threads each.
+#Returns the per cluster results in inventory order and the worst exit state, like fleet.poll_fleet
+def sweep_fleet(inventory, processes, workers=8):
+    if not inventory:
+        return [], STATE_OK
+    # Not used here, the import loads the SDK before the fork so every worker starts with it
+    import solidfire.factory
+    rows = ResultRows(len(inventory))
+    # Every process takes every Nth cluster, so a slow stretch of the inventory is spread out
+    shards = [list(range(start, len(inventory), processes)) for start in range(min(processes, len(inventory)))]
+    procs = [multiprocessing.Process(target=sweep_shard, args=(rows, inventory, shard, workers)) for shard in shards]
+    for proc in procs:
+        proc.daemon = True
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+    exitcodes = {}
+    for proc, shard in zip(procs, shards):
+        for row in shard:
+            exitcodes[row] = proc.exitcode
+    results = []
+    for row, entry in enumerate(inventory):
+        result = rows.read(row, entry['mvip'])
+        if result is None:
+            result = {'mvip': entry['mvip'], 'exit_status': STATE_UNKNOWN, 'elapsed': 0.0, 'cluster': {},
+                      'error': "not polled, worker process exited with " + str(exitcodes[row])}
+        results.append(result)
+    return results, max(result['exit_status'] for result in results)
@@ -0,0 +1,38 @@
+# Shared fixtures: the repository on sys.path and a stand-in cluster to run the checks against
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "bench"))
+
+
+#One synthetic 4 node cluster served over TLS on a free port for the whole session.
+#It is paired with itself, so the replication check has a remote to reach.
+@pytest.fixture(scope="session")
+def mock_cluster():
+    pytest.importorskip("requests")
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is needed for the mock server's certificate")
+    from mock_server import SyntheticCluster, MockServer
+    cluster = SyntheticCluster(nodes=4, volumes=200, sessions=400, failed_drives=1,
+                               pairs=["127.0.0.1"], paired_volumes=50)
+    server = MockServer(("127.0.0.1", 0), cluster)
+    port = server.server_address[1]
+    cluster.cluster_pairs[0]["mvip"] = "127.0.0.1:" + str(port)
+    server.start()
+    yield port
+    server.close()
+
+
+#Run a check's main() with JSON output, returns its exit state and the decoded output
+@pytest.fixture
+def run_json(capsys):
+    def run(main, argv):
+        exit_status = main(argv + ['--output', 'json'])
+        return exit_status, json.loads(capsys.readouterr().out)
+    return run
@@ -0,0 +1,85 @@
+import json
+
+from sfcheck import cache
+from sfcheck.cache import FingerprintCache, fault_fingerprint
+
+TTLS = {'info': 100, 'sessions': 10, 'stats': 0}
+
+
+#Collector that counts its calls and returns the call number
+class Collector(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, sfe):
+        self.calls += 1
+        return {'call': self.calls}
+
+
+def test_hits_and_misses(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    store = FingerprintCache(str(tmp_path), "mvip.example", TTLS).load()
+    fetch = store.fetcher(None)
+    info, stats = Collector(), Collector()
+    assert fetch('info', info) == {'call': 1}
+    assert fetch('info', info) == {'call': 1}
+    # A TTL of 0 is never kept
+    assert fetch('stats', stats) == {'call': 1}
+    assert fetch('stats', stats) == {'call': 2}
+    assert (store.hits, store.misses) == (1, 3)
+    now[0] += 100
+    assert fetch('info', info) == {'call': 2}
+
+
+def test_entries_survive_between_runs(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache.time, "time", lambda: 1000.0)
+    store = FingerprintCache(str(tmp_path), "mvip.example", TTLS).load()
+    store.verify("0-none")
+    drives = {1: {'num_data_drives': 9}, 2: {'num_data_drives': 10}}
+    store.fetcher(None)('info', lambda sfe: drives)
+    store.save()
+    store = FingerprintCache(str(tmp_path), "mvip.example", TTLS).load()
+    store.verify("0-none")
+    assert not store.dirty
+    assert store.fetcher(None)('info', Collector()) == drives
+    assert store.hits == 1
+
+
+def test_a_new_fault_drops_the_fingerprinted_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache.time, "time", lambda: 1000.0)
+    store = FingerprintCache(str(tmp_path), "mvip.example", TTLS).load()
+    store.verify("0-none")
+    fetch = store.fetcher(None)
+    fetch('info', Collector())
+    fetch('sessions', Collector())
+    store.verify("1-abc")
+    assert sorted(store.entries) == ['sessions']
+    assert store.fingerprint == "1-abc"
+
+
+def test_unreadable_cache_is_empty(tmp_path):
+    store = FingerprintCache(str(tmp_path), "mvip.example", TTLS)
+    with open(store.path, 'w') as f:
+        f.write("{\"fingerprint\": ")
+    assert store.load().entries == {}
+    assert store.fingerprint is None
+
+
+#Answers ListClusterFaults with the faults it was given
+class FakeElement(object):
+
+    def __init__(self, faults):
+        self.faults = faults
+
+    def send_request(self, method, result_type, params=None, return_response_raw=False):
+        return json.dumps({'id': 1, 'result': {'faults': self.faults}}).encode('utf-8')
+
+
+def test_fingerprint_ignores_fault_order():
+    faults = [{'clusterFaultID': 1, 'code': "driveFailed"}, {'clusterFaultID': 7, 'code': "nodeOffline"}]
+    fingerprint = fault_fingerprint(FakeElement(faults))
+    assert fingerprint.startswith("2-")
+    assert fault_fingerprint(FakeElement(list(reversed(faults)))) == fingerprint
+    assert fault_fingerprint(FakeElement(faults[:1])) != fingerprint
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from sfcheck import capacity
+from sfcheck.capacity import capacity_columns, capacity_states, capacity_rollup
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL
+
+TIB = 2.0 ** 40
+
+
+def counters(used, usable, nodes=4, metadata=10.0, non_zero=3000.0, zero=1000.0, unique=1000.0,
+             unique_used=None, snapshot=0.0):
+    if unique_used is None:
+        unique_used = unique * 4096 / 2 / capacity.COMPRESSION_OVERHEAD
+    return {'usedSpace': used, 'maxUsedSpace': usable, 'usedMetadataSpace': metadata,
+            'maxUsedMetadataSpace': 100.0, 'provisionedSpace': 0.0, 'maxProvisionedSpace': 0.0,
+            'nonZeroBlocks': non_zero, 'zeroBlocks': zero, 'uniqueBlocks': unique,
+            'uniqueBlocksUsedSpace': unique_used, 'snapshotNonZeroBlocks': snapshot, 'activeNodes': float(nodes)}
+
+
+#Every test runs with NumPy when it is installed and with the plain Python columns
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(capacity, "numpy", None)
+    return request.param
+
+
+def test_columns(backend):
+    columns = capacity_columns([counters(50 * TIB, 100 * TIB), counters(0.0, 0.0, nodes=0, non_zero=0.0)])
+    assert columns['block_fullness'][0] == pytest.approx(50.0)
+    assert columns['metadata_fullness'][0] == pytest.approx(10.0)
+    assert columns['thin_provisioning'][0] == pytest.approx(4000.0 / 3000.0)
+    assert columns['deduplication'][0] == pytest.approx(3.0)
+    assert columns['compression'][0] == pytest.approx(2.0)
+    assert columns['efficiency'][0] == pytest.approx(4000.0 / 3000.0 * 3.0 * 2.0)
+    assert columns['node_loss_free'][0] == pytest.approx(100 * TIB * 3 / 4 - 50 * TIB)
+    # Ratios over zero counters are undefined rather than an error
+    for name in ('block_fullness', 'thin_provisioning', 'node_loss_free'):
+        assert math.isnan(columns[name][1])
+
+
+def test_states(backend):
+    columns = capacity_columns([counters(50 * TIB, 100 * TIB), counters(85 * TIB, 100 * TIB, nodes=20),
+                                counters(78 * TIB, 100 * TIB, nodes=4)])
+    # The third cluster is under the fullness limits but can't absorb losing a node
+    assert capacity_states(columns, 80, 90) == [STATE_OK, STATE_WARNING, STATE_CRITICAL]
+
+
+def test_rollup(backend):
+    columns = capacity_columns([counters(50 * TIB, 100 * TIB), counters(85 * TIB, 100 * TIB, nodes=20),
+                                counters(0.0, 0.0, nodes=0, non_zero=0.0)])
+    states = capacity_states(columns, 80, 90)
+    rollup = capacity_rollup(columns, states, 80, 90)
+    assert rollup['clusters'] == 3
+    assert rollup['used_space'] == pytest.approx(135 * TIB)
+    assert rollup['max_used_space'] == pytest.approx(200 * TIB)
+    assert rollup['fullness'] == pytest.approx(67.5)
+    assert rollup['worst_fullness'] == pytest.approx(85.0)
+    assert rollup['over_warn'] == 1
+    assert rollup['over_crit'] == 0
+    assert rollup['min_node_loss_free'] == pytest.approx(100 * TIB * 19 / 20 - 85 * TIB)
+    assert rollup['not_ok'] == 1
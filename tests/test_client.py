@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+
+from sfcheck.client import SFApiError, SFClient, make_retry
+
+
+#SFClient that answers from a function of the payload instead of the network
+class CannedClient(SFClient):
+
+    def __init__(self, answer):
+        SFClient.__init__(self, "mvip.example")
+        self.answer = answer
+        self.payloads = []
+
+    def send(self, payload):
+        self.payloads.append(payload)
+        return json.dumps(self.answer(payload)).encode('utf-8')
+
+
+def echo(request):
+    return {'id': request['id'], 'result': {'method': request['method'], 'params': request['params']}}
+
+
+def test_batch_results_are_matched_by_id():
+    client = CannedClient(lambda batch: [echo(request) for request in reversed(batch)])
+    results = client.batch(["GetClusterStats", ("ListEvents", {'startEventID': 5})])
+    assert results == [{'method': "GetClusterStats", 'params': {}},
+                       {'method': "ListEvents", 'params': {'startEventID': 5}}]
+    assert len(client.payloads) == 1
+
+
+def test_batch_falls_back_to_one_call_per_method():
+    def answer(payload):
+        if isinstance(payload, list):
+            return {'id': None, 'error': {'name': "xInvalidRequest", 'message': "batch not supported"}}
+        return echo(payload)
+    client = CannedClient(answer)
+    results = client.batch(["GetClusterStats", "GetClusterInfo", "GetClusterCapacity"])
+    assert [result['method'] for result in results] == ["GetClusterStats", "GetClusterInfo", "GetClusterCapacity"]
+    assert isinstance(client.payloads[0], list)
+    assert sorted(payload['method'] for payload in client.payloads[1:]) == [
+        "GetClusterCapacity", "GetClusterInfo", "GetClusterStats"]
+
+
+def test_batch_raises_the_error_of_a_failed_method():
+    def answer(batch):
+        return [echo(request) if request['method'] != "GetClusterInfo" else
+                {'id': request['id'], 'error': {'message': "xUnknownAPIMethod"}} for request in batch]
+    client = CannedClient(answer)
+    with pytest.raises(SFApiError) as error:
+        client.batch(["GetClusterStats", "GetClusterInfo"])
+    assert str(error.value) == "GetClusterInfo failed: xUnknownAPIMethod"
+
+
+def test_invalid_response():
+    client = CannedClient(None)
+    client.send = lambda payload: b"<html>"
+    with pytest.raises(SFApiError):
+        client.call("GetClusterStats")
+
+
+def test_retry_covers_post_and_the_mvip_failover_statuses():
+    retry = make_retry(3, 0.5)
+    assert retry.total == 3
+    assert retry.is_retry("POST", 503)
+    assert retry.is_retry("POST", 502)
+    assert not retry.is_retry("POST", 401)
+
+
+def test_retry_backs_off_exponentially():
+    retry = make_retry(3, 0.5)
+    backoff = []
+    for _ in range(3):
+        retry = retry.increment("POST", "/json-rpc/9.0")
+        backoff.append(retry.get_backoff_time())
+    # urllib3 before 2.0 does not wait before the first retry
+    assert backoff[0] in (0.0, 0.5)
+    assert backoff[1:] == [1.0, 2.0]
+
+
+def test_retries_run_out():
+    from requests.packages.urllib3.exceptions import MaxRetryError
+    retry = make_retry(1, 0)
+    retry = retry.increment("POST", "/json-rpc/9.0")
+    with pytest.raises(MaxRetryError):
+        retry.increment("POST", "/json-rpc/9.0")
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from sfcheck.client import SFApiError
+from sfcheck.counting import raw_call, iter_volume_pages, count_volumes, count_breakdown
+
+
+#Stands in for an ElementFactory connection, answers raw calls from the volume and session lists
+class FakeElement(object):
+
+    def __init__(self, volumes, sessions=()):
+        self.volumes = volumes
+        self.sessions = list(sessions)
+        self.calls = []
+
+    def send_request(self, method, result_type, params=None, return_response_raw=False):
+        self.calls.append((method, params))
+        if method == "ListVolumes":
+            start, limit = params['startVolumeID'], params['limit']
+            result = {'volumes': [vol for vol in self.volumes if vol['volumeID'] >= start][:limit]}
+        elif method == "ListISCSISessions":
+            result = {'sessions': self.sessions}
+        else:
+            return json.dumps({'id': 1, 'error': {'message': "xUnknownAPIMethod"}}).encode('utf-8')
+        return json.dumps({'id': 1, 'result': result}).encode('utf-8')
+
+
+def volumes(*ids, **fields):
+    return [dict(fields, volumeID=volume_id) for volume_id in ids]
+
+
+def test_pages_start_after_the_last_volume_id():
+    sfe = FakeElement(volumes(*range(1, 2501)))
+    pages = list(iter_volume_pages(sfe, page_size=1000))
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    assert [params['startVolumeID'] for method, params in sfe.calls] == [0, 1001, 2001]
+
+
+def test_gaps_in_volume_ids():
+    sfe = FakeElement(volumes(3, 10, 11, 400, 9000))
+    pages = list(iter_volume_pages(sfe, page_size=2))
+    assert [[vol['volumeID'] for vol in page] for page in pages] == [[3, 10], [11, 400], [9000]]
+
+
+def test_a_full_last_page_ends_on_an_empty_one():
+    sfe = FakeElement(volumes(*range(1, 5)))
+    assert count_volumes(sfe, page_size=2) == {'num_vols': 4}
+    assert len(sfe.calls) == 3
+    assert list(iter_volume_pages(FakeElement([]))) == []
+
+
+def test_breakdown():
+    sfe = FakeElement(volumes(1, 2, accountID=7, volumeAccessGroups=[1]) +
+                      volumes(3, accountID=8, volumeAccessGroups=[1, 2]) +
+                      volumes(4, accountID=None, volumeAccessGroups=None),
+                      [{'accountID': 7, 'volumeID': 1}, {'accountID': 8, 'volumeID': 3}, {'volumeID': 4}])
+    breakdown = count_breakdown(sfe, page_size=2)
+    assert breakdown['num_vols'] == 4
+    assert breakdown['num_sessions'] == 3
+    assert breakdown['vols_by_account'] == {7: 2, 8: 1}
+    assert breakdown['vols_by_group'] == {1: 3, 2: 1}
+    assert breakdown['sessions_by_account'] == {7: 1, 8: 1}
+    assert breakdown['sessions_by_group'] == {1: 2, 2: 1}
+
+
+def test_raw_call_errors():
+    with pytest.raises(SFApiError) as error:
+        raw_call(FakeElement([]), "GetClusterInfo")
+    assert str(error.value) == "GetClusterInfo failed: xUnknownAPIMethod"
+    # The dispatcher hands back a dict for an HTTP error without a body
+    sfe = FakeElement([])
+    sfe.send_request = lambda *args, **kwargs: {'code': 502, 'name': "Bad Gateway", 'message': "Bad Gateway"}
+    with pytest.raises(SFApiError) as error:
+        raw_call(sfe, "ListVolumes")
+    assert str(error.value) == "ListVolumes failed: Bad Gateway"
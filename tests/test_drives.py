@@ -0,0 +1,37 @@
+from sfcheck.drives import Drive, index_drives, node_drives, failed_drives
+
+
+def drive(drive_id, node_id, drive_type, status="active", slot=None):
+    return Drive({'driveID': drive_id, 'nodeID': node_id, 'type': drive_type, 'status': status,
+                  'slot': drive_id if slot is None else slot})
+
+
+DRIVES = [
+    drive(1, 1, "volume"), drive(2, 1, "block"), drive(3, 1, "block"),
+    drive(4, 2, "volume", "failed"), drive(5, 2, "block"), drive(6, 2, "block", "removing"),
+    drive(7, 3, "unknown", "failed"),
+]
+
+
+def test_counts_per_node():
+    index = index_drives(DRIVES)
+    assert node_drives(index, 1) == {'num_data_drives': 2, 'num_meta_drives': 1, 'error_data_drives': 0,
+                                     'error_meta_drives': 0, 'failed_drives': []}
+    counts = node_drives(index, 2)
+    assert (counts['num_data_drives'], counts['num_meta_drives']) == (1, 0)
+    assert (counts['error_data_drives'], counts['error_meta_drives']) == (1, 1)
+
+
+def test_drives_of_other_types_are_not_counted():
+    index = index_drives(DRIVES)
+    assert 3 not in index
+    assert node_drives(index, 3) == node_drives(index, 99)
+    assert node_drives(index, 99)['num_data_drives'] == 0
+
+
+def test_failed_drives_in_node_order():
+    failed = failed_drives(index_drives(list(reversed(DRIVES))))
+    assert [(entry['node_id'], entry['drive_id'], entry['status']) for entry in failed] == [
+        (2, 6, "removing"), (2, 4, "failed")]
+    assert failed[0]['type'] == "block"
+    assert failed[1]['slot'] == 4
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from sfcheck.faults import (FaultTracker, list_new_events, load_tracker, save_tracker, evaluate_faults,
+                            summarize_faults)
+from sfcheck.nagios import STATE_CRITICAL
+
+
+#Answers ListEvents from an event log, pages newest first like the cluster or oldest first
+class FakeElement(object):
+
+    def __init__(self, last_event_id, newest_first=True, faults=()):
+        self.event_ids = list(range(1, last_event_id + 1))
+        self.newest_first = newest_first
+        self.faults = list(faults)
+        self.calls = []
+
+    def send_request(self, method, result_type, params=None, return_response_raw=False):
+        if method == "ListClusterFaults":
+            result = {'faults': self.faults}
+        else:
+            self.calls.append(params)
+            start = params.get('startEventID', 1)
+            end = params.get('endEventID', self.event_ids[-1] if self.event_ids else 0)
+            ids = sorted((event_id for event_id in self.event_ids if start <= event_id <= end),
+                         reverse=self.newest_first)
+            result = {'events': [{'eventID': event_id, 'message': "event " + str(event_id)}
+                                 for event_id in ids[:params['maxEvents']]]}
+        return json.dumps({'id': 1, 'result': result}).encode('utf-8')
+
+
+@pytest.mark.parametrize("newest_first", [True, False])
+def test_every_new_event_once_oldest_first(newest_first):
+    sfe = FakeElement(1300, newest_first)
+    events = list_new_events(sfe, 100, page_size=500)
+    assert [event['eventID'] for event in events] == list(range(101, 1301))
+    assert len(sfe.calls) == 3
+
+
+@pytest.mark.parametrize("newest_first", [True, False])
+def test_reading_stops_after_max_pages(newest_first):
+    sfe = FakeElement(1300, newest_first)
+    events = list_new_events(sfe, 100, page_size=100, max_pages=2)
+    assert len(events) == 200
+    assert len(sfe.calls) == 2
+
+
+def test_nothing_new():
+    sfe = FakeElement(100)
+    assert list_new_events(sfe, 100) == []
+    assert sfe.calls == [{'startEventID': 101, 'maxEvents': 500}]
+
+
+def fault(fault_id, severity):
+    return {'clusterFaultID': fault_id, 'severity': severity, 'code': "code" + str(fault_id)}
+
+
+def test_tracker_announces_faults_and_events_once(tmp_path):
+    sfe = FakeElement(50, faults=[fault(1, 'warning')])
+    tracker = FaultTracker()
+    report = tracker.update(sfe)
+    # A cluster without a cursor starts at its newest event
+    assert (report['event_id'], report['events']) == (50, [])
+    assert [entry['clusterFaultID'] for entry in report['new']] == [1]
+
+    path = str(tmp_path / "cluster.events")
+    save_tracker(path, tracker)
+    sfe.event_ids.extend([51, 52])
+    sfe.faults = [fault(2, 'critical')]
+    report = load_tracker(path).update(sfe)
+    assert [event['eventID'] for event in report['events']] == [51, 52]
+    assert report['event_id'] == 52
+    assert [entry['clusterFaultID'] for entry in report['new']] == [2]
+    assert report['resolved'] == [1]
+
+    exit_status, counts = evaluate_faults(report)
+    assert exit_status == STATE_CRITICAL
+    assert summarize_faults(report, counts) == ("Faults: 1 active (1 critical, 0 error, 0 warning, 0 bestPractice) "
+                                                "1 new, 1 resolved, 2 new events")
+
+
+def test_unreadable_state_file(tmp_path):
+    path = tmp_path / "cluster.events"
+    path.write_text("{}")
+    tracker = load_tracker(str(path))
+    assert tracker.event_id is None
+    assert tracker.active == {}
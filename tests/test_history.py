@@ -0,0 +1,74 @@
+import pytest
+
+from sfcheck.history import RingBuffer, evaluate_trend, days_until
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+
+DAY = 86400.0
+MAX_USED = 1000.0
+
+
+#History with one sample a day, fullness growing by growth percentage points a day from start
+def make_history(path, days, start, growth, latency=500.0):
+    history = RingBuffer(str(path), capacity=64)
+    for day in range(days):
+        used = (start + growth * day) / 100.0 * MAX_USED
+        history.append({'sample_time': day * DAY, 'used_space': used, 'max_used_space': MAX_USED,
+                        'latency_usec': latency})
+    return history
+
+
+def test_days_until():
+    assert days_until(90, 80, 2) == 5
+    assert days_until(90, 95, 1) == 0
+    assert days_until(90, 50, 0) is None
+    assert days_until(90, None, 1) is None
+
+
+@pytest.mark.parametrize("growth, exit_status", [(0.5, STATE_OK), (2.0, STATE_WARNING), (4.0, STATE_CRITICAL)])
+def test_days_to_90(tmp_path, growth, exit_status):
+    with make_history(tmp_path / "h", 10, 50.0, growth) as history:
+        status, trend = evaluate_trend(history, 60, days_warn=30, days_crit=7)
+    latest = 50.0 + growth * 9
+    assert status == exit_status
+    assert trend['samples'] == 10
+    assert trend['values']['growth'] == pytest.approx(growth)
+    assert trend['values']['days_to_90'] == pytest.approx((90 - latest) / growth)
+    assert trend['days_to_90'].endswith("*") == (exit_status != STATE_OK)
+
+
+def test_shrinking_cluster_has_no_projection(tmp_path):
+    with make_history(tmp_path / "h", 5, 60.0, -1.0) as history:
+        status, trend = evaluate_trend(history, 60)
+    assert status == STATE_OK
+    assert trend['days_to_90'] == "n/a"
+
+
+def test_window_only_uses_the_last_samples(tmp_path):
+    with make_history(tmp_path / "h", 20, 10.0, 2.0) as history:
+        status, trend = evaluate_trend(history, 5)
+    assert trend['samples'] == 5
+    assert trend['values']['fullness'] == pytest.approx(48.0)
+
+
+def test_latency_p95(tmp_path):
+    with make_history(tmp_path / "h", 3, 50.0, 0.0, latency=20000.0) as history:
+        status, trend = evaluate_trend(history, 60, latency_warn=10000, latency_crit=30000)
+    assert status == STATE_WARNING
+    assert trend['latency'][95] == "20000*"
+
+
+def test_empty_history_is_unknown(tmp_path):
+    with RingBuffer(str(tmp_path / "h"), capacity=8) as history:
+        status, trend = evaluate_trend(history, 60)
+    assert status == STATE_UNKNOWN
+    assert trend['fullness'] == "n/a"
+
+
+def test_create_keeps_a_file_another_check_created_first(tmp_path):
+    path = tmp_path / "cluster.history"
+    make_history(path, 3, 50.0, 1.0).close()
+    # A check that found no file and raced this one still ends up with the records written so far
+    RingBuffer.create(str(path), 64)
+    with RingBuffer(str(path)) as history:
+        assert len(history) == 3
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["cluster.history"]
@@ -0,0 +1,69 @@
+import json
+
+from sfcheck import hotspots
+from sfcheck.hotspots import VOLUME_ID, IOPS, BYTES_SEC, check_hotspots, describe_row, rank
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL
+
+
+def stat(volume_id, ops=0, latency=100, throttle=0.0, bytes_per_op=4096):
+    return {'volumeID': volume_id, 'readOps': ops, 'writeOps': ops, 'readBytes': ops * bytes_per_op,
+            'writeBytes': ops * bytes_per_op, 'latencyUSec': latency, 'throttle': throttle}
+
+
+#Answers ListVolumeStatsByVolume with the stats it was given
+class FakeElement(object):
+
+    def __init__(self, volume_stats):
+        self.volume_stats = volume_stats
+
+    def send_request(self, method, result_type, params=None, return_response_raw=False):
+        return json.dumps({'id': 1, 'result': {'volumeStats': self.volume_stats}}).encode('utf-8')
+
+
+def run(monkeypatch, tmp_path, volume_stats, now, **thresholds):
+    monkeypatch.setattr(hotspots.time, "time", lambda: now)
+    return check_hotspots(FakeElement(volume_stats), str(tmp_path), "mvip.example", k=2, **thresholds)
+
+
+def test_first_run_has_no_rates(monkeypatch, tmp_path):
+    exit_status, report = run(monkeypatch, tmp_path, [stat(1, 10), stat(2, 20)], 1000.0)
+    assert exit_status == STATE_OK
+    assert report['volumes'] == 2
+    assert not report['has_rates']
+    assert report['top']['iops'] == []
+    assert [row[VOLUME_ID] for row in report['top']['latency']] == [1, 2]
+
+
+def test_rates_against_the_previous_sample(monkeypatch, tmp_path):
+    run(monkeypatch, tmp_path, [stat(1, 10), stat(2, 20), stat(3, 30)], 1000.0)
+    # Volume 3 had its counters reset and volume 4 is new, neither has a rate
+    exit_status, report = run(monkeypatch, tmp_path, [stat(1, 510), stat(2, 2020), stat(3, 5), stat(4, 10)],
+                              1010.0)
+    assert report['has_rates']
+    top = report['top']['iops']
+    assert [(row[VOLUME_ID], row[IOPS]) for row in top] == [(2, 400.0), (1, 100.0)]
+    assert top[0][BYTES_SEC] == 400.0 * 4096
+
+
+def test_outliers(monkeypatch, tmp_path):
+    volume_stats = [stat(1, latency=500), stat(2, latency=20000), stat(3, latency=40000),
+                    stat(4, throttle=0.6), stat(5, throttle=0.9, latency=15000)]
+    exit_status, report = run(monkeypatch, tmp_path, volume_stats, 1000.0)
+    assert exit_status == STATE_CRITICAL
+    assert report['outliers'] == {'latency_warn': 2, 'latency_crit': 1, 'throttle_warn': 1, 'throttle_crit': 1}
+    assert [row[VOLUME_ID] for row in report['top']['latency']] == [3, 2]
+    assert [row[VOLUME_ID] for row in report['top']['throttle']] == [5, 4]
+    exit_status, report = run(monkeypatch, tmp_path, volume_stats[:2] + volume_stats[3:4], 1000.0)
+    assert exit_status == STATE_WARNING
+
+
+def test_rank_keeps_k_rows():
+    rows = [(volume_id, volume_id * 10, float(volume_id), 0.0, 0.0) for volume_id in range(100)]
+    top = rank(rows, 3)
+    assert [row[VOLUME_ID] for row in top['latency']] == [99, 98, 97]
+    assert [row[VOLUME_ID] for row in top['iops']] == [99, 98, 97]
+
+
+def test_describe_row():
+    assert describe_row((1, 1500, None, None, 0.25)) == "1500us thr 0.25"
+    assert describe_row((1, 1500, 250.0, 2 * 1024 * 1024, 0.0)) == "1500us 250iops 2.0MiB/s thr 0.0"
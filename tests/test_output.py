@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from sfcheck.nagios import STATE_WARNING
+from sfcheck.output import CheckResult, FORMATS, render, format_number
+
+
+@pytest.fixture
+def result():
+    result = CheckResult('cluster', {'cluster': "mvip.example"})
+    result.exit_status = STATE_WARNING
+    result.summary = "Cluster: mvip.example Utilization: 85.0*"
+    section = result.section("Cluster information")
+    section.row("Utilization %", "85.0*")
+    section.row("Ensemble Members", "10.0.0.1 10.0.0.2 10.0.0.3 10.0.0.4 10.0.0.5")
+    result.stamp(section, result.exit_status)
+    result.perf("util", 85.0, "%", 80, 90, 0, 100)
+    result.perf("read_bytes", 1024, "c")
+    result.perf("days_to_90", 12.5, warn="30:", crit="7:", minimum=0)
+    result.perf("latency", float('nan'), "us")
+    result.perf("missing", None)
+    result.detail("Node 1 drive 3 slot 2: failed block")
+    return result
+
+
+def test_format_number():
+    assert format_number(None) == ""
+    assert format_number(3) == "3"
+    assert format_number(35.0) == "35"
+    assert format_number(33.3335) == "33.334"
+    assert format_number(float('nan')) == "NaN"
+    assert format_number("30:") == "30:"
+
+
+def test_nagios(result):
+    lines = render(result, 'nagios', "1.8").splitlines()
+    assert lines[0] == ("WARNING - Cluster: mvip.example Utilization: 85.0* | 'util'=85%;80;90;0;100 "
+                        "'read_bytes'=1024c 'days_to_90'=12.5;30:;7:;0")
+    assert lines[1:] == ["Node 1 drive 3 slot 2: failed block"]
+
+
+def test_json(result):
+    data = json.loads(render(result, 'json', "1.8"))
+    assert data['check'] == 'cluster'
+    assert data['status'] == "WARNING"
+    assert data['exit_status'] == STATE_WARNING
+    assert data['labels'] == {'cluster': "mvip.example"}
+    assert data['perfdata'][0] == {'label': "util", 'value': 85.0, 'uom': "%", 'warn': 80, 'crit': 90,
+                                   'min': 0, 'max': 100}
+    assert data['sections'][0]['rows'][0] == ["Utilization %", "85.0*"]
+
+
+def test_prometheus(result):
+    lines = render(result, 'prometheus', "1.8").splitlines()
+    assert 'sfcheck_cluster_status{cluster="mvip.example"} 1' in lines
+    assert 'sfcheck_cluster_util_percent{cluster="mvip.example"} 85' in lines
+    assert "# TYPE sfcheck_cluster_read_bytes_total counter" in lines
+    assert not any(line.startswith("sfcheck_cluster_missing") for line in lines)
+
+
+def test_table(result):
+    lines = render(result, 'table', "1.8").splitlines()
+    assert lines[0] == "+" + "-" * 83 + "+"
+    assert "Cluster information" in lines[1]
+    # Rows and rules are a fixed width, the banner's width follows the version string
+    assert all(len(line) == 85 for line in lines if not line.startswith("| SolidFire"))
+    assert any("*Warning" in line for line in lines)
+
+
+def test_every_format_renders(result):
+    for output_format in FORMATS:
+        assert render(result, output_format, "1.8").endswith("\n")
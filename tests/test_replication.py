@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+
+from sfcheck import replication
+from sfcheck.client import SFClient
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL
+from sfcheck.replication import check_replication, classify, format_lag, parse_delay, volume_states, worse
+
+
+@pytest.mark.parametrize("value, seconds", [
+    (None, None), ("", None), (42, 42.0), ("00:00:05.250000", 5.25), ("01:02:03", 3723.0),
+    ("PT5.5S", 5.5), ("PT1H2M", 3720.0), ("P1DT1S", 86401.0), ("P2D", 172800.0),
+])
+def test_parse_delay(value, seconds):
+    assert parse_delay(value) == seconds
+
+
+def test_classes():
+    assert [classify(state) for state in ("Active", "Idle", "PausedManual", "PausedManualRemote", "Error", None)] == \
+        ['ok', 'ok', 'paused', 'paused', 'error', 'error']
+    assert worse('ok', 'paused') == 'paused'
+    assert worse('error', 'paused') == 'error'
+    assert worse('ok', 'ok') == 'ok'
+
+
+def paired(volume_id, *pairs):
+    return {'volumeID': volume_id, 'name': "vol" + str(volume_id),
+            'volumePairs': [{'clusterPairID': pair_id, 'remoteVolumeID': remote_id,
+                             'remoteReplication': {'state': state}} for pair_id, remote_id, state in pairs]}
+
+
+def test_volume_paired_with_two_clusters():
+    volumes = [paired(1, (1, 101, "Active"), (2, 201, "PausedManual")), paired(2)]
+    states = volume_states(volumes, [{'volumeID': 1, 'asyncDelay': "00:01:00"}])
+    assert states == {(1, 101): ("Active", 60.0), (1, 201): ("PausedManual", 60.0)}
+
+
+def test_format_lag():
+    assert format_lag(None) == "n/a"
+    assert format_lag(3723.9) == "1:02:03"
+    assert format_lag(90000) == "25:00:00"
+
+
+#Source cluster answering from canned results
+class SourceClient(SFClient):
+
+    def __init__(self, results):
+        SFClient.__init__(self, "source.example")
+        self.results = results
+
+    def send(self, payload):
+        if isinstance(payload, list):
+            return json.dumps([{'id': request['id'], 'result': self.results[request['method']]}
+                               for request in payload]).encode('utf-8')
+        return json.dumps({'id': payload['id'], 'result': self.results[payload['method']]}).encode('utf-8')
+
+
+def test_pairs_roll_up(monkeypatch):
+    source = SourceClient({
+        'ListClusterPairs': {'clusterPairs': [
+            {'clusterPairID': 2, 'clusterName': "dr", 'mvip': "10.0.0.2", 'status': "Connected"},
+            {'clusterPairID': 1, 'clusterName': "backup", 'mvip': "10.0.0.1", 'status': "Connected"},
+            {'clusterPairID': 3, 'clusterName': "gone", 'mvip': "10.0.0.3", 'status': "Disconnected"}]},
+        'ListActivePairedVolumes': {'volumes': [paired(1, (1, 101, "Active"), (2, 201, "Active")),
+                                                paired(2, (2, 202, "PausedManual"))]},
+        'ListVolumeStatsByVolumeID': {'volumeStats': [{'volumeID': 1, 'asyncDelay': "00:05:00"},
+                                                      {'volumeID': 2, 'asyncDelay': None}]},
+    })
+    remotes = {
+        "10.0.0.1": {'states': {(101, 1): ("Active", 30.0)}, 'error': None},
+        "10.0.0.2": {'states': {(201, 1): ("Active", 1200.0), (202, 2): ("PausedManualRemote", None)}, 'error': None},
+        "10.0.0.3": {'states': {}, 'error': "unreachable"},
+    }
+    monkeypatch.setattr(replication, "query_remote",
+                        lambda cluster_pair, *args: dict(remotes[cluster_pair['mvip']], elapsed=0.1))
+    exit_status, report = check_replication(source, "admin", "admin", lag_warn=600, lag_crit=1800)
+    assert exit_status == STATE_CRITICAL
+    by_name = dict((pair['cluster_pair']['clusterName'], pair) for pair in report['pairs'])
+    assert [pair['cluster_pair']['clusterPairID'] for pair in report['pairs']] == [1, 2, 3]
+    assert (by_name['backup']['exit_status'], by_name['backup']['worst_lag']) == (STATE_OK, 300.0)
+    assert (by_name['dr']['exit_status'], by_name['dr']['worst_lag']) == (STATE_WARNING, 1200.0)
+    assert by_name['dr']['paused'] == 1
+    assert (by_name['gone']['exit_status'], by_name['gone']['remote_error']) == (STATE_CRITICAL, "unreachable")
+    assert (report['volumes'], report['paused'], report['worst_lag']) == (3, 1, 1200.0)
+    assert [(lag, name) for lag, name, volume in report['top_lag']] == [(1200.0, "dr"), (300.0, "backup")]
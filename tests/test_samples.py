@@ -0,0 +1,66 @@
+import pytest
+
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+from sfcheck.samples import SampleStore, compute_rates, disk_activity
+
+
+def sample(sample_time, read_bytes=0, write_bytes=0, read_ops=0, write_ops=0):
+    return {'sample_time': sample_time, 'read_bytes': read_bytes, 'write_bytes': write_bytes,
+            'read_ops': read_ops, 'write_ops': write_ops}
+
+
+PREVIOUS = sample(1000.0, 4096, 8192, 10, 20)
+
+
+def test_rates():
+    rates = compute_rates(PREVIOUS, sample(1010.0, 4096 + 40960, 8192 + 81920, 10 + 100, 20 + 200))
+    assert rates['interval'] == 10.0
+    assert rates['read_bytes_sec'] == 4096
+    assert rates['write_bytes_sec'] == 8192
+    assert (rates['read_iops'], rates['write_iops'], rates['total_iops']) == (10, 20, 30)
+    assert rates['avg_io_size'] == pytest.approx(122880 / 300.0)
+    assert rates['active']
+
+
+def test_idle_interval():
+    rates = compute_rates(PREVIOUS, dict(PREVIOUS, sample_time=1060.0))
+    assert rates['total_iops'] == 0
+    assert rates['avg_io_size'] == 0.0
+    assert not rates['active']
+
+
+def test_no_previous_sample():
+    assert compute_rates(None, PREVIOUS) is None
+
+
+@pytest.mark.parametrize("sample_time", [1000.0, 990.0])
+def test_zero_or_negative_interval(sample_time):
+    assert compute_rates(PREVIOUS, sample(sample_time, 5000, 9000, 11, 21)) is None
+
+
+def test_counter_reset():
+    assert compute_rates(PREVIOUS, sample(1010.0, 100, 9000, 11, 21)) is None
+
+
+def test_disk_activity():
+    active = compute_rates(PREVIOUS, sample(1010.0, 5000, 9000, 11, 21))
+    idle = compute_rates(PREVIOUS, dict(PREVIOUS, sample_time=1010.0))
+    assert disk_activity(sample(1010.0), active) == ("No", STATE_CRITICAL)
+    assert disk_activity(PREVIOUS, None) == ("n/a", STATE_UNKNOWN)
+    assert disk_activity(PREVIOUS, idle) == ("No", STATE_WARNING)
+    assert disk_activity(PREVIOUS, active) == ("Yes", STATE_OK)
+
+
+def test_swap(tmp_path):
+    store = SampleStore(str(tmp_path))
+    assert store.swap("10.0.0.1:443", PREVIOUS) is None
+    assert store.swap("10.0.0.1:443", sample(1010.0)) == PREVIOUS
+    assert store.load("10.0.0.1:443") == sample(1010.0)
+    assert [entry.name for entry in tmp_path.iterdir()] == ["cluster-10.0.0.1_443.stats"]
+
+
+def test_short_sample_file(tmp_path):
+    store = SampleStore(str(tmp_path))
+    with open(store.path("mvip"), 'wb') as f:
+        f.write(b"\0" * 7)
+    assert store.load("mvip") is None
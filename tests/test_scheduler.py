@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from sfcheck.nagios import STATE_OK, STATE_WARNING, STATE_CRITICAL, STATE_UNKNOWN
+from sfcheck.scheduler import Cadence, LatencyMeter, Scheduler
+
+
+def test_alerts_are_followed_closely():
+    cadence = Cadence(interval=60, jitter=0)
+    assert cadence.observe(STATE_OK) == 60
+    assert cadence.observe(STATE_WARNING) == 15
+    assert cadence.observe(STATE_CRITICAL) == 15
+    assert Cadence(interval=60, alert_interval=90, jitter=0).observe(STATE_CRITICAL) == 60
+
+
+def test_failed_polls_back_off_and_recover():
+    cadence = Cadence(interval=60, jitter=0, max_backoff=4)
+    assert [cadence.observe(STATE_UNKNOWN) for _ in range(3)] == [120, 240, 240]
+    assert [cadence.observe(STATE_OK, 0.1) for _ in range(3)] == [120, 60, 60]
+
+
+def test_slow_api_calls_back_off():
+    cadence = Cadence(interval=60, jitter=0, latency_limit=2.0)
+    assert cadence.observe(STATE_OK, 3.0) == 120
+    # Smoothed to 0.3 * 1.5 + 0.7 * 3.0 = 2.55, still over the limit
+    assert cadence.observe(STATE_OK, 1.5) == 240
+    assert cadence.latency == pytest.approx(2.55)
+    # Between half the limit and the limit the backoff holds
+    cadence.latency = 1.5
+    assert cadence.observe(STATE_OK) == 240
+
+
+def test_jitter_stays_in_bounds():
+    cadence = Cadence(interval=100, jitter=0.1)
+    delays = [cadence.observe(STATE_OK) for _ in range(200)]
+    assert all(90 <= delay <= 110 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_latency_meter():
+    class FakeElement(object):
+        def send_request(self, method_name, *args, **kwargs):
+            time.sleep(0.01)
+            return method_name
+
+    meter = LatencyMeter()
+    sfe = meter.instrument(FakeElement())
+    assert meter.take() is None
+    assert sfe.send_request("GetClusterStats", None) == "GetClusterStats"
+    sfe.send_request("ListDrives", None)
+    assert 0.01 <= meter.take() < 0.5
+    assert meter.take() is None
+
+
+def test_jobs_run_due_first_and_reschedule_themselves():
+    scheduler = Scheduler(workers=2)
+    runs = []
+    done = threading.Event()
+
+    def job(name, delay):
+        def run():
+            runs.append(name)
+            if len(runs) >= 6:
+                done.set()
+            # The scheduler never stops, park the jobs once the test has seen enough
+            return 3600 if done.is_set() else delay
+        return run
+    scheduler.add(job("slow", 10), delay=0.05)
+    scheduler.add(job("fast", 0.02))
+    thread = threading.Thread(target=scheduler.run)
+    thread.daemon = True
+    thread.start()
+    assert done.wait(5)
+    assert runs[0] == "fast"
+    assert runs.count("slow") == 1
+    # The slow job is back in the queue about 10 seconds out
+    with scheduler.lock:
+        assert any(due - time.time() > 9 for due, _, _ in scheduler.queue)
@@ -0,0 +1,41 @@
+from sfcheck.sessions import count_distribution, initiator_paths, describe_initiator
+
+
+def session(node_id, volume_id, initiator):
+    return {'nodeID': node_id, 'volumeID': volume_id, 'initiatorName': initiator}
+
+
+SESSIONS = [
+    # host1 has two paths to volume 10 and one to volume 11
+    session(1, 10, "host1"), session(2, 10, "host1"), session(3, 11, "host1"),
+    # host2 logs in to volume 12 over four paths
+    session(1, 12, "host2"), session(2, 12, "host2"), session(3, 12, "host2"), session(1, 12, "host2"),
+]
+
+
+def test_count_distribution():
+    by_node, by_volume, paths = count_distribution(SESSIONS, [1, 2, 3, 4])
+    assert by_node == {1: 3, 2: 2, 3: 2, 4: 0}
+    assert by_volume == {10: 2, 11: 1, 12: 4}
+    assert paths == {("host1", 10): 2, ("host1", 11): 1, ("host2", 12): 4}
+
+
+def test_sessions_on_unlisted_nodes_are_counted():
+    by_node, by_volume, paths = count_distribution([session(9, 10, "host1")], [1])
+    assert by_node == {1: 0, 9: 1}
+
+
+def test_initiator_paths():
+    paths = count_distribution(SESSIONS, [1, 2, 3])[2]
+    initiators = initiator_paths(paths, min_paths=2, max_paths=3)
+    assert initiators["host1"] == {'sessions': 3, 'volumes': 2, 'min_paths': 1, 'max_paths': 2,
+                                   'missing': 1, 'excess': 0}
+    assert initiators["host2"] == {'sessions': 4, 'volumes': 1, 'min_paths': 4, 'max_paths': 4,
+                                   'missing': 0, 'excess': 1}
+
+
+def test_describe_initiator():
+    paths = count_distribution(SESSIONS, [1, 2, 3])[2]
+    initiators = initiator_paths(paths, min_paths=2, max_paths=8)
+    assert describe_initiator(initiators["host1"]) == "3 sess 2 vols paths 1-2 1 low"
+    assert describe_initiator(initiators["host2"]) == "4 sess 1 vols paths 4-4"
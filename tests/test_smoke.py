@@ -0,0 +1,63 @@
+# End to end runs of every mode against bench/mock_server.py, one synthetic cluster for the session
+import pytest
+
+from sfcheck.nagios import STATE_UNKNOWN
+
+ELEMENT_MODES = ['cluster', 'trend', 'hotspot', 'faults', 'capacity', 'nodes', 'sessions']
+HTTP_TYPES = ['mvip', 'node', 'nodes', 'replication']
+
+
+def element_argv(port, tmp_path, *extra):
+    return ['-sm', '127.0.0.1:' + str(port), '-su', 'admin', '-sp', 'admin', '--state-dir', str(tmp_path)] + list(extra)
+
+
+@pytest.mark.parametrize("mode", ELEMENT_MODES)
+def test_element_mode(mock_cluster, tmp_path, run_json, mode):
+    pytest.importorskip("solidfire")
+    from sfcheck.element_check import main
+    exit_status, output = run_json(main, element_argv(mock_cluster, tmp_path, '--mode', mode))
+    assert exit_status != STATE_UNKNOWN, output['summary']
+    assert output['exit_status'] == exit_status
+    assert output['sections']
+
+
+@pytest.mark.parametrize("ip_type", HTTP_TYPES)
+def test_http_type(mock_cluster, tmp_path, monkeypatch, run_json, ip_type):
+    from sfcheck import http_check
+    from sfcheck.http_check import main
+    # The mvip check feeds the metric history, keep it out of the real one
+    monkeypatch.setattr(http_check, "historyDir", str(tmp_path))
+    exit_status, output = run_json(main, ['127.0.0.1', str(mock_cluster), 'admin', 'admin', ip_type])
+    assert exit_status != STATE_UNKNOWN, output['summary']
+    assert output['check'] == ip_type
+
+
+def test_element_unreachable_cluster_is_unknown(tmp_path, run_json):
+    pytest.importorskip("solidfire")
+    from sfcheck.element_check import main
+    exit_status, output = run_json(main, element_argv(1, tmp_path))
+    assert exit_status == STATE_UNKNOWN
+    assert output['summary'].startswith("Unable to connect to host: 127.0.0.1:1 (")
+    assert "\n" not in output['summary']
+
+
+def test_element_server_error_summary():
+    pytest.importorskip("solidfire")
+    from solidfire.common import ApiServerError
+    from sfcheck.element_check import error_summary
+    error = ApiServerError("GetClusterInfo", '{"error": {"name": "xPermissionDenied", "code": 403, '
+                                             '"message": "Permission denied\\nfor admin"}}')
+    assert error_summary("mvip.example", error) == "GetClusterInfo failed: xPermissionDenied Permission denied for admin"
+
+
+def test_modes_share_the_history_of_the_reported_mvip(mock_cluster, tmp_path, run_json):
+    pytest.importorskip("solidfire")
+    from sfcheck.element_check import main
+    # The mock reports 127.0.0.1 as its MVIP, whatever address it is reached on
+    argv = ['-sm', 'localhost:' + str(mock_cluster), '-su', 'admin', '-sp', 'admin', '--state-dir', str(tmp_path)]
+    run_json(main, argv)
+    assert (tmp_path / "cluster-127.0.0.1.history").exists()
+    assert (tmp_path / "cluster-127.0.0.1.stats").exists()
+    exit_status, output = run_json(main, argv + ['--mode', 'trend'])
+    samples = [perf['value'] for perf in output['perfdata'] if perf['label'] == "samples"]
+    assert samples == [2]
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from sfcheck.client import SFApiError
+from sfcheck.snapshot import Recorder, Snapshot
+
+
+def request(method, params=None, request_id=1):
+    return {'method': method, 'params': params or {}, 'id': request_id}
+
+
+def response(result, request_id=1):
+    return json.dumps({'id': request_id, 'result': result})
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    recorder = Recorder(str(tmp_path / "run.json.gz"), "element", "mvip.example", {'mode': 'cluster'})
+    recorder.record(request("GetClusterStats"), response({'sample': 1}).encode('utf-8'))
+    recorder.record(request("GetClusterStats", request_id=2), response({'sample': 2}, 2).encode('utf-8'))
+    recorder.record(request("ListEvents", {'startEventID': 5}), response({'events': [5]}))
+    recorder.record([request("GetClusterInfo", request_id=3), request("GetClusterVersionInfo", request_id=4)],
+                    json.dumps([{'id': 4, 'result': {'version': "12.3"}}, {'id': 3, 'result': {'name': "c"}}]))
+    return Snapshot(recorder.save())
+
+
+def result(text):
+    return json.loads(text)['result']
+
+
+def test_metadata(snapshot):
+    assert snapshot.script == "element"
+    assert snapshot.target == "mvip.example"
+    assert snapshot.meta == {'mode': 'cluster'}
+
+
+def test_responses_come_back_in_recorded_order_and_the_last_repeats(snapshot):
+    answers = [result(snapshot.answer(request("GetClusterStats", request_id=i)))['sample'] for i in range(4)]
+    assert answers == [1, 2, 2, 2]
+
+
+def test_requests_are_matched_on_params(snapshot):
+    assert result(snapshot.answer(request("ListEvents", {'startEventID': 5})))['events'] == [5]
+    with pytest.raises(SFApiError):
+        snapshot.answer(request("ListEvents", {'startEventID': 6}))
+
+
+def test_unrecorded_method(snapshot):
+    with pytest.raises(SFApiError) as error:
+        snapshot.answer(request("ListClusterFaults"))
+    assert "ListClusterFaults" in str(error.value)
+
+
+def test_batch_results_take_the_new_request_ids(snapshot):
+    answer = json.loads(snapshot.answer([request("GetClusterInfo", request_id=10),
+                                         request("GetClusterVersionInfo", request_id=11)]))
+    by_id = dict((entry['id'], entry['result']) for entry in answer)
+    assert by_id == {10: {'name': "c"}, 11: {'version': "12.3"}}
+
+
+def test_not_a_snapshot(tmp_path):
+    import gzip
+    path = tmp_path / "other.json.gz"
+    with gzip.open(str(path), 'wb') as f:
+        f.write(b'{"version": 99}')
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_element_replay_matches_the_recorded_run(mock_cluster, tmp_path, run_json):
+    pytest.importorskip("solidfire")
+    from sfcheck.element_check import main
+    path = str(tmp_path / "cluster.json.gz")
+    argv = ['-sm', '127.0.0.1:' + str(mock_cluster), '-su', 'admin', '-sp', 'admin',
+            '--state-dir', str(tmp_path / "live")]
+    live_status, live = run_json(main, argv + ['--record', path])
+    replay_status, replay = run_json(main, ['--replay', path, '--state-dir', str(tmp_path / "replay")])
+    assert replay_status == live_status
+    assert replay['summary'] == live['summary']
+    assert replay['sections'] == live['sections']
+    # The snapshot only answers the calls of the mode it was recorded in
+    with pytest.raises(SystemExit) as error:
+        main(['--replay', path, '--mode', 'faults'])
+    assert error.value.code == 2
+
+
+def test_http_replay_leaves_the_history_alone(mock_cluster, tmp_path, monkeypatch, run_json):
+    from sfcheck import http_check
+    history_dir = tmp_path / "history"
+    history_dir.mkdir()
+    monkeypatch.setattr(http_check, "historyDir", str(history_dir))
+    monkeypatch.setattr(http_check, "checkDiskUse", 0)
+    path = str(tmp_path / "mvip.json.gz")
+    live_status, live = run_json(http_check.main, ['127.0.0.1', str(mock_cluster), 'admin', 'admin', 'mvip',
+                                                   '--record', path])
+    before = dict((entry.name, entry.read_bytes()) for entry in history_dir.iterdir())
+    assert before
+    replay_status, replay = run_json(http_check.main, ['--replay', path])
+    assert replay_status == live_status
+    assert replay['summary'] == live['summary']
+    assert dict((entry.name, entry.read_bytes()) for entry in history_dir.iterdir()) == before
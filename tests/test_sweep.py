@@ -0,0 +1,38 @@
+import pytest
+
+from sfcheck.nagios import STATE_OK, STATE_UNKNOWN, STATE_WARNING
+from sfcheck.sweep import ResultRows, TEXT_WIDTH, sweep_fleet
+
+
+def test_rows_round_trip():
+    rows = ResultRows(3)
+    rows.write(0, {'exit_status': STATE_WARNING, 'elapsed': 0.5, 'error': None,
+                   'cluster': {'cluster_name': "bench", 'cluster_util': 85.5, 'num_sessions': 400}})
+    rows.write(2, {'exit_status': STATE_UNKNOWN, 'elapsed': 2.0, 'cluster': {}, 'error': "x" * (TEXT_WIDTH + 10)})
+    assert rows.read(0, "a") == {'mvip': "a", 'exit_status': STATE_WARNING, 'elapsed': 0.5, 'error': None,
+                                 'cluster': {'cluster_name': "bench", 'cluster_util': 85.5, 'num_sessions': 400}}
+    assert rows.read(1, "b") is None
+    error = rows.read(2, "c")
+    assert error['exit_status'] == STATE_UNKNOWN
+    assert error['cluster'] == {}
+    assert error['error'] == "x" * TEXT_WIDTH
+
+
+def test_processes_match_the_threaded_sweep(mock_cluster, tmp_path, run_json):
+    pytest.importorskip("solidfire")
+    from sfcheck.element_check import main
+    inventory = tmp_path / "fleet.txt"
+    mvip = "127.0.0.1:" + str(mock_cluster)
+    inventory.write_text("\n".join([mvip + " admin admin"] * 3 + ["127.0.0.1:1 admin admin"]) + "\n")
+    argv = ['-f', str(inventory), '--state-dir', str(tmp_path)]
+    threaded_status, threaded = run_json(main, argv)
+    swept_status, swept = run_json(main, argv + ['--processes', '2'])
+    assert threaded_status == swept_status == STATE_UNKNOWN
+    assert swept['summary'].startswith("Fleet: 4 clusters, 1 not OK")
+    assert threaded['summary'].startswith("Fleet: 4 clusters, 1 not OK")
+    labels = lambda output: [row[0] for section in output['sections'] for row in section['rows']]
+    assert labels(swept) == labels(threaded)
+
+
+def test_no_clusters():
+    assert sweep_fleet([], 4) == ([], STATE_OK)